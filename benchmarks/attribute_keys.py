@@ -0,0 +1,102 @@
+"""
+Compares reading the fields of a struct with many fields, 64 by default, from its Python dataclass by name with
+PyObject_GetAttrString against PyObject_GetAttr with the keys the conversion state interns, which the generated
+Python to C conversion uses. Reports the time per field read of both. Builds a throwaway extension, so run it with the
+package installed and a C compiler available:
+
+    python benchmarks/attribute_keys.py [field count]
+"""
+import sys
+import tempfile
+import time
+
+from extension import build_extension
+
+from c_interop.model.model import Module, Struct, Field, PrimitiveType
+
+record_count = 10000
+runs = 5
+
+_code = '''
+static const char *field_names[] = {{{names}}};
+
+/* Reads every field of every record by name, as the conversion did before the keys were interned. */
+static PyObject *read_by_name(PyObject *self, PyObject *items) {{
+    Py_ssize_t count = PyList_GET_SIZE(items);
+    for (Py_ssize_t index = 0; index < count; ++index) {{
+        PyObject *record = PyList_GET_ITEM(items, index);
+        for (size_t field = 0; field < {field_count}; ++field) {{
+            PyObject *value = PyObject_GetAttrString(record, field_names[field]);
+            if (value == NULL) {{
+                return NULL;
+            }}
+            Py_DECREF(value);
+        }}
+    }}
+    Py_RETURN_NONE;
+}}
+
+/* Reads every field of every record with the interned keys of the conversion state. */
+static PyObject *read_by_key(PyObject *self, PyObject *items) {{
+    struct wide_conversion_state *state = wide_conversion_state_get();
+    if (state == NULL) {{
+        return NULL;
+    }}
+    PyObject *keys[] = {{{keys}}};
+    Py_ssize_t count = PyList_GET_SIZE(items);
+    for (Py_ssize_t index = 0; index < count; ++index) {{
+        PyObject *record = PyList_GET_ITEM(items, index);
+        for (size_t field = 0; field < {field_count}; ++field) {{
+            PyObject *value = PyObject_GetAttr(record, keys[field]);
+            if (value == NULL) {{
+                return NULL;
+            }}
+            Py_DECREF(value);
+        }}
+    }}
+    Py_RETURN_NONE;
+}}
+
+static PyMethodDef methods[] = {{
+    {{"read_by_name", read_by_name, METH_O, ""}},
+    {{"read_by_key", read_by_key, METH_O, ""}},
+    {{NULL}}
+}};
+'''
+
+
+def wide_module(field_count: int) -> Module:
+    return Module('wide', Struct('Wide', *[Field(f'field{index}', PrimitiveType.Int64) for index in range(field_count)]))
+
+
+def best_of(action) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    field_count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    names = [f'field{index}' for index in range(field_count)]
+    code = _code.format(names=', '.join(f'"{name}"' for name in names),
+                        keys=', '.join(f'state->{name}_key' for name in names),
+                        field_count=field_count)
+    with tempfile.TemporaryDirectory() as directory:
+        build_extension(directory, wide_module(field_count), 'attribute_keys_extension', code=code)
+        import python_wide_protocol as protocol
+        import attribute_keys_extension as extension
+
+        records = [protocol.Wide(*range(index, index + field_count)) for index in range(record_count)]
+        reads = record_count * field_count
+        by_name = best_of(lambda: extension.read_by_name(records))
+        by_key = best_of(lambda: extension.read_by_key(records))
+        print(f'{record_count} records of {field_count} fields')
+        print(f'PyObject_GetAttrString: {by_name / reads * 1e9:6.1f} ns per field, '
+              f'interned PyObject_GetAttr: {by_key / reads * 1e9:6.1f} ns per field ({by_name / by_key:4.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Builds throwaway CPython extensions from generated code for the benchmarks, with the C compiler Python was built with.
+"""
+import os
+import shlex
+import subprocess
+import sys
+import sysconfig
+
+from c_interop.generator.c_header_generator import CHeaderGenerator
+from c_interop.generator.c_python_conversion_generator import CPythonConversionGenerator, ConversionMode
+from c_interop.generator.python_model_generator import PythonModuleGenerator
+from c_interop.model.model import Module
+
+_prelude = '''
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <stddef.h>
+#include "{name}_protocol.h"
+#define fail_with_message(...) do {{ if (!PyErr_Occurred()) PyErr_Format(PyExc_RuntimeError, __VA_ARGS__); }} while (0)
+'''
+
+_module_definition = '''
+static PyModuleDef_Slot slots[] = {{{name}_conversion_slots {{0, NULL}}}};
+static struct PyModuleDef definition = {{PyModuleDef_HEAD_INIT, "{extension}", NULL,
+    sizeof(struct {name}_conversion_state), methods, slots,
+    {name}_conversion_traverse, {name}_conversion_clear, {name}_conversion_free}};
+
+PyMODINIT_FUNC PyInit_{extension}(void) {{
+    return PyModuleDef_Init(&definition);
+}}
+'''
+
+
+def build_extension(directory: str, module: Module, extension: str, *generated: str, code: str):
+    """
+    Writes the Python model of module as python_<module>_protocol, and builds the extension from its table mode
+    conversion, the generated sources and code, which defines a PyMethodDef methods[] array. Adds directory to
+    sys.path, so both can be imported afterwards.
+    """
+    python_generator = PythonModuleGenerator(module)
+    python_generator.run()
+    with open(os.path.join(directory, f'python_{module.name}_protocol.py'), 'w') as output:
+        output.write('from dataclasses import dataclass\nfrom enum import Enum\n\n' + python_generator.result())
+    header_generator = CHeaderGenerator(module)
+    header_generator.run()
+    with open(os.path.join(directory, f'{module.name}_protocol.h'), 'w') as output:
+        output.write(header_generator.result())
+    conversion_generator = CPythonConversionGenerator(module, mode=ConversionMode.Table)
+    conversion_generator.run()
+    source = os.path.join(directory, extension + '.c')
+    with open(source, 'w') as output:
+        output.write(_prelude.format(name=module.name))
+        output.write(''.join(conversion_generator.result()))
+        output.write(''.join(generated))
+        output.write(code)
+        output.write(_module_definition.format(name=module.name, extension=extension))
+    compiler = shlex.split(sysconfig.get_config_var('CC') or 'cc')
+    target = os.path.join(directory, extension + sysconfig.get_config_var('EXT_SUFFIX'))
+    subprocess.run([*compiler, '-shared', '-fPIC', '-O2', '-I', sysconfig.get_paths()['include'], source, '-o', target],
+                   check=True)
+    sys.path.insert(0, directory)
@@ -0,0 +1,103 @@
+"""
+Parses a synthetic C header of the given size, 50 MB by default, and reports the parse time per MB. The header mixes
+the constructs the parser handles: comments, constants, enums with values depending on constants, structs with
+comments, arrays and pointers, function prototypes, inline function bodies and extern "C" blocks. Run it with the
+package installed:
+
+    python benchmarks/header_parsing.py [megabytes] [--profile]
+"""
+import cProfile
+import os
+import pstats
+import sys
+import tempfile
+import time
+
+from c_interop.generator.parseheader import HeaderParser
+
+_block = '''
+/*
+ * Block {index} of the synthetic header.
+ * Comments span lines.
+ */
+#define BLOCK_{index}_SIZE 16 /* the size of block {index} */
+#define BLOCK_{index}_MASK (BLOCK_{index}_SIZE - 1)
+
+// the states of block {index}
+enum block_{index}_state {{
+    BLOCK_{index}_IDLE, /* nothing to do */
+    BLOCK_{index}_RUNNING = 4,
+    BLOCK_{index}_DONE, // finished
+    BLOCK_{index}_LAST = BLOCK_{index}_DONE + BLOCK_{index}_SIZE / 4
+}};
+
+/** A record of block {index}. */
+struct block_{index}_record {{
+    /* the identifier */
+    uint64_t id;
+    int32_t x, y; // coordinates
+    const char *name;
+    uint8_t data[BLOCK_{index}_SIZE];
+    enum block_{index}_state state;
+    unsigned int flags : 3;
+}};
+
+#ifdef __cplusplus
+extern "C" {{
+#endif
+
+int block_{index}_process(struct block_{index}_record *record, const char *path);
+int block_{index}_copy(struct block_{index}_record *target,
+                       const struct block_{index}_record *source, size_t count);
+
+static inline int block_{index}_size(const struct block_{index}_record *record) {{
+    if (record->state == BLOCK_{index}_DONE) {{ return 0; }}
+    return "block {index} // not a comment"[0] + BLOCK_{index}_SIZE;
+}}
+
+#ifdef __cplusplus
+}}
+#endif
+'''
+
+
+def write_synthetic_header(path: str, megabytes: float):
+    """Writes blocks of declarations to path until it holds megabytes MB."""
+    target = int(megabytes * 1024 * 1024)
+    written = 0
+    index = 0
+    with open(path, 'w') as output:
+        while written < target:
+            block = _block.format(index=index)
+            output.write(block)
+            written += len(block)
+            index += 1
+
+
+def parse(path: str) -> HeaderParser:
+    parser = HeaderParser()
+    parser.parse_file(path)
+    return parser
+
+
+def main():
+    arguments = [argument for argument in sys.argv[1:] if argument != '--profile']
+    megabytes = float(arguments[0]) if arguments else 50
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'synthetic.h')
+        write_synthetic_header(path, megabytes)
+        size = os.path.getsize(path) / (1024 * 1024)
+        if '--profile' in sys.argv:
+            profile = cProfile.Profile()
+            profile.runcall(parse, path)
+            pstats.Stats(profile).sort_stats('tottime').print_stats(15)
+            return
+        start = time.perf_counter()
+        parser = parse(path)
+        elapsed = time.perf_counter() - start
+        print(f'{size:.1f} MB: {elapsed:.2f} s, {elapsed / size:.3f} s/MB, {len(parser.constants)} constants, '
+              f'{len(parser.enums)} enums, {len(parser.structs)} structs')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Compares the generated C JSON encoder and decoder with the round trip through Python on the same records: converting
+the C structs with <Struct>_to_python and encoding them with json.dumps, and decoding with json.loads and converting
+the dataclasses to C. Builds a throwaway extension, so run it with the package installed and a C compiler available:
+
+    python benchmarks/json_encoding.py
+"""
+import dataclasses
+import json
+import tempfile
+import time
+
+from extension import build_extension
+
+from c_interop.generator.c_json_generator import CJsonGenerator
+from c_interop.model.model import Module, Constant, Enumeration, Struct, Field, PrimitiveType, List, Array
+
+record_count = 20000
+runs = 5
+
+_code = '''
+static struct record *records;
+static size_t record_count;
+static struct conversion_arena arena;
+
+/* Converts the records to C once, keeping their strings and lists in the arena until the next load. */
+static PyObject *load(PyObject *self, PyObject *items) {
+    Py_ssize_t count = PyList_GET_SIZE(items);
+    struct record *loaded = PyMem_Calloc((size_t) count + 1, sizeof(struct record));
+    if (loaded == NULL) {
+        return PyErr_NoMemory();
+    }
+    conversion_arena_free(&arena);
+    PyMem_Free(records);
+    records = loaded;
+    record_count = 0;
+    for (Py_ssize_t index = 0; index < count; ++index) {
+        records[index] = Record_to_c(PyList_GET_ITEM(items, index), &arena);
+        if (PyErr_Occurred()) {
+            return NULL;
+        }
+    }
+    record_count = (size_t) count;
+    Py_RETURN_NONE;
+}
+
+static PyObject *to_python(PyObject *self, PyObject *unused) {
+    return Record_array_to_python(records, record_count);
+}
+
+static PyObject *to_json(PyObject *self, PyObject *unused) {
+    struct json_buffer buffer;
+    json_buffer_init(&buffer);
+    json_literal(&buffer, "[");
+    for (size_t index = 0; index < record_count; ++index) {
+        if (index > 0) {
+            json_literal(&buffer, ",");
+        }
+        record_to_json(&records[index], &buffer);
+    }
+    json_literal(&buffer, "]");
+    PyObject *result = buffer.failed ? PyErr_NoMemory() : PyBytes_FromStringAndSize(buffer.data, (Py_ssize_t) buffer.length);
+    json_buffer_free(&buffer);
+    return result;
+}
+
+/* Decodes a JSON array of at most as many records as are loaded and returns their count. */
+static PyObject *from_json(PyObject *self, PyObject *text) {
+    Py_ssize_t length = PyBytes_GET_SIZE(text);
+    struct record *decoded = PyMem_Calloc(record_count + 1, sizeof(struct record));
+    char *storage = PyMem_Malloc((size_t) length * 2 + 64);
+    if (decoded == NULL || storage == NULL) {
+        PyMem_Free(decoded);
+        PyMem_Free(storage);
+        return PyErr_NoMemory();
+    }
+    struct json_reader reader;
+    json_reader_init(&reader, PyBytes_AS_STRING(text), (size_t) length, storage, (size_t) length * 2 + 64);
+    size_t count = 0;
+    int status = json_expect(&reader, '[', "Expected an array");
+    if (status == 0 && !json_consume(&reader, ']')) {
+        do {
+            status = count < record_count ? record_from_json(&reader, &decoded[count++]) : json_fail(&reader, "Too many records");
+        } while (status == 0 && json_consume(&reader, ','));
+        if (status == 0) {
+            status = json_expect(&reader, ']', "Expected ]");
+        }
+    }
+    PyMem_Free(decoded);
+    PyMem_Free(storage);
+    if (status < 0) {
+        PyErr_SetString(PyExc_ValueError, reader.error);
+        return NULL;
+    }
+    return PyLong_FromSize_t(count);
+}
+
+static PyMethodDef methods[] = {
+    {"load", load, METH_O, ""},
+    {"to_python", to_python, METH_NOARGS, ""},
+    {"to_json", to_json, METH_NOARGS, ""},
+    {"from_json", from_json, METH_O, ""},
+    {NULL}
+};
+'''
+
+
+def json_module() -> Module:
+    tag_count = Constant('TAG_COUNT', 4)
+    color = Enumeration('Color', 'Red', 'Green', 'Blue')
+    point = Struct('Point', Field('x', PrimitiveType.Int32), Field('y', PrimitiveType.Double))
+    record = Struct('Record', Field('id', PrimitiveType.Int64), Field('active', PrimitiveType.Boolean),
+                    Field('color', color), Field('position', point), Field('name', PrimitiveType.String),
+                    Field('scores', Array(PrimitiveType.Int16, tag_count)), Field('route', List(point)))
+    return Module('records', tag_count, color, point, record)
+
+
+def best_of(action) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    module = json_module()
+    json_generator = CJsonGenerator(module)
+    json_generator.run()
+    with tempfile.TemporaryDirectory() as directory:
+        build_extension(directory, module, 'json_extension', *json_generator.result(), code=_code)
+        import python_records_protocol as protocol
+        import json_extension
+
+        def record_from_dict(value):
+            return protocol.Record(
+                id=value['id'], active=value['active'], color=protocol.Color[value['color']],
+                position=protocol.Point(**value['position']), name=value['name'], scores=value['scores'],
+                route=[protocol.Point(**point) for point in value['route']])
+
+        def python_encode():
+            return json.dumps([dataclasses.asdict(record) for record in json_extension.to_python()],
+                              default=lambda value: value.name).encode()
+
+        def python_decode():
+            json_extension.load([record_from_dict(value) for value in json.loads(text)])
+
+        records = [protocol.Record(id=index, active=index % 2 == 0, color=protocol.Color.Blue,
+                                   position=protocol.Point(index, index / 3), name=f'record "{index}"',
+                                   scores=[1, -2, 3, index % 100], route=[protocol.Point(1, 1.5), protocol.Point(2, 2.5)])
+                   for index in range(record_count)]
+        json_extension.load(records)
+        text = json_extension.to_json()
+        assert json.loads(text) == json.loads(python_encode())
+        assert json_extension.from_json(text) == record_count
+
+        c_encode = best_of(json_extension.to_json)
+        python_encode_time = best_of(python_encode)
+        c_decode = best_of(lambda: json_extension.from_json(text))
+        python_decode_time = best_of(python_decode)
+        json_extension.load(records)
+        megabytes = len(text) / 1e6
+        print(f'{record_count} records, {megabytes:.1f} MB of JSON')
+        print(f'encode  C: {c_encode * 1000:8.1f} ms, through Python: {python_encode_time * 1000:8.1f} ms, '
+              f'{python_encode_time / c_encode:5.1f}x')
+        print(f'decode  C: {c_decode * 1000:8.1f} ms, through Python: {python_decode_time * 1000:8.1f} ms, '
+              f'{python_decode_time / c_decode:5.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Generates all outputs of write_module_with_template for a synthetic module of the given number of types, 2000 by
+default, and reports the time of lowering the module and of the whole generation, which lowers it once for all
+generators. The conversion is generated in Table mode, which supports all field types. Run it with the package
+installed:
+
+    python benchmarks/model_generation.py [type count]
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from c_interop.generator.c_python_conversion_generator import ConversionMode
+from c_interop.generator.lowering import LoweredModule
+from c_interop.generator.template import write_module_with_template
+from c_interop.model.model import Module, Constant, Enumeration, Struct, Field, PrimitiveType, Array
+
+runs = 3
+
+_outputs = ['python_{name}_protocol.py', '{name}_protocol.h'] + [
+    f'{{name}}_{output}.{suffix}' for output in ['conversion', 'views', 'to_string', 'json', 'struct_ops']
+    for suffix in ['h', 'c']]
+
+
+def synthetic_module(type_count: int) -> Module:
+    """A module of type_count enums and structs."""
+    sample_count = Constant('SAMPLE_COUNT', 4)
+    enums = [Enumeration(f'Kind{index}', *[f'Kind{index}Value{value}' for value in range(5)])
+             for index in range(max(1, type_count // 4))]
+    structs = []
+    for index in range(type_count - len(enums)):
+        fields = [Field('id', PrimitiveType.UInt32), Field('value', PrimitiveType.Double),
+                  Field('flag', PrimitiveType.Boolean), Field('kind', enums[index % len(enums)]),
+                  Field('samples', Array(PrimitiveType.Int16, sample_count)), Field('name', PrimitiveType.String)]
+        # chains of structs holding the one before them, ten at most, so struct sizes stay small
+        if index % 10:
+            fields.append(Field('previous', structs[-1]))
+        structs.append(Struct(f'Thing{index}', *fields))
+    return Module('synthetic', sample_count, *enums, *structs)
+
+
+def best_of(action) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    type_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    module = synthetic_module(type_count)
+    with tempfile.TemporaryDirectory() as directory:
+        for output in _outputs:
+            with open(os.path.join(directory, output.format(name=module.name) + '.template'), 'w') as template:
+                template.write('@_code;\n')
+
+        def generate():
+            # write_module_with_template reports every file it writes
+            with contextlib.redirect_stdout(io.StringIO()):
+                write_module_with_template(module, directory, views=True, json=True, struct_ops=True,
+                                           numpy_dtypes=True, binary_codec=True, conversion_mode=ConversionMode.Table)
+
+        lowering = best_of(lambda: LoweredModule(module).dependency_order)
+        generation = best_of(generate)
+        size = sum(os.path.getsize(os.path.join(directory, output.format(name=module.name))) for output in _outputs)
+    print(f'{type_count} types, {size / 1e6:.1f} MB generated')
+    print(f'lowering: {lowering:6.2f} s, all outputs: {generation:6.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares the dataclass and the slotted Python model classes of a synthetic 500 struct module: the time to import the
+generated module in a fresh interpreter and the memory per instance. Run it with the package installed:
+
+    python benchmarks/slotted_model.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+from c_interop.generator.python_model_generator import PythonModuleGenerator
+from c_interop.model.model import Module, Enumeration, Struct, Field, PrimitiveType, List
+
+struct_count = 500
+instance_count = 10000
+runs = 5
+
+_prelude = 'from dataclasses import dataclass\nfrom enum import Enum\n\n'
+
+_measure = '''
+import sys, time, tracemalloc
+sys.path.insert(0, {directory!r})
+start = time.perf_counter()
+import {name} as generated
+import_time = time.perf_counter() - start
+tracemalloc.start()
+before = tracemalloc.get_traced_memory()[0]
+instances = [generated.Thing{last}() for _ in range({instance_count})]
+size = (tracemalloc.get_traced_memory()[0] - before) / {instance_count}
+print(import_time, size)
+'''
+
+
+def synthetic_module() -> Module:
+    kind = Enumeration('Kind', 'First', 'Second', 'Third')
+    structs = []
+    for index in range(struct_count):
+        fields = [Field('id', PrimitiveType.Int64), Field('value', PrimitiveType.Double),
+                  Field('name', PrimitiveType.String), Field('flag', PrimitiveType.Boolean), Field('kind', kind),
+                  Field('tags', List(PrimitiveType.String))]
+        if structs:
+            fields.append(Field('previous', structs[-1]))
+        structs.append(Struct(f'Thing{index}', *fields))
+    return Module('synthetic', kind, *structs)
+
+
+def measure(directory: str, slots: bool) -> tuple[float, float]:
+    name = 'slotted_model' if slots else 'dataclass_model'
+    generator = PythonModuleGenerator(synthetic_module(), slots)
+    generator.run()
+    with open(os.path.join(directory, name + '.py'), 'w') as output:
+        output.write(_prelude + generator.result())
+    script = _measure.format(directory=directory, name=name, last=struct_count - 1, instance_count=instance_count)
+    results = [subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout.split()
+               for _ in range(runs)]
+    return min(float(import_time) for import_time, _ in results), float(results[0][1])
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for slots in (False, True):
+            import_time, size = measure(directory, slots)
+            print(f'{"slots" if slots else "dataclass":>9}: import {import_time * 1000:7.1f} ms, '
+                  f'{size:6.0f} bytes per instance')
+
+
+if __name__ == '__main__':
+    main()
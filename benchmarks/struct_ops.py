@@ -0,0 +1,156 @@
+"""
+Compares the generated C equality and hash functions with comparing the Python dataclasses the same records convert
+to: equality of two equal record arrays with == on the dataclasses, and hashing the dataclasses as tuples.
+The Python timings are given without and with the conversion of the C structs to dataclasses. Builds a throwaway
+extension, so run it with the package installed and a C compiler available:
+
+    python benchmarks/struct_ops.py
+"""
+import dataclasses
+import tempfile
+import time
+
+from extension import build_extension
+
+from c_interop.generator.c_struct_ops_generator import CStructOpsGenerator
+from c_interop.model.model import Module, Constant, Enumeration, Struct, Field, PrimitiveType, List, Array
+
+record_count = 100000
+runs = 5
+
+_code = '''
+struct records {
+    struct record *items;
+    size_t count;
+    struct conversion_arena arena;
+};
+
+static struct records loaded[2];
+
+/* Converts items to C into loaded[slot], keeping their strings and lists in the arena of the slot. */
+static PyObject *load(PyObject *self, PyObject *args) {
+    int slot;
+    PyObject *items;
+    if (!PyArg_ParseTuple(args, "iO!", &slot, &PyList_Type, &items) || slot < 0 || slot > 1) {
+        return PyErr_Occurred() ? NULL : PyErr_Format(PyExc_ValueError, "Illegal slot [%d]", slot);
+    }
+    struct records *records = &loaded[slot];
+    Py_ssize_t count = PyList_GET_SIZE(items);
+    struct record *converted = PyMem_Calloc((size_t) count + 1, sizeof(struct record));
+    if (converted == NULL) {
+        return PyErr_NoMemory();
+    }
+    conversion_arena_free(&records->arena);
+    PyMem_Free(records->items);
+    records->items = converted;
+    records->count = 0;
+    for (Py_ssize_t index = 0; index < count; ++index) {
+        records->items[index] = Record_to_c(PyList_GET_ITEM(items, index), &records->arena);
+        if (PyErr_Occurred()) {
+            return NULL;
+        }
+    }
+    records->count = (size_t) count;
+    Py_RETURN_NONE;
+}
+
+static PyObject *to_python(PyObject *self, PyObject *slot) {
+    struct records *records = &loaded[PyLong_AsLong(slot) != 0];
+    return Record_array_to_python(records->items, records->count);
+}
+
+/* The number of equal records at the same index of both slots. */
+static PyObject *equal_count(PyObject *self, PyObject *unused) {
+    size_t count = loaded[0].count < loaded[1].count ? loaded[0].count : loaded[1].count;
+    size_t equal = 0;
+    for (size_t index = 0; index < count; ++index) {
+        equal += record_equals(&loaded[0].items[index], &loaded[1].items[index]);
+    }
+    return PyLong_FromSize_t(equal);
+}
+
+/* The xor of the hashes of the records of a slot. */
+static PyObject *hash_all(PyObject *self, PyObject *slot) {
+    struct records *records = &loaded[PyLong_AsLong(slot) != 0];
+    uint64_t combined = 0;
+    for (size_t index = 0; index < records->count; ++index) {
+        combined ^= record_hash(&records->items[index]);
+    }
+    return PyLong_FromUnsignedLongLong(combined);
+}
+
+static PyMethodDef methods[] = {
+    {"load", load, METH_VARARGS, ""},
+    {"to_python", to_python, METH_O, ""},
+    {"equal_count", equal_count, METH_NOARGS, ""},
+    {"hash_all", hash_all, METH_O, ""},
+    {NULL}
+};
+'''
+
+
+def ops_module() -> Module:
+    score_count = Constant('SCORE_COUNT', 4)
+    color = Enumeration('Color', 'Red', 'Green', 'Blue')
+    point = Struct('Point', Field('x', PrimitiveType.Int32), Field('y', PrimitiveType.Double))
+    record = Struct('Record', Field('id', PrimitiveType.Int64), Field('active', PrimitiveType.Boolean),
+                    Field('color', color), Field('position', point), Field('name', PrimitiveType.String),
+                    Field('scores', Array(PrimitiveType.Int16, score_count)), Field('route', List(point)))
+    return Module('ops', score_count, color, point, record)
+
+
+def dataclass_hash(record) -> int:
+    # astuple keeps lists, which are not hashable
+    return hash(tuple(tuple(value) if type(value) is list else value for value in dataclasses.astuple(record)))
+
+
+def best_of(action) -> float:
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    module = ops_module()
+    struct_ops_generator = CStructOpsGenerator(module)
+    struct_ops_generator.run()
+    with tempfile.TemporaryDirectory() as directory:
+        build_extension(directory, module, 'struct_ops_extension', *struct_ops_generator.result(), code=_code)
+        import python_ops_protocol as protocol
+        import struct_ops_extension as extension
+
+        def records():
+            return [protocol.Record(id=index, active=index % 2 == 0, color=protocol.Color.Blue,
+                                    position=protocol.Point(index, index / 3), name=f'record {index}',
+                                    scores=[1, -2, 3, index % 100],
+                                    route=[protocol.Point(1, 1.5), protocol.Point(2, index / 7)])
+                    for index in range(record_count)]
+
+        # equal but distinct objects on both sides, so neither C nor Python can shortcut on identity
+        extension.load(0, records())
+        extension.load(1, records())
+        left, right = extension.to_python(0), extension.to_python(1)
+        assert extension.equal_count() == record_count == sum(a == b for a, b in zip(left, right))
+        assert extension.hash_all(0) == extension.hash_all(1)
+
+        c_equals = best_of(extension.equal_count)
+        python_equals = best_of(lambda: sum(a == b for a, b in zip(left, right)))
+        python_converted_equals = best_of(lambda: sum(
+            a == b for a, b in zip(extension.to_python(0), extension.to_python(1))))
+        c_hash = best_of(lambda: extension.hash_all(0))
+        python_hash = best_of(lambda: [dataclass_hash(record) for record in left])
+        python_converted_hash = best_of(lambda: [dataclass_hash(record) for record in extension.to_python(0)])
+        print(f'{record_count} records')
+        print(f'equals  C: {c_equals * 1000:7.1f} ms, dataclasses: {python_equals * 1000:7.1f} ms '
+              f'({python_equals / c_equals:5.1f}x), converted and compared: {python_converted_equals * 1000:7.1f} ms '
+              f'({python_converted_equals / c_equals:5.1f}x)')
+        print(f'hash    C: {c_hash * 1000:7.1f} ms, dataclasses: {python_hash * 1000:7.1f} ms '
+              f'({python_hash / c_hash:5.1f}x), converted and hashed: {python_converted_hash * 1000:7.1f} ms '
+              f'({python_converted_hash / c_hash:5.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Converts structs to C and back from 1 to N threads at once and reports the throughput of each thread count relative
+to a single thread. On a free-threaded build the conversion runs without the GIL and scales close to linearly; on a
+build with the GIL the threads take turns. Builds a throwaway extension, so run it with the package installed and a C
+compiler available:
+
+    python benchmarks/threaded_conversion.py [maximum thread count]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from extension import build_extension
+
+from c_interop.model.model import Module, Constant, Enumeration, Struct, Field, PrimitiveType, List, Array
+
+conversions_per_thread = 200000
+batch_size = 1000
+
+_code = '''
+static PyObject *convert(PyObject *self, PyObject *items) {
+    struct conversion_arena arena;
+    conversion_arena_init(&arena, 0);
+    Py_ssize_t count = PyList_GET_SIZE(items);
+    for (Py_ssize_t index = 0; index < count; ++index) {
+        struct record record = Record_to_c(PyList_GET_ITEM(items, index), &arena);
+        PyObject *result = PyErr_Occurred() ? NULL : Record_to_python(record);
+        conversion_arena_reset(&arena);
+        if (result == NULL) {
+            conversion_arena_free(&arena);
+            return NULL;
+        }
+        Py_DECREF(result);
+    }
+    conversion_arena_free(&arena);
+    Py_RETURN_NONE;
+}
+
+static PyMethodDef methods[] = {{"convert", convert, METH_O, ""}, {NULL}};
+'''
+
+
+def stress_module() -> Module:
+    history_length = Constant('HISTORY_LENGTH', 4)
+    color = Enumeration('Color', 'Red', 'Green', 'Blue')
+    point = Struct('Point', Field('x', PrimitiveType.Int32), Field('y', PrimitiveType.Double))
+    record = Struct('Record', Field('id', PrimitiveType.Int64), Field('color', color), Field('position', point),
+                    Field('history', Array(PrimitiveType.Int16, history_length)), Field('name', PrimitiveType.String),
+                    Field('route', List(point)))
+    return Module('stress', history_length, color, point, record)
+
+
+def measure(convert, items, thread_count: int) -> float:
+    """The conversions per second of thread_count threads converting at once."""
+    batches = conversions_per_thread // batch_size
+    barrier = threading.Barrier(thread_count + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(batches):
+            convert(items)
+
+    threads = [threading.Thread(target=work) for _ in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return thread_count * batches * batch_size / (time.perf_counter() - start)
+
+
+def main():
+    maximum_threads = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as directory:
+        build_extension(directory, stress_module(), 'stress_extension', code=_code)
+        import python_stress_protocol as protocol
+        import stress_extension
+
+        items = [protocol.Record(id=index, color=protocol.Color.Green, position=protocol.Point(index, 0.5),
+                                 history=[1, 2, 3, 4], name=f'record {index}',
+                                 route=[protocol.Point(1, 1.0), protocol.Point(2, 2.0)])
+                 for index in range(batch_size)]
+        gil_enabled = sys._is_gil_enabled() if hasattr(sys, '_is_gil_enabled') else True
+        print(f'Python {sys.version.split()[0]}, GIL {"enabled" if gil_enabled else "disabled"}')
+        thread_count = 1
+        single = None
+        while thread_count <= maximum_threads:
+            rate = measure(stress_extension.convert, items, thread_count)
+            single = single or rate
+            print(f'{thread_count:>3} threads: {rate / 1e6:6.2f} M conversions/s, {rate / single:5.2f}x')
+            thread_count *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+ARENA_RUNTIME = r'''
+#ifndef C_INTEROP_ARENA_RUNTIME
+#define C_INTEROP_ARENA_RUNTIME
+
+#include <stddef.h>
+#include <stdint.h>
+#include <stdlib.h>
+
+#define conversion_arena_default_block_size 65536
+
+struct conversion_arena_block {
+    struct conversion_arena_block *next;
+    size_t capacity;
+    size_t used;
+    max_align_t data[];
+};
+
+struct conversion_arena {
+    struct conversion_arena_block *first;
+    struct conversion_arena_block *current;
+    size_t block_size;
+    PyObject **borrowed;
+    size_t borrowed_count;
+    size_t borrowed_capacity;
+};
+
+static inline void conversion_arena_init(struct conversion_arena *arena, size_t block_size) {
+    arena->first = NULL;
+    arena->current = NULL;
+    arena->block_size = block_size > 0 ? block_size : conversion_arena_default_block_size;
+    arena->borrowed = NULL;
+    arena->borrowed_count = 0;
+    arena->borrowed_capacity = 0;
+}
+
+static inline struct conversion_arena_block *conversion_arena_new_block(size_t capacity) {
+    struct conversion_arena_block *block = malloc(sizeof(struct conversion_arena_block) + capacity);
+    if (block == NULL) {
+        return NULL;
+    }
+    block->next = NULL;
+    block->capacity = capacity;
+    block->used = 0;
+    return block;
+}
+
+/* Bump-allocates size bytes. Sets a Python exception and returns NULL if out of memory. */
+static inline void *conversion_arena_allocate(struct conversion_arena *arena, size_t size, size_t alignment) {
+    if (arena == NULL) {
+        PyErr_SetString(PyExc_ValueError, "A conversion arena is required for variable length data");
+        return NULL;
+    }
+    struct conversion_arena_block *block = arena->current;
+    while (block != NULL) {
+        size_t offset = (block->used + alignment - 1) / alignment * alignment;
+        if (offset + size <= block->capacity) {
+            block->used = offset + size;
+            arena->current = block;
+            return (char *) block->data + offset;
+        }
+        if (block->next == NULL) {
+            break;
+        }
+        block = block->next;
+    }
+    size_t capacity = size > arena->block_size ? size : arena->block_size;
+    struct conversion_arena_block *new_block = conversion_arena_new_block(capacity);
+    if (new_block == NULL) {
+        PyErr_NoMemory();
+        return NULL;
+    }
+    if (block == NULL) {
+        arena->first = new_block;
+    } else {
+        new_block->next = block->next;
+        block->next = new_block;
+    }
+    arena->current = new_block;
+    new_block->used = size;
+    return new_block->data;
+}
+
+/* Borrows the UTF-8 buffer of a str, keeping the str alive until the next reset. None maps to NULL. */
+static inline const char *conversion_arena_utf8(struct conversion_arena *arena, PyObject *value) {
+    if (value == Py_None) {
+        return NULL;
+    }
+    if (arena == NULL) {
+        PyErr_SetString(PyExc_ValueError, "A conversion arena is required for strings");
+        return NULL;
+    }
+    const char *result = PyUnicode_AsUTF8(value);
+    if (result == NULL) {
+        return NULL;
+    }
+    if (arena->borrowed_count == arena->borrowed_capacity) {
+        size_t capacity = arena->borrowed_capacity > 0 ? 2 * arena->borrowed_capacity : 64;
+        PyObject **borrowed = realloc(arena->borrowed, capacity * sizeof(PyObject *));
+        if (borrowed == NULL) {
+            PyErr_NoMemory();
+            return NULL;
+        }
+        arena->borrowed = borrowed;
+        arena->borrowed_capacity = capacity;
+    }
+    Py_INCREF(value);
+    arena->borrowed[arena->borrowed_count++] = value;
+    return result;
+}
+
+/* Releases everything allocated from the arena at once, keeping its blocks for reuse. Requires the GIL. */
+static inline void conversion_arena_reset(struct conversion_arena *arena) {
+    for (struct conversion_arena_block *block = arena->first; block != NULL; block = block->next) {
+        block->used = 0;
+    }
+    arena->current = arena->first;
+    for (size_t index = 0; index < arena->borrowed_count; ++index) {
+        Py_DECREF(arena->borrowed[index]);
+    }
+    arena->borrowed_count = 0;
+}
+
+static inline void conversion_arena_free(struct conversion_arena *arena) {
+    conversion_arena_reset(arena);
+    struct conversion_arena_block *block = arena->first;
+    while (block != NULL) {
+        struct conversion_arena_block *next = block->next;
+        free(block);
+        block = next;
+    }
+    free(arena->borrowed);
+    conversion_arena_init(arena, arena->block_size);
+}
+
+/* Converts an item of a List or Array to a signed integer in [minimum, maximum]. On failure sets a Python exception
+ * and returns 0, so callers check PyErr_Occurred() after each item. */
+static inline long long conversion_item_signed(PyObject *value, long long minimum, long long maximum) {
+    long long result = PyLong_AsLongLong(value);
+    if (result == -1 && PyErr_Occurred()) {
+        return 0;
+    }
+    if (result < minimum || result > maximum) {
+        PyErr_Format(PyExc_OverflowError, "Value [%lld] out of range", result);
+        return 0;
+    }
+    return result;
+}
+
+static inline unsigned long long conversion_item_unsigned(PyObject *value, unsigned long long maximum) {
+    unsigned long long result = PyLong_AsUnsignedLongLong(value);
+    if (result == (unsigned long long) -1 && PyErr_Occurred()) {
+        return 0;
+    }
+    if (result > maximum) {
+        PyErr_Format(PyExc_OverflowError, "Value [%llu] out of range", result);
+        return 0;
+    }
+    return result;
+}
+
+/* Stops at the first item whose action leaves a Python exception set, and releases the items before failing. */
+#define with_arena_list_elements(value, element_type, arena, target, length_target, action) \
+    { \
+        PyObject *items = PySequence_Fast(value, "Expected a sequence"); \
+        if (items == NULL) { \
+            fail_with_message("Expected a sequence for [%s]", #target); \
+        } else { \
+            Py_ssize_t item_count = PySequence_Fast_GET_SIZE(items); \
+            if ((size_t) item_count > SIZE_MAX / sizeof(element_type)) { \
+                PyErr_NoMemory(); \
+                fail_with_message("Unable to allocate [%s]", #target); \
+            } else if ((target = conversion_arena_allocate( \
+                    arena, (size_t) item_count * sizeof(element_type), _Alignof(element_type))) == NULL) { \
+                fail_with_message("Unable to allocate [%s]", #target); \
+            } else { \
+                length_target = (size_t) item_count; \
+                Py_ssize_t failed_index = -1; \
+                for (Py_ssize_t item_index = 0; item_index < item_count; ++item_index) { \
+                    PyObject *item_value = PySequence_Fast_GET_ITEM(items, item_index); \
+                    action; \
+                    if (PyErr_Occurred()) { \
+                        failed_index = item_index; \
+                        break; \
+                    } \
+                } \
+                if (failed_index >= 0) { \
+                    fail_with_message("Unable to convert item [%zd] of [%s]", failed_index, #target); \
+                } \
+            } \
+            Py_DECREF(items); \
+        } \
+    }
+
+#endif
+'''
@@ -1,15 +1,23 @@
 from typing import Callable
 
 from c_interop.generator.codewriter import CodeWriter
-from c_interop.generator.ctypes import CTypes
+from c_interop.generator.lowering import LoweredModule
 from c_interop.model.model import List, Array
 
 
 class Attributes:
-    def __init__(self, ctypes: CTypes):
-        self._ctypes = ctypes
+    def __init__(self, lowered: LoweredModule, attribute_key: Callable[[str], str] = None):
+        self._lowered = lowered
+        self._attribute_key = attribute_key
 
     def with_attribute(self, owner, attribute_name, action):
+        if self._attribute_key is not None:
+            return MacroCall(
+                'with_attribute_for_key',
+                owner,
+                self._attribute_key(attribute_name),
+                'python_value',
+                action)
         return MacroCall(
             'with_attribute',
             owner,
@@ -77,7 +85,7 @@ class Attributes:
         return MacroCall(
             'with_list_elements',
             value_name,
-            self._ctypes.for_type(list_type.element_type),
+            self._lowered.c_type(list_type.element_type),
             list_type.maximum_length,
             action)
 
@@ -86,10 +94,31 @@ class Attributes:
         return MacroCall(
             'with_array_elements',
             value_name,
-            self._ctypes.for_type(array_type.element_type),
+            self._lowered.c_type(array_type.element_type),
             array_type.length,
             action)
 
+    def with_arena_list_elements(self, value_name, list_type, target, action):
+        return MacroCall(
+            'with_arena_list_elements',
+            value_name,
+            self._lowered.c_type(list_type.element_type),
+            'arena',
+            target,
+            target + '_length',
+            action)
+
+    def with_buffer_or_elements(self, target, capacity, exact: bool, length_target, code, elements):
+        return MacroCall(
+            'with_buffer_or_elements',
+            'python_value',
+            target,
+            capacity,
+            '1' if exact else '0',
+            length_target,
+            "'" + code + "'",
+            elements)
+
 
 class MacroCall:
     def __init__(self, name: str, *arguments: type(str) | type('MacroCall') | Callable[[CodeWriter], None]):
@@ -0,0 +1,105 @@
+BUFFER_RUNTIME = r'''
+#ifndef C_INTEROP_BUFFER_RUNTIME
+#define C_INTEROP_BUFFER_RUNTIME
+
+#include <string.h>
+
+/* True if items of format are of the struct module type code, given the item size matches already.
+ * Integer codes of the same signedness are aliases then, like l and q on LP64. */
+static int buffer_format_matches(const char *format, char code) {
+    if (format == NULL) {
+        format = "B";
+    }
+    if (*format == '@' || *format == '=') {
+        ++format;
+    }
+    if (format[0] == '\0' || format[1] != '\0') {
+        return 0;
+    }
+    if (format[0] == code) {
+        return 1;
+    }
+    if (strchr("bhilqn", code) != NULL) {
+        return strchr("bhilqn", format[0]) != NULL;
+    }
+    if (strchr("BHILQN", code) != NULL) {
+        return strchr("BHILQN", format[0]) != NULL;
+    }
+    return 0;
+}
+
+/* Returns 1 if value was copied, 0 if value is no matching buffer, -1 on error. */
+static int buffer_to_c_array(PyObject *value, void *target, size_t element_size, char code, size_t capacity, int exact, size_t *length) {
+    if (!PyObject_CheckBuffer(value)) {
+        return 0;
+    }
+    Py_buffer view;
+    if (PyObject_GetBuffer(value, &view, PyBUF_FORMAT | PyBUF_C_CONTIGUOUS) < 0) {
+        PyErr_Clear();
+        return 0;
+    }
+    int status = 0;
+    if ((size_t) view.itemsize == element_size && buffer_format_matches(view.format, code)) {
+        size_t count = (size_t) view.len / element_size;
+        if (exact ? count != capacity : count > capacity) {
+            PyErr_Format(PyExc_ValueError, "Illegal buffer length [%zu], expected %s%zu",
+                         count, exact ? "" : "at most ", capacity);
+            status = -1;
+        } else {
+            memcpy(target, view.buf, (size_t) view.len);
+            if (length != NULL) {
+                *length = count;
+            }
+            status = 1;
+        }
+    }
+    PyBuffer_Release(&view);
+    return status;
+}
+
+static int buffer_matches(PyObject *current, const void *items, size_t size) {
+    if (!PyObject_CheckBuffer(current)) {
+        return 0;
+    }
+    Py_buffer view;
+    if (PyObject_GetBuffer(current, &view, PyBUF_C_CONTIGUOUS) < 0) {
+        PyErr_Clear();
+        return 0;
+    }
+    int result = (size_t) view.len == size && memcmp(view.buf, items, size) == 0;
+    PyBuffer_Release(&view);
+    return result;
+}
+
+/* Copies items into an array.array if array_class is given, into a read-only memoryview otherwise. */
+static PyObject *c_array_to_buffer_object(PyObject *array_class, const char *format, const void *items, size_t length, size_t element_size) {
+    if (array_class != NULL) {
+        return PyObject_CallFunction(array_class, "sy#", format, (const char *) items, (Py_ssize_t) (length * element_size));
+    }
+    PyObject *bytes = PyBytes_FromStringAndSize((const char *) items, (Py_ssize_t) (length * element_size));
+    if (bytes == NULL) {
+        return NULL;
+    }
+    PyObject *view = PyMemoryView_FromObject(bytes);
+    Py_DECREF(bytes);
+    if (view == NULL) {
+        return NULL;
+    }
+    PyObject *result = PyObject_CallMethod(view, "cast", "s", format);
+    Py_DECREF(view);
+    return result;
+}
+
+#define with_buffer_or_elements(value, target, capacity, exact, length_target, code, elements) \
+    { \
+        int buffer_status = buffer_to_c_array(value, target, sizeof((target)[0]), code, capacity, exact, length_target); \
+        if (buffer_status < 0) { \
+            fail_with_message("Unable to copy buffer into [%s]", #target); \
+        } \
+        if (buffer_status == 0) { \
+            elements; \
+        } \
+    }
+
+#endif
+'''
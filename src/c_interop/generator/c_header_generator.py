@@ -1,23 +1,31 @@
+from typing import TextIO
+
 from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
-from c_interop.generator.ctypes import CTypes, PascalToCCase
+from c_interop.generator.layout import enum_storage_type, packed_field_getter, packed_field_setter, \
+    packed_flags_member, is_columnar_struct
+from c_interop.generator.lowering import LoweredModule
 from c_interop.generator.style import Style
-from c_interop.model.model import Module, List
+from c_interop.model.model import Module, Enumeration
 
 
 class CHeaderGenerator:
-    def __init__(self, module: Module, style=Style.Knr):
+    def __init__(self, module: Module, style=Style.Knr, sink: TextIO = None, lowered: LoweredModule = None):
         self.module = module
         self._style = style
-        self._out = CodeWriter(CodeWriterMode.C)
-        self._ctypes = CTypes()
+        self._out = CodeWriter(CodeWriterMode.C, sink)
+        self._lowered = lowered if lowered is not None else LoweredModule(module)
+        self._layouts = self._lowered.layouts
 
     def run(self):
+        if any(struct.optimize_layout or struct.pack_flags for struct in self.module.structs):
+            self._out.writeln('#include <stddef.h>')
+            self._out.writeln()
         for constant in self.module.constants:
             self._out.writeln(f'#define {constant.name} {self._literal_for_value(constant.value)}')
             self._out.writeln()
         for enum in self.module.enums:
             self._write_enum(enum)
-        for struct in self.module.structs:
+        for struct in self._lowered.dependency_order:
             self._write_struct(struct)
 
     def _literal_for_value(self, value):
@@ -30,10 +38,10 @@ class CHeaderGenerator:
         return self._out.result()
 
     def _write_enum(self, enum):
-        if enum.typedef:
+        if enum.typedef and not enum.compact:
             self._before_block('typedef enum')
         else:
-            self._before_block('enum ', PascalToCCase(enum.name).result)
+            self._before_block('enum ', self._lowered.c_name(enum))
 
         def write_enum_body():
             ordinal = enum.first_ordinal
@@ -46,21 +54,32 @@ class CHeaderGenerator:
                 first = False
             self._out.writeln()
 
-        if enum.typedef:
-            self._out.block(write_enum_body, ' ' + PascalToCCase(enum.name).result + postfix(enum) + ';')
+        if enum.typedef and not enum.compact:
+            self._out.block(write_enum_body, ' ' + self._lowered.c_name(enum) + postfix(enum) + ';')
         else:
             self._out.block(write_enum_body, ';')
+        if enum.compact:
+            self._out.writeln()
+            storage_type = self._lowered.c_type(enum_storage_type(enum))
+            self._out.writeln('typedef ', storage_type, ' ', self._lowered.c_type(enum), ';')
         self._out.writeln()
 
     def _write_struct(self, struct):
         if struct.typedef:
             self._before_block('typedef struct')
         else:
-            self._before_block('struct ', PascalToCCase(struct.name).result)
+            self._before_block('struct ', self._lowered.c_name(struct))
 
         def write_struct_body():
-            for field in struct.fields:
-                c_type = self._ctypes.for_type(field.type)
+            for member in self._layouts.for_struct(struct).fields:
+                field = member.field
+                if field is None:
+                    self._out.writeln(self._lowered.c_type(member.type), ' ', member.name, ';')
+                    continue
+                if member.is_length:
+                    self._out.writeln('size_t ', member.name, ';')
+                    continue
+                c_type = self._lowered.c_type(field.type)
                 if type(c_type) is tuple:
                     self._out.write(c_type[0], ' ', field.name, c_type[1], ';')
                 else:
@@ -73,14 +92,90 @@ class CHeaderGenerator:
                         self._out.writeln(f" /* {line} */")
                 else:
                     self._out.writeln()
-                if type(field.type) is List:
-                    self._out.writeln('size_t ', field.name, '_length;')
 
         if struct.typedef:
-            self._out.block(write_struct_body, ' ' + PascalToCCase(struct.name).result + postfix(struct) + ';')
+            self._out.block(write_struct_body, ' ' + self._lowered.c_name(struct) + postfix(struct) + ';')
         else:
             self._out.block(write_struct_body, ';')
         self._out.writeln()
+        if struct.optimize_layout or struct.pack_flags:
+            self._write_layout_assertions(struct)
+        if struct.pack_flags:
+            self._write_packed_accessors(struct)
+        if struct.columns:
+            self._write_columns(struct)
+
+    def _write_layout_assertions(self, struct):
+        c_type = self._lowered.c_type(struct)
+        layout = self._layouts.for_struct(struct)
+        message = quote(f'{c_type} does not have the layout the generators assume')
+        self._out.writeln(f'_Static_assert(sizeof({c_type}) == {layout.size}, {message});')
+        self._out.writeln(f'_Static_assert(_Alignof({c_type}) == {layout.alignment}, {message});')
+        for member in layout.fields:
+            self._out.writeln(f'_Static_assert(offsetof({c_type}, {member.name}) == {member.offset}, {message});')
+        self._out.writeln()
+
+    def _write_packed_accessors(self, struct):
+        c_type = self._lowered.c_type(struct)
+        for bits in self._layouts.for_struct(struct).bit_fields.values():
+            field = bits.field
+            word_type = self._lowered.c_type(bits.word_type)
+            word = f'value->{packed_flags_member}'
+            value_type = self._lowered.c_type(field.type)
+            stored = f'(({word} >> {bits.shift}) & {bits.mask:#x}u)'
+            if type(field.type) is Enumeration:
+                read = f'({value_type}) {with_offset(stored, field.type.first_ordinal)}'
+                written = f'({word_type}) {with_offset(field.name, -field.type.first_ordinal)}'
+            else:
+                read = f'{stored} != 0'
+                written = f'({word_type}) {field.name}'
+            self._before_block('static inline ', value_type, ' ',
+                               packed_field_getter(struct, field.name, f'const {c_type} *value'))
+            self._out.block(lambda: self._out.writeln('return ', read, ';'))
+            self._out.writeln()
+            self._before_block('static inline void ',
+                               packed_field_setter(struct, field.name, f'{c_type} *value', f'{value_type} {field.name}'))
+            self._out.block(lambda: self._out.writeln(
+                f'{word} = ({word_type}) (({word} & ~(({word_type}) {bits.mask:#x}u << {bits.shift})) '
+                f'| (({written} & {bits.mask:#x}u) << {bits.shift}));'))
+            self._out.writeln()
+
+    def _write_columns(self, struct):
+        if not is_columnar_struct(struct):
+            raise ValueError(f"Struct {struct.name} has columns but no fields or fields other than numbers and Booleans")
+        name = self._lowered.c_name(struct)
+        c_type = self._lowered.c_type(struct)
+        self._before_block('struct ', name, '_columns')
+        self._out.block(lambda: [self._out.writeln(self._lowered.c_type(field.type), ' *', field.name, ';')
+                                 for field in struct.fields], ';')
+        self._out.writeln()
+
+        def read(field, item):
+            if self._layouts.bit_field(struct, field.name) is not None:
+                return packed_field_getter(struct, field.name, '&' + item)
+            return f'{item}.{field.name}'
+
+        def write(field, item, value):
+            if self._layouts.bit_field(struct, field.name) is not None:
+                return packed_field_setter(struct, field.name, '&' + item, value) + ';'
+            return f'{item}.{field.name} = {value};'
+
+        self._before_block('static inline void ', name, '_to_columns(const ', c_type,
+                           ' *items, size_t count, const struct ', name, '_columns *columns)')
+        self._out.block(lambda: self._write_item_loop(
+            [f'columns->{field.name}[index] = {read(field, "items[index]")};' for field in struct.fields]))
+        self._out.writeln()
+
+        self._before_block('static inline void ', name, '_from_columns(const struct ', name,
+                           '_columns *columns, size_t count, ', c_type, ' *items)')
+        self._out.block(lambda: self._write_item_loop(
+            [f'items[index] = ({c_type}) {{0}};']
+            + [write(field, 'items[index]', f'columns->{field.name}[index]') for field in struct.fields]))
+        self._out.writeln()
+
+    def _write_item_loop(self, lines):
+        self._before_block('for (size_t index = 0; index < count; ++index)')
+        self._out.block(lambda: [self._out.writeln(line) for line in lines])
 
     def _before_block(self, *values):
         if self._style is Style.Knr:
@@ -91,6 +186,12 @@ class CHeaderGenerator:
             raise ValueError(f"Unknown style [{str(self._style)}]")
 
 
+def with_offset(expression: str, offset: int) -> str:
+    if offset == 0:
+        return expression
+    return f'({expression} {"+" if offset > 0 else "-"} {abs(offset)})'
+
+
 def postfix(type):
     return f'_{type.typedef_postfix}' if type.typedef_postfix else ''
 
@@ -0,0 +1,338 @@
+from typing import TextIO
+
+from c_interop.generator.c_to_string_generator import LiteralSegments, quote
+from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
+from c_interop.generator.format_runtime import FORMAT_RUNTIME
+from c_interop.generator.json_runtime import JSON_RUNTIME
+from c_interop.generator.layout import packed_field_getter, packed_field_setter
+from c_interop.generator.lowering import LoweredModule
+from c_interop.generator.style import Style
+from c_interop.model.model import Module, Struct, Enumeration, PrimitiveType, Array, List
+
+_integer_ranges = {
+    PrimitiveType.Int8: ('INT8_MIN', 'INT8_MAX'),
+    PrimitiveType.Int16: ('INT16_MIN', 'INT16_MAX'),
+    PrimitiveType.Int32: ('INT32_MIN', 'INT32_MAX'),
+    PrimitiveType.Int64: ('INT64_MIN', 'INT64_MAX'),
+    PrimitiveType.Integer: ('INT64_MIN', 'INT64_MAX'),
+    PrimitiveType.UInt8: ('0', 'UINT8_MAX'),
+    PrimitiveType.UInt16: ('0', 'UINT16_MAX'),
+    PrimitiveType.UInt32: ('0', 'UINT32_MAX'),
+    PrimitiveType.UInt64: ('0', 'UINT64_MAX')
+}
+
+
+def _escaped_size(length):
+    # a name byte takes at most six characters in JSON (\u00XX), so escaped spellings of a known name always fit
+    return 6 * length
+
+
+class CJsonGenerator:
+    """Generates a JSON encoder and a decoder for every enum and struct, working on the C types directly."""
+
+    def __init__(self, module: Module, style=Style.Knr, header_sink: TextIO = None, module_sink: TextIO = None,
+                 lowered: LoweredModule = None):
+        self.module = module
+        self._style = style
+        self._header_out = CodeWriter(CodeWriterMode.C, header_sink)
+        self._module_out = CodeWriter(CodeWriterMode.C, module_sink)
+        self._lowered = lowered if lowered is not None else LoweredModule(module)
+        self._layouts = self._lowered.layouts
+
+    def run(self):
+        self._header_out.writeln(FORMAT_RUNTIME.strip())
+        self._header_out.writeln()
+        self._header_out.writeln(JSON_RUNTIME.strip())
+        self._header_out.writeln()
+        for enum in self.module.enums:
+            self._write_enum_to_json(enum)
+            self._write_enum_from_json(enum)
+        for struct in self.module.structs:
+            self._write_struct_to_json(struct)
+            self._write_struct_from_json(struct)
+
+    def result(self):
+        return self._header_out.result(), self._module_out.result()
+
+    def _write_enum_to_json(self, enum: Enumeration):
+        signature = f'void {self._lowered.c_name(enum)}_to_json({self._lowered.c_type(enum)} value, struct json_buffer *buffer)'
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+
+        def write_switch_block():
+            for value in enum.values:
+                self._module_out.writeln(f'case {value}:')
+                self._module_out.indent()
+                self._module_out.writeln(f'json_literal(buffer, {quote(quote(value))});')
+                self._module_out.writeln('break;')
+                self._module_out.unindent()
+            self._module_out.writeln('default:')
+            self._module_out.indent()
+            self._module_out.writeln('json_append_signed(buffer, (int64_t) value);')
+            self._module_out.unindent()
+
+        def write_body():
+            self._before_block('switch (value)')
+            self._module_out.block(write_switch_block)
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _write_enum_from_json(self, enum: Enumeration):
+        c_type = self._lowered.c_type(enum)
+        signature = f'int {self._lowered.c_name(enum)}_from_json(struct json_reader *reader, {c_type} *value)'
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+
+        def write_body():
+            self._module_out.writeln(f'char name_buffer[{_escaped_size(max(len(value) for value in enum.values))}];')
+            self._module_out.writeln('const char *name;')
+            self._module_out.writeln('size_t length;')
+            self._before_block('if (json_read_name(reader, name_buffer, sizeof(name_buffer), &name, &length) < 0)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+            self._write_name_switch(
+                'name',
+                'length',
+                [(value, [f'*value = {value};', 'return 0;']) for value in enum.values],
+                [])
+            self._module_out.writeln(f'return json_fail(reader, {quote(f"Unknown {enum.name} value")});')
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _write_struct_to_json(self, struct: Struct):
+        signature = (f'void {self._lowered.c_name(struct)}_to_json(const {self._lowered.c_type(struct)} *value, '
+                     f'struct json_buffer *buffer)')
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+        segments = LiteralSegments(self._module_out, 'json_literal')
+
+        def write_body():
+            separator = '{'
+            for field in struct.fields:
+                segments.literal(f'{separator}{quote(field.name)}:')
+                separator = ','
+                if type(field.type) in [Array, List]:
+                    write_elements(field)
+                else:
+                    segments.code(self._append_value(field.type, self._member(struct, field)))
+            segments.literal('}' if struct.fields else '{}')
+            segments.flush()
+
+        def write_elements(field):
+            element_type = field.type.element_type
+            if type(element_type) in [Array, List]:
+                raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
+            segments.literal('[')
+            segments.flush()
+            self._before_block(f'for (size_t index = 0; index < {self._element_count(field)}; ++index)')
+
+            def write_element():
+                self._before_block('if (index > 0)')
+                self._module_out.block(lambda: self._module_out.writeln('json_literal(buffer, ",");'))
+                self._module_out.writeln(self._append_value(element_type, f'value->{field.name}[index]'))
+
+            self._module_out.block(write_element)
+            segments.literal(']')
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _write_struct_from_json(self, struct: Struct):
+        for field in struct.fields:
+            if type(field.type) in [Array, List]:
+                self._write_elements_from_json(struct, field)
+
+        name = self._lowered.c_name(struct)
+        c_type = self._lowered.c_type(struct)
+        signature = f'int {name}_from_json(struct json_reader *reader, {c_type} *value)'
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+
+        def write_body():
+            key_size = max([len(field.name) for field in struct.fields], default=1)
+            self._module_out.writeln(f'char key_buffer[{_escaped_size(key_size)}];')
+            self._module_out.writeln('const char *key;')
+            self._module_out.writeln('size_t key_length;')
+            self._module_out.writeln('memset(value, 0, sizeof(*value));')
+            self._before_block(f'if (json_expect(reader, \'{{\', {quote(f"Expected an object for {struct.name}")}) < 0)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+            self._before_block('if (json_consume(reader, \'}\'))')
+            self._module_out.block(lambda: self._module_out.writeln('return 0;'))
+            self._module_out.write('do ')
+            self._module_out.block(write_member, ' while (json_consume(reader, \',\'));')
+            self._module_out.writeln(f'return json_expect(reader, \'}}\', {quote(f"Expected , or }} in {struct.name}")});')
+
+        def write_member():
+            self._before_block('if (json_read_key(reader, key_buffer, sizeof(key_buffer), &key, &key_length) < 0)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+            self._module_out.writeln('int status;')
+            cases = []
+            for field in struct.fields:
+                if type(field.type) in [Array, List]:
+                    statements = [f'status = {name}_{field.name}_from_json(reader, value);']
+                elif self._layouts.bit_field(struct, field.name) is not None:
+                    statements = ([f'{self._lowered.c_type(field.type)} packed_value = 0;']
+                                  + self._read_value(field.type, 'packed_value')
+                                  + [packed_field_setter(struct, field.name, 'value', 'packed_value') + ';'])
+                else:
+                    statements = self._read_value(field.type, f'value->{field.name}')
+                cases.append((field.name, statements + ['goto next;']))
+            self._write_name_switch('key', 'key_length', cases, [])
+            self._module_out.writeln('status = json_skip_value(reader, 0);')
+            self._module_out.unindent()
+            self._module_out.writeln('next:')
+            self._module_out.indent()
+            self._before_block('if (status < 0)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _write_elements_from_json(self, struct: Struct, field):
+        element_type = field.type.element_type
+        if type(element_type) in [Array, List]:
+            raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
+        c_type = self._lowered.c_type(struct)
+        label = f'{struct.name}.{field.name}'
+        unbounded = type(field.type) is List and field.type.maximum_length is None
+        capacity = field.type.length if type(field.type) is Array else field.type.maximum_length
+        self._before_block(f'static int {self._lowered.c_name(struct)}_{field.name}_from_json('
+                           f'struct json_reader *reader, {c_type} *value)')
+
+        def write_body():
+            self._module_out.writeln('size_t count = 0;')
+            if unbounded:
+                write_capacity_scan()
+            self._before_block(f'if (json_expect(reader, \'[\', {quote(f"Expected an array for {label}")}) < 0)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+            self._before_block('if (!json_consume(reader, \']\'))')
+            self._module_out.block(write_elements)
+            if type(field.type) is Array:
+                self._before_block(f'if (count != {capacity})')
+                self._module_out.block(lambda: self._module_out.writeln(
+                    f'return json_fail(reader, {quote(f"Wrong number of elements for {label}")});'))
+            else:
+                self._module_out.writeln(f'value->{field.name}_length = count;')
+            self._module_out.writeln('return 0;')
+
+        def write_capacity_scan():
+            self._module_out.writeln('struct json_reader scan = *reader;')
+            self._module_out.writeln('size_t capacity = 0;')
+            self._before_block('if (json_consume(&scan, \'[\') && !json_consume(&scan, \']\'))')
+
+            def write_scan():
+                self._module_out.write('do ')
+                self._module_out.block(write_scan_element, ' while (json_consume(&scan, \',\'));')
+
+            def write_scan_element():
+                self._before_block('if (json_skip_value(&scan, 0) < 0)')
+                self._module_out.block(lambda: self._module_out.writeln('return json_fail(reader, scan.error);'))
+                self._module_out.writeln('++capacity;')
+
+            self._module_out.block(write_scan)
+            element_c_type = self._lowered.c_type(element_type)
+            self._module_out.writeln(f'value->{field.name} = json_reader_allocate(reader, capacity * sizeof({element_c_type}), '
+                                     f'_Alignof({element_c_type}));')
+            self._before_block(f'if (value->{field.name} == NULL)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+
+        def write_elements():
+            self._module_out.write('do ')
+            self._module_out.block(write_element, ' while (json_consume(reader, \',\'));')
+            self._before_block(f'if (json_expect(reader, \']\', {quote(f"Expected , or ] in {label}")}) < 0)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+
+        def write_element():
+            self._before_block(f'if (count == {"capacity" if unbounded else capacity})')
+            self._module_out.block(lambda: self._module_out.writeln(
+                f'return json_fail(reader, {quote(f"Too many elements for {label}")});'))
+            self._module_out.writeln('int status;')
+            for line in self._read_value(element_type, f'value->{field.name}[count]'):
+                self._module_out.writeln(line)
+            self._before_block('if (status < 0)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+            self._module_out.writeln('++count;')
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _write_name_switch(self, name, length, cases, default):
+        cases_by_length = dict()
+        for text, statements in cases:
+            cases_by_length.setdefault(len(text), []).append((text, statements))
+
+        def write_cases():
+            for text_length, length_cases in sorted(cases_by_length.items()):
+                self._module_out.writeln(f'case {text_length}:')
+                self._module_out.indent()
+                for text, statements in length_cases:
+                    self._before_block(f'if (memcmp({name}, {quote(text)}, {text_length}) == 0)')
+                    self._module_out.block(lambda: [self._module_out.writeln(line) for line in statements])
+                self._module_out.writeln('break;')
+                self._module_out.unindent()
+            for line in default:
+                self._module_out.writeln(line)
+
+        self._before_block(f'switch ({length})')
+        self._module_out.block(write_cases)
+
+    def _append_value(self, t, expression):
+        if type(t) is Struct:
+            return f'{self._lowered.c_name(t)}_to_json(&{expression}, buffer);'
+        elif type(t) is Enumeration:
+            return f'{self._lowered.c_name(t)}_to_json({expression}, buffer);'
+        elif t is PrimitiveType.Boolean:
+            return f'json_append_bool(buffer, {expression});'
+        elif t is PrimitiveType.String:
+            return f'json_append_string(buffer, {expression});'
+        elif t in [PrimitiveType.Float, PrimitiveType.Double]:
+            return f'json_append_double(buffer, {expression});'
+        elif t in [PrimitiveType.UInt8, PrimitiveType.UInt16, PrimitiveType.UInt32, PrimitiveType.UInt64]:
+            return f'json_append_unsigned(buffer, {expression});'
+        elif type(t) is PrimitiveType:
+            return f'json_append_signed(buffer, {expression});'
+        raise ValueError(f"Unsupported type: {t}")
+
+    def _read_value(self, t, target):
+        if type(t) in [Struct, Enumeration]:
+            return [f'status = {self._lowered.c_name(t)}_from_json(reader, &{target});']
+        elif t is PrimitiveType.Boolean:
+            return [f'status = json_read_bool(reader, &{target});']
+        elif t is PrimitiveType.String:
+            return [f'status = json_read_string(reader, &{target});']
+        elif t in [PrimitiveType.Float, PrimitiveType.Double]:
+            return ['double number;',
+                    'status = json_read_double(reader, &number);',
+                    f'{target} = ({self._lowered.c_type(t)}) number;']
+        elif t in _integer_ranges:
+            minimum, maximum = _integer_ranges[t]
+            if minimum == '0':
+                return ['uint64_t number;',
+                        f'status = json_read_unsigned(reader, {maximum}, &number);',
+                        f'{target} = ({self._lowered.c_type(t)}) number;']
+            return ['int64_t number;',
+                    f'status = json_read_signed(reader, {minimum}, {maximum}, &number);',
+                    f'{target} = ({self._lowered.c_type(t)}) number;']
+        raise ValueError(f"Unsupported type: {t}")
+
+    def _member(self, struct, field):
+        if self._layouts.bit_field(struct, field.name) is not None:
+            return packed_field_getter(struct, field.name, 'value')
+        return f'value->{field.name}'
+
+    def _element_count(self, field):
+        if type(field.type) is Array:
+            return field.type.length
+        length = f'value->{field.name}_length'
+        if field.type.maximum_length is None:
+            return length
+        return f'({length} < {field.type.maximum_length} ? {length} : {field.type.maximum_length})'
+
+    def _before_block(self, *values):
+        if self._style is Style.Knr:
+            self._module_out.write(*values, ' ')
+        elif self._style == Style.Bsd:
+            self._module_out.writeln(*values)
+        else:
+            raise ValueError(f"Unknown style [{str(self._style)}]")
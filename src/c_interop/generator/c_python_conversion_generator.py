@@ -1,36 +1,356 @@
+from enum import Enum
+from typing import TextIO
+
+from c_interop.generator.arena_runtime import ARENA_RUNTIME
 from c_interop.generator.attributes import Attributes, MacroCall, quote
+from c_interop.generator.buffer_runtime import BUFFER_RUNTIME
+from c_interop.generator.c_python_view_generator import primitive_to_python
 from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
-from c_interop.generator.ctypes import CTypes
+from c_interop.generator.columns_runtime import COLUMNS_RUNTIME
+from c_interop.generator.conversion_table_runtime import CONVERSION_TABLE_RUNTIME
+from c_interop.generator.layout import is_flat_struct, is_columnar_struct, packed_flags_member, packed_field_getter, \
+    packed_field_setter
+from c_interop.generator.lowering import LoweredModule
+from c_interop.generator.parallel_runtime import PARALLEL_RUNTIME
+from c_interop.generator.python_codec_generator import contains_pointers, struct_code
+from c_interop.generator.state_runtime import STATE_RUNTIME
+from c_interop.generator.update_runtime import UPDATE_RUNTIME
 from c_interop.model.model import Module, Struct, Enumeration, PrimitiveType, List, Array
 
 
+class ConversionMode(Enum):
+    Unrolled = 1
+    Table = 2
+
+
+class ArrayRepresentation(Enum):
+    List = 1
+    ArrayModule = 2
+    MemoryView = 3
+
+
 class CPythonConversionGenerator:
-    def __init__(self, module: Module, module_prefix=''):
-        self._ctypes = CTypes()
+    def __init__(self, module: Module, module_prefix='', mode=ConversionMode.Unrolled,
+                 array_representation=ArrayRepresentation.List, header_sink: TextIO = None, module_sink: TextIO = None,
+                 lowered: LoweredModule = None):
+        self._lowered = lowered if lowered is not None else LoweredModule(module)
         self._module = module
+        self._layouts = self._lowered.layouts
         self._module_prefix = module_prefix
+        self._mode = mode
+        self._array_representation = array_representation
         self._protocol_name = 'python_' + module.name + '_protocol'
-        self._header = CodeWriter(CodeWriterMode.C)
-        self._code = CodeWriter(CodeWriterMode.C)
-        self._attributes = Attributes(self._ctypes)
+        self._state_name = module.name + '_conversion_state'
+        self._header = CodeWriter(CodeWriterMode.C, header_sink)
+        self._code = CodeWriter(CodeWriterMode.C, module_sink)
+        self._attributes = Attributes(self._lowered, self._attribute_key)
+        self._update_elements_written = set()
+        self._padding_cleared = set()
 
     def run(self):
+        self._header.writeln(ARENA_RUNTIME.strip())
+        self._header.writeln()
+        # the runtimes are only written where generated code uses them
+        if self._mode is ConversionMode.Table or self._uses_buffers():
+            self._code.writeln(BUFFER_RUNTIME.strip())
+            self._code.writeln()
+        if any(struct.columns for struct in self._module.structs):
+            self._code.writeln(COLUMNS_RUNTIME.strip())
+            self._code.writeln()
+        if any(not contains_pointers(struct) for struct in self._module.structs):
+            self._code.writeln(PARALLEL_RUNTIME.strip())
+            self._code.writeln()
+        if self._mode is ConversionMode.Table:
+            self._code.writeln(CONVERSION_TABLE_RUNTIME.strip())
+            self._code.writeln()
+        elif self._mode is ConversionMode.Unrolled:
+            self._write_attribute_macros()
+        else:
+            raise ValueError(f"Unknown conversion mode [{str(self._mode)}]")
+        self._code.writeln(UPDATE_RUNTIME.strip())
+        self._code.writeln()
+        self._write_conversion_state()
+        self._write_conversion_init()
+        if self._mode is ConversionMode.Table:
+            self._write_conversion_types()
         for enum in self._module.enums:
-            self._write_enum_python_to_c_conversion(enum)
-            self._write_enum_c_to_python_conversion(enum)
+            if self._mode is ConversionMode.Table:
+                self._write_enum_table_conversions(enum)
+            else:
+                self._write_enum_python_to_c_conversion(enum)
+                self._write_enum_c_to_python_conversion(enum)
         for struct in self._module.structs:
-            self._write_struct_python_to_c_conversion(struct)
-            self._write_struct_c_to_python_conversion(struct)
+            if self._mode is ConversionMode.Table:
+                self._write_struct_table_conversions(struct)
+            else:
+                self._write_struct_python_to_c_conversion(struct)
+                self._write_struct_c_to_python_conversion(struct)
+            self._write_struct_array_python_to_c_conversion(struct)
+            self._write_struct_array_c_to_python_conversion(struct)
+            self._write_struct_update_python(struct)
+            if is_flat_struct(struct):
+                self._write_struct_array_memoryview(struct)
+            if not contains_pointers(struct):
+                self._write_struct_array_pack(struct)
+            if struct.columns:
+                self._write_struct_columns(struct)
 
     def result(self):
         return self._header.result(), self._code.result()
 
+    def _uses_buffers(self):
+        for struct in self._module.structs:
+            if struct.columns:
+                return True
+            for field in struct.fields:
+                if type(field.type) in [List, Array] and is_buffer_primitive(field.type.element_type):
+                    return True
+        return False
+
+    def _write_attribute_macros(self):
+        out = self._code
+        out.writeln('#ifndef with_attribute_for_key')
+        out.writeln('#define with_attribute_for_key(owner, key, value_name, action) \\')
+        out.writeln('    { \\')
+        out.writeln('        PyObject *value_name = PyObject_GetAttr(owner, key); \\')
+        out.writeln('        if (value_name == NULL) { \\')
+        out.writeln('            fail_with_message("Missing attribute [%s]", PyUnicode_AsUTF8(key)); \\')
+        out.writeln('        } else { \\')
+        out.writeln('            action; \\')
+        out.writeln('            Py_DECREF(value_name); \\')
+        out.writeln('        } \\')
+        out.writeln('    }')
+        out.writeln('#endif')
+        out.writeln()
+
+    def _attribute_names(self):
+        names = ['value'] if self._module.enums else []
+        for struct in self._module.structs:
+            for field in struct.fields:
+                if field.name not in names:
+                    names.append(field.name)
+        return names
+
+    def _write_conversion_state(self):
+        self._header.write('struct ', self._state_name, ' ')
+
+        def write_body(out):
+            for t in self._module.enums + self._module.structs:
+                out.writeln('PyObject *', t.name, '_class;')
+            for enum in self._module.enums:
+                out.writeln('PyObject *', enum.name, '_members[', str(len(enum.values)), '];')
+            for name in self._attribute_names():
+                out.writeln('PyObject *', name, '_key;')
+            if self._array_representation is ArrayRepresentation.ArrayModule:
+                out.writeln('PyObject *array_class;')
+
+        self._header.block(write_body, ';')
+        self._header.writeln()
+        prefix = self._module.name + '_conversion'
+        self._header.writeln('#if PY_VERSION_HEX >= 0x030C0000')
+        self._header.writeln('#define ', prefix, '_interpreter_slot {Py_mod_multiple_interpreters, Py_MOD_PER_INTERPRETER_GIL_SUPPORTED},')
+        self._header.writeln('#else')
+        self._header.writeln('#define ', prefix, '_interpreter_slot')
+        self._header.writeln('#endif')
+        self._header.writeln('#if PY_VERSION_HEX >= 0x030D0000')
+        self._header.writeln('#define ', prefix, '_gil_slot {Py_mod_gil, Py_MOD_GIL_NOT_USED},')
+        self._header.writeln('#else')
+        self._header.writeln('#define ', prefix, '_gil_slot')
+        self._header.writeln('#endif')
+        self._header.writeln()
+        self._header.writeln('/* Slots for a multi-phase module whose m_size is sizeof(struct ', self._state_name, '), each followed by a comma. */')
+        self._header.writeln('#define ', prefix, '_slots \\')
+        self._header.writeln('    {Py_mod_exec, (void *) ', prefix, '_exec}, \\')
+        self._header.writeln('    ', prefix, '_interpreter_slot \\')
+        self._header.writeln('    ', prefix, '_gil_slot')
+        self._header.writeln()
+
+    def _write_conversion_init(self):
+        prefix = self._module.name + '_conversion'
+        state_type = 'struct ' + self._state_name
+        registry_key = self._module_prefix + self._protocol_name + '.conversion_state'
+
+        self._code.writeln('#include <stdatomic.h>')
+        self._code.writeln('#include <stdint.h>')
+        self._code.writeln()
+        self._code.writeln(STATE_RUNTIME.strip())
+        self._code.writeln()
+        self._code.writeln('static _Thread_local int64_t ', prefix, '_cached_interpreter = -1;')
+        self._code.writeln('static _Thread_local unsigned long ', prefix, '_cached_generation;')
+        self._code.writeln('static _Thread_local ', state_type, ' *', prefix, '_cached_state;')
+        self._code.writeln('static atomic_ulong ', prefix, '_generation;')
+        self._code.writeln()
+
+        signature = 'int ' + prefix + '_exec(PyObject *module)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_exec_body(out):
+            out.writeln(state_type, ' *state = PyModule_GetState(module);')
+            out.write('if (state == NULL) ')
+            out.block(lambda: out.writeln('return -1;'))
+            out.writeln('PyObject *protocol_module = PyImport_ImportModule("', self._module_prefix + self._protocol_name, '");')
+            out.write('if (protocol_module == NULL) ')
+            out.block(lambda: out.writeln('return -1;'))
+            for t in self._module.enums + self._module.structs:
+                out.writeln(self._class_reference(t), ' = PyObject_GetAttrString(protocol_module, "', t.name, '");')
+                out.write('if (', self._class_reference(t), ' == NULL) ')
+                out.block(lambda: out.writeln('goto error;'))
+            for enum in self._module.enums:
+                for index, value in enumerate(enum.values):
+                    member = self._member_reference(enum, str(index))
+                    out.writeln(member, ' = PyObject_GetAttrString(', self._class_reference(enum), ', "', value, '");')
+                    out.write('if (', member, ' == NULL) ')
+                    out.block(lambda: out.writeln('goto error;'))
+            for name in self._attribute_names():
+                out.writeln(self._attribute_key(name), ' = PyUnicode_InternFromString("', name, '");')
+                out.write('if (', self._attribute_key(name), ' == NULL) ')
+                out.block(lambda: out.writeln('goto error;'))
+            if self._array_representation is ArrayRepresentation.ArrayModule:
+                out.writeln('PyObject *array_module = PyImport_ImportModule("array");')
+                out.write('if (array_module == NULL) ')
+                out.block(lambda: out.writeln('goto error;'))
+                out.writeln(self._array_class_reference(), ' = PyObject_GetAttrString(array_module, "array");')
+                out.writeln('Py_DECREF(array_module);')
+                out.write('if (', self._array_class_reference(), ' == NULL) ')
+                out.block(lambda: out.writeln('goto error;'))
+            out.writeln('PyObject *capsule = PyCapsule_New(state, "', registry_key, '", NULL);')
+            out.write('if (capsule == NULL) ')
+            out.block(lambda: out.writeln('goto error;'))
+            out.writeln('int status = state_registry_set("', registry_key, '", capsule);')
+            out.writeln('Py_DECREF(capsule);')
+            out.write('if (status < 0) ')
+            out.block(lambda: out.writeln('goto error;'))
+            out.writeln('atomic_fetch_add(&', prefix, '_generation, 1);')
+            out.writeln('Py_DECREF(protocol_module);')
+            out.writeln('return 0;')
+            out.unindent()
+            out.writeln('error:')
+            out.indent()
+            out.writeln('Py_DECREF(protocol_module);')
+            out.writeln('return -1;')
+
+        self._code.block(write_exec_body)
+        self._code.writeln()
+
+        signature = 'int ' + prefix + '_traverse(PyObject *module, visitproc visit, void *arg)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_traverse_body(out):
+            out.writeln(state_type, ' *state = PyModule_GetState(module);')
+            out.write('if (state != NULL) ')
+            out.block(lambda: [out.writeln('Py_VISIT(', entry, ');') for entry in self._state_entries()])
+            out.writeln('return 0;')
+
+        self._code.block(write_traverse_body)
+        self._code.writeln()
+
+        signature = 'int ' + prefix + '_clear(PyObject *module)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_clear_body(out):
+            out.writeln(state_type, ' *state = PyModule_GetState(module);')
+            out.write('if (state == NULL) ')
+            out.block(lambda: out.writeln('return 0;'))
+            out.writeln('state_registry_remove("', registry_key, '", state);')
+            out.writeln('atomic_fetch_add(&', prefix, '_generation, 1);')
+            for entry in self._state_entries():
+                out.writeln('Py_CLEAR(', entry, ');')
+            out.writeln('return 0;')
+
+        self._code.block(write_clear_body)
+        self._code.writeln()
+
+        signature = 'void ' + prefix + '_free(void *module)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+        self._code.block(lambda out: out.writeln(prefix, '_clear((PyObject *) module);'))
+        self._code.writeln()
+
+        signature = state_type + ' *' + prefix + '_state_get(void)'
+        self._header.writeln(signature, ';')
+        self._code.writeln('/* Returns the state of the current interpreter, cached per thread. Sets an exception and returns NULL if')
+        self._code.writeln(' * no module using ', prefix, '_exec has been initialized in it. The state is registered by module')
+        self._code.writeln(' * name, so the module initialized last in an interpreter provides it. */')
+        self._code.write(signature, ' ')
+
+        def write_state_get_body(out):
+            out.writeln('int64_t interpreter = PyInterpreterState_GetID(PyInterpreterState_Get());')
+            out.writeln('unsigned long generation = atomic_load(&', prefix, '_generation);')
+            out.write('if (interpreter == ', prefix, '_cached_interpreter && generation == ', prefix, '_cached_generation) ')
+            out.block(lambda: out.writeln('return ', prefix, '_cached_state;'))
+            out.writeln(state_type, ' *state = state_registry_get("', registry_key, '");')
+            out.write('if (state == NULL) ')
+            out.block(lambda: [
+                out.write('if (!PyErr_Occurred()) '),
+                out.block(lambda: out.writeln('PyErr_SetString(PyExc_RuntimeError, "', self._module.name,
+                                              ' conversion is not initialized in this interpreter");')),
+                out.writeln('return NULL;')])
+            out.writeln(prefix, '_cached_interpreter = interpreter;')
+            out.writeln(prefix, '_cached_generation = generation;')
+            out.writeln(prefix, '_cached_state = state;')
+            out.writeln('return state;')
+
+        self._code.block(write_state_get_body)
+        self._code.writeln()
+
+    def _state_entries(self):
+        entries = [self._class_reference(t) for t in self._module.enums + self._module.structs]
+        for enum in self._module.enums:
+            entries += [self._member_reference(enum, str(index)) for index in range(len(enum.values))]
+        entries += [self._attribute_key(name) for name in self._attribute_names()]
+        if self._array_representation is ArrayRepresentation.ArrayModule:
+            entries.append(self._array_class_reference())
+        return entries
+
+    def _write_state_lookup(self, out, failure):
+        out.writeln('struct ', self._state_name, ' *state = ', self._module.name, '_conversion_state_get();')
+        out.write('if (state == NULL) ')
+        out.block(lambda: out.writeln('return ', failure, ';'))
+
+    def _state_offset(self, entry):
+        return 'offsetof(struct ' + self._state_name + ', ' + entry + ')'
+
+    def _class_reference(self, t):
+        return 'state->' + t.name + '_class'
+
+    def _array_class_reference(self):
+        return 'state->array_class'
+
+    def _buffer_format(self, element_type):
+        if self._array_representation is ArrayRepresentation.List or not is_buffer_primitive(element_type):
+            return None
+        if self._array_representation is ArrayRepresentation.ArrayModule and element_type is PrimitiveType.Boolean:
+            return None
+        return struct_code(element_type)
+
+    def _buffer_to_python(self, element_type, items, length):
+        array_class = (self._array_class_reference()
+                       if self._array_representation is ArrayRepresentation.ArrayModule
+                       else 'NULL')
+        return (f'c_array_to_buffer_object({array_class}, "{self._buffer_format(element_type)}", '
+                f'{items}, {length}, sizeof({items}[0]))')
+
+    def _member(self, struct, field):
+        if self._layouts.bit_field(struct, field.name) is not None:
+            return packed_field_getter(struct, field.name, '&c_struct')
+        return 'c_struct.' + field.name
+
+    def _member_reference(self, enum, index):
+        return 'state->' + enum.name + '_members[' + index + ']'
+
+    def _attribute_key(self, attribute_name):
+        return 'state->' + attribute_name + '_key'
+
     def _write_enum_python_to_c_conversion(self, enum):
-        signature = self._ctypes.for_type(enum) + ' ' + enum.name + '_to_c(PyObject *python_enum)'
+        signature = self._lowered.c_type(enum) + ' ' + enum.name + '_to_c(PyObject *python_enum)'
         self._header.writeln(signature, ';')
         self._code.write(signature, ' ')
 
         def write_body(out):
+            self._write_state_lookup(out, '(' + self._lowered.c_type(enum) + ') 0')
             out.writeln('int ordinal;')
             (self._attributes.with_int64_attribute(
                 'python_enum',
@@ -51,41 +371,78 @@ class CPythonConversionGenerator:
         self._code.writeln()
 
     def _write_enum_c_to_python_conversion(self, enum):
-        signature = 'PyObject * ' + enum.name + '_to_python(' + self._ctypes.for_type(enum) + ' value)'
+        signature = 'PyObject * ' + enum.name + '_to_python(' + self._lowered.c_type(enum) + ' value)'
         self._header.writeln(signature, ';')
         self._code.write(signature, ' ')
 
         def write_body(out):
-            out.writeln('static PyObject *enum_class = NULL;')
-            out.write('if (enum_class == NULL) ')
-            out.block(lambda: out.writeln('enum_class = load_class("', self._module_prefix + self._protocol_name, '", "', enum.name, '");'))
-            out.writeln('PyObject *result = PyObject_CallFunction(enum_class, "i", value);')
-            out.write('if (result == NULL) ')
-            out.block(lambda: out.writeln(
-                'fail_with_message("Unable to convert ordinal value [%d] to enum ', enum.name, ': ", value);'))
+            self._write_state_lookup(out, 'NULL')
+            out.writeln('int index = (int) value - ', str(enum.first_ordinal), ';')
+            out.write('if (index < 0 || index >= ', str(len(enum.values)), ') ')
+
+            def write_failure(failure):
+                failure.writeln('fail_with_message("Unable to convert ordinal value [%d] to enum ', enum.name,
+                                ': ", value);')
+                failure.writeln('return NULL;')
+
+            out.block(write_failure)
+            out.writeln('PyObject *result = ', self._member_reference(enum, 'index'), ';')
+            out.writeln('Py_INCREF(result);')
             out.writeln('return result;')
 
         self._code.block(write_body)
         self._code.writeln()
 
     def _write_struct_python_to_c_conversion(self, struct):
-        signature = self._ctypes.for_type(struct) + ' ' + struct.name + '_to_c(PyObject *python_struct)'
+        signature = (self._lowered.c_type(struct) + ' ' + struct.name
+                     + '_to_c(PyObject *python_struct, struct conversion_arena *arena)')
         self._header.writeln(signature, ';')
         self._code.write(signature, ' ')
 
         def write_body(out):
-            out.writeln(self._ctypes.for_type(struct), ' result = {0};')
+            out.writeln(self._lowered.c_type(struct), ' result = {0};')
+            self._write_state_lookup(out, 'result')
             for field in struct.fields:
+                if self._layouts.bit_field(struct, field.name) is not None:
+                    packed_assignment(field).writeln(out)
+                    continue
                 (assignment(f'result.{field.name}', field.name, field.type)
                  .writeln(out))
             out.writeln('return result;')
 
+        def packed_assignment(field):
+            if type(field.type) is Enumeration:
+                return self._attributes.with_attribute(
+                    'python_struct',
+                    field.name,
+                    packed_field_setter(struct, field.name, '&result', field.type.name + '_to_c(python_value)'))
+            # PyObject_IsTrue fails with -1, which must not end up in the flag
+            return self._attributes.with_attribute(
+                'python_struct',
+                field.name,
+                'int truth = PyObject_IsTrue(python_value); '
+                + 'if (truth < 0) { fail_with_message("Unable to convert [%s] to bool", "' + field.name + '"); } '
+                + packed_field_setter(struct, field.name, '&result', 'truth > 0'))
+
         def assignment(target, field_name, value_type):
-            if type(value_type) is Struct or type(value_type) is Enumeration:
+            if type(value_type) is Struct:
+                return self._attributes.with_attribute(
+                    'python_struct',
+                    field_name,
+                    target + ' = ' + value_type.name + '_to_c(python_value, arena)')
+            elif type(value_type) is Enumeration:
                 return self._attributes.with_attribute(
                     'python_struct',
                     field_name,
                     target + ' = ' + value_type.name + '_to_c(python_value)')
+            elif value_type is PrimitiveType.String:
+                # None becomes NULL without an exception, any other NULL failed to convert
+                return self._attributes.with_attribute(
+                    'python_struct',
+                    field_name,
+                    target + ' = conversion_arena_utf8(arena, python_value); '
+                    + 'if (' + target + ' == NULL && PyErr_Occurred()) { '
+                    + 'fail_with_message("Unable to convert [%s] to a string", "' + field_name + '"); }')
             # TODO implement
             # elif type(value_type) is PrimitiveType and value_type == PrimitiveType.Boolean:
                 # return self._attributes.with_int64_attribute(
@@ -108,6 +465,38 @@ class CPythonConversionGenerator:
                     'python_struct',
                     field_name,
                     target + ' = ' + field_name)
+            elif type(value_type) is List and value_type.maximum_length is None:
+                return self._attributes.with_attribute(
+                    'python_struct',
+                    field_name,
+                    self._attributes.with_arena_list_elements(
+                        'python_value',
+                        value_type,
+                        target,
+                        f'{target}[item_index] = ' + python_item_to_c(value_type.element_type)))
+            elif type(value_type) in [List, Array] and is_buffer_primitive(value_type.element_type):
+                if type(value_type) is List:
+                    capacity = value_type.maximum_length
+                    elements = self._attributes.with_list_elements(
+                        'python_value',
+                        value_type,
+                        item_assignment(f'{target}[item_index]', value_type.element_type))
+                else:
+                    capacity = value_type.length
+                    elements = self._attributes.with_array_elements(
+                        'python_value',
+                        value_type,
+                        item_assignment(f'{target}[item_index]', value_type.element_type))
+                return self._attributes.with_attribute(
+                    'python_struct',
+                    field_name,
+                    self._attributes.with_buffer_or_elements(
+                        target,
+                        capacity,
+                        type(value_type) is Array,
+                        f'&{target}_length' if type(value_type) is List else 'NULL',
+                        struct_code(value_type.element_type),
+                        elements))
             elif type(value_type) is List:
                 return self._attributes.with_list_attribute_elements(
                     'python_struct',
@@ -125,45 +514,33 @@ class CPythonConversionGenerator:
                 raise ValueError(f'Unsupported type [{value_type.name}] of field [{struct.name}.{field_name}]')
 
         def item_assignment(target, value_type):
-            if type(value_type) is Struct or type(value_type) is Enumeration:
-                return target + ' = ' + value_type.name + '_to_c(item_value)'
-            # TODO implement
-            # elif type(value_type) is PrimitiveType and value_type == PrimitiveType.Boolean:
-            # return target + ' = ' + field_name)
-            elif type(value_type) is PrimitiveType and value_type.is_integer:
-                # TODO check value range! So easy to breach them from the python side ^^
-                return target + ' = ' + integer_conversion_to_c(value_type, 'item_value')
-            elif type(value_type) is PrimitiveType and value_type in [PrimitiveType.Float, PrimitiveType.Double]:
-                return target + ' = ' + 'item_value'
-            elif type(value_type) in [List, Array]:
-                raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
-            else:
-                # TODO implement the missing types
-                raise ValueError(f'Unsupported type [{value_type.name}] of List / Array item.')
+            # the template loops of bounded Lists and Arrays leave the error check to the action
+            return (target + ' = ' + python_item_to_c(value_type) + '; '
+                    + 'if (PyErr_Occurred()) { fail_with_message("Unable to convert item [%zd] of [%s]", '
+                    + 'item_index, "' + target + '"); }')
 
         self._code.block(write_body)
         self._code.writeln()
 
     def _write_struct_c_to_python_conversion(self, struct):
-        signature = 'PyObject * ' + struct.name + '_to_python(' + self._ctypes.for_type(struct) + ' c_struct)'
+        signature = 'PyObject * ' + struct.name + '_to_python(' + self._lowered.c_type(struct) + ' c_struct)'
         self._header.writeln(signature, ';')
         self._code.write(signature, ' ')
 
         def write_body(out):
-            out.writeln('static PyObject *struct_class = NULL;')
-            out.write('if (struct_class == NULL) ')
-            out.block(lambda: out.writeln('struct_class = load_class("', self._module_prefix + self._protocol_name, '", "', struct.name, '");'))
-            out.writeln('PyObject *result = PyObject_CallFunction(struct_class, "");')
+            self._write_state_lookup(out, 'NULL')
+            out.writeln('PyObject *result = PyObject_CallFunction(', self._class_reference(struct), ', "");')
             out.write('if (result == NULL) ')
             out.block(lambda: out.writeln(
                 'fail_with_message("Unable to instantiate struct ', struct.name, '");'))
             for field in struct.fields:
+                member = self._member(struct, field)
                 if type(field.type) is Struct or type(field.type) is Enumeration:
                     (MacroCall(
                         'set_python_attribute',
                         'result',
                         quote(field.name),
-                        field.type.name + '_to_python(c_struct.' + field.name + ')')
+                        field.type.name + '_to_python(' + member + ')')
                      .writeln(out))
                 elif type(field.type) is PrimitiveType and field.type.is_integer:
                     (MacroCall(
@@ -179,7 +556,7 @@ class CPythonConversionGenerator:
                 elif field.type is PrimitiveType.Boolean:
                     (MacroCall(
                         'with_pybool',
-                        'c_struct.' + field.name,
+                        member,
                         'value',
                         MacroCall(
                             'set_python_attribute',
@@ -209,6 +586,21 @@ class CPythonConversionGenerator:
                             quote(field.name),
                             'value'))
                      .writeln(out))
+                elif type(field.type) in [List, Array] and self._buffer_format(field.type.element_type) is not None:
+                    length = field.type.length if type(field.type) is Array else f'c_struct.{field.name}_length'
+                    if type(field.type) is List and field.type.maximum_length is not None:
+                        out.write('if (', length, ' > ', field.type.maximum_length, ') ')
+                        out.block(lambda: [
+                            out.writeln('Py_DECREF(result);'),
+                            out.writeln('PyErr_Format(PyExc_ValueError, "Illegal list length [%zu] for field [',
+                                        struct.name, '.', field.name, ']", ', length, ');'),
+                            out.writeln('return NULL;')])
+                    (MacroCall(
+                        'set_python_attribute',
+                        'result',
+                        quote(field.name),
+                        self._buffer_to_python(field.type.element_type, 'c_struct.' + field.name, length))
+                     .writeln(out))
                 elif type(field.type) is List:
                     (MacroCall(
                         'with_array_as_pylist',
@@ -240,6 +632,621 @@ class CPythonConversionGenerator:
         self._code.block(write_body)
         self._code.writeln()
 
+    def _write_conversion_types(self):
+        for t in self._module.enums + self._module.structs:
+            self._code.writeln('static const struct conversion_type ', t.name, '_conversion_type;')
+        self._code.writeln()
+        for enum in self._module.enums:
+            self._code.write('static const struct conversion_type ', enum.name, '_conversion_type = ')
+
+            def write_enum_type(out):
+                out.writeln(quote(enum.name), ',')
+                out.writeln('sizeof(', self._lowered.c_type(enum), '),')
+                out.writeln(self._state_offset(enum.name + '_class'), ',')
+                out.writeln(self._state_offset(enum.name + '_members'), ',')
+                out.writeln(str(enum.first_ordinal), ',')
+                out.writeln(str(len(enum.values)), ',')
+                out.writeln('0,')
+                out.writeln('NULL')
+
+            self._code.block(write_enum_type, ';')
+            self._code.writeln()
+        for struct in self._module.structs:
+            c_type = self._lowered.c_type(struct)
+            self._code.write('static const struct conversion_field ', struct.name, '_conversion_fields[] = ')
+
+            def write_fields(out):
+                for field in struct.fields:
+                    out.writeln('{', ', '.join(self._conversion_field(c_type, struct, field)), '},')
+
+            self._code.block(write_fields, ';')
+            self._code.writeln()
+            self._code.write('static const struct conversion_type ', struct.name, '_conversion_type = ')
+
+            def write_struct_type(out):
+                out.writeln(quote(struct.name), ',')
+                out.writeln('sizeof(', c_type, '),')
+                out.writeln(self._state_offset(struct.name + '_class'), ',')
+                out.writeln('conversion_no_entry,')
+                out.writeln('0,')
+                out.writeln('0,')
+                out.writeln(str(len(struct.fields)), ',')
+                out.writeln(struct.name, '_conversion_fields')
+
+            self._code.block(write_struct_type, ';')
+            self._code.writeln()
+
+    def _conversion_field(self, c_type, struct, field):
+        lowered = self._lowered.field(struct, field)
+        bits = self._layouts.bit_field(struct, field.name)
+        if bits is not None:
+            kind = lowered.conversion_kind
+            return [
+                self._state_offset(field.name + '_key'),
+                f'offsetof({c_type}, {packed_flags_member})',
+                'conversion_kind_' + kind,
+                '0',
+                'conversion_no_length',
+                f'&{field.type.name}_conversion_type' if kind == 'enum' else 'NULL',
+                'NULL',
+                'conversion_no_entry',
+                f'sizeof((({c_type} *) 0)->{packed_flags_member})',
+                str(bits.shift),
+                str(bits.width)]
+        field_type = field.type
+        count = '0'
+        length_offset = 'conversion_no_length'
+        if type(field_type) is Array:
+            count = field_type.length
+            field_type = field_type.element_type
+        elif type(field_type) is List:
+            count = field_type.maximum_length if field_type.maximum_length is not None else 'conversion_unbounded'
+            length_offset = f'offsetof({c_type}, {field.name}_length)'
+            field_type = field_type.element_type
+        if type(field_type) in [List, Array]:
+            raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
+        kind = lowered.conversion_kind
+        if kind is None:
+            raise ValueError(f'Unsupported type [{field_type.name}] of field [{struct.name}.{field.name}]')
+        nested = f'&{field_type.name}_conversion_type' if kind in ['struct', 'enum'] else 'NULL'
+        buffer_format = self._buffer_format(field_type) if count != '0' else None
+        if count == 'conversion_unbounded':
+            buffer_format = None
+        array_class = (self._state_offset('array_class')
+                       if buffer_format is not None and self._array_representation is ArrayRepresentation.ArrayModule
+                       else 'conversion_no_entry')
+        return [
+            self._state_offset(field.name + '_key'),
+            f'offsetof({c_type}, {field.name})',
+            'conversion_kind_' + kind,
+            count,
+            length_offset,
+            nested,
+            quote(buffer_format) if buffer_format is not None else 'NULL',
+            array_class,
+            '0',
+            '0',
+            '0']
+
+    def _write_enum_table_conversions(self, enum):
+        c_type = self._lowered.c_type(enum)
+        signature = c_type + ' ' + enum.name + '_to_c(PyObject *python_enum)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_to_c_body(out):
+            out.writeln(c_type, ' result = {0};')
+            self._write_state_lookup(out, 'result')
+            out.writeln('conversion_enum_to_c(state, &', enum.name, '_conversion_type, python_enum, &result);')
+            out.writeln('return result;')
+
+        self._code.block(write_to_c_body)
+        self._code.writeln()
+
+        signature = 'PyObject * ' + enum.name + '_to_python(' + c_type + ' value)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_to_python_body(out):
+            self._write_state_lookup(out, 'NULL')
+            out.writeln('return conversion_value_to_python(state, conversion_kind_enum, &', enum.name, '_conversion_type, &value);')
+
+        self._code.block(write_to_python_body)
+        self._code.writeln()
+
+    def _write_struct_table_conversions(self, struct):
+        c_type = self._lowered.c_type(struct)
+        signature = c_type + ' ' + struct.name + '_to_c(PyObject *python_struct, struct conversion_arena *arena)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_to_c_body(out):
+            out.writeln(c_type, ' result = {0};')
+            self._write_state_lookup(out, 'result')
+            out.writeln('conversion_struct_to_c(state, &', struct.name, '_conversion_type, python_struct, &result, arena);')
+            out.writeln('return result;')
+
+        self._code.block(write_to_c_body)
+        self._code.writeln()
+
+        signature = 'PyObject * ' + struct.name + '_to_python(' + c_type + ' c_struct)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_to_python_body(out):
+            self._write_state_lookup(out, 'NULL')
+            out.writeln('return conversion_struct_to_python(state, &', struct.name, '_conversion_type, &c_struct);')
+
+        self._code.block(write_to_python_body)
+        self._code.writeln()
+
+    def _write_struct_array_python_to_c_conversion(self, struct):
+        c_type = self._lowered.c_type(struct)
+        signature = ('int ' + struct.name + '_array_to_c(PyObject *sequence, ' + c_type
+                     + ' *out, size_t capacity, size_t *count, struct conversion_arena *arena)')
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_body(out):
+            out.writeln('PyObject *items = PySequence_Fast(sequence, "Expected a sequence of ', struct.name, '");')
+            out.write('if (items == NULL) ')
+            out.block(lambda: out.writeln('return -1;'))
+            out.writeln('Py_ssize_t length = PySequence_Fast_GET_SIZE(items);')
+            out.write('if ((size_t) length > capacity) ')
+
+            def write_capacity_error():
+                out.writeln('PyErr_Format(PyExc_ValueError, "Sequence of ', struct.name,
+                            ' of length %zd exceeds capacity %zu", length, capacity);')
+                write_release_and_fail()
+
+            def write_release_and_fail():
+                out.writeln('Py_DECREF(items);')
+                out.writeln('return -1;')
+
+            out.block(write_capacity_error)
+            out.writeln('PyObject **elements = PySequence_Fast_ITEMS(items);')
+            out.write('for (Py_ssize_t index = 0; index < length; ++index) ')
+
+            def write_loop_body():
+                out.writeln('out[index] = ', struct.name, '_to_c(elements[index], arena);')
+                out.write('if (PyErr_Occurred()) ')
+                out.block(write_release_and_fail)
+
+            out.block(write_loop_body)
+            out.writeln('Py_DECREF(items);')
+            out.writeln('*count = (size_t) length;')
+            out.writeln('return 0;')
+
+        self._code.block(write_body)
+        self._code.writeln()
+
+    def _write_struct_array_c_to_python_conversion(self, struct):
+        c_type = self._lowered.c_type(struct)
+        signature = 'PyObject * ' + struct.name + '_array_to_python(const ' + c_type + ' *items, size_t count)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_body(out):
+            out.writeln('PyObject *result = PyList_New((Py_ssize_t) count);')
+            out.write('if (result == NULL) ')
+            out.block(lambda: out.writeln('return NULL;'))
+            out.write('for (size_t index = 0; index < count; ++index) ')
+
+            def write_release_and_fail():
+                out.writeln('Py_DECREF(result);')
+                out.writeln('return NULL;')
+
+            def write_loop_body():
+                out.writeln('PyObject *item = ', struct.name, '_to_python(items[index]);')
+                out.write('if (item == NULL) ')
+                out.block(write_release_and_fail)
+                out.writeln('PyList_SET_ITEM(result, (Py_ssize_t) index, item);')
+
+            out.block(write_loop_body)
+            out.writeln('return result;')
+
+        self._code.block(write_body)
+        self._code.writeln()
+
+    def _write_struct_array_memoryview(self, struct):
+        signature = ('PyObject * ' + struct.name + '_array_as_memoryview('
+                     + self._lowered.c_type(struct) + ' *items, size_t count)')
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+        self._code.block(lambda out: out.writeln(
+            'return PyMemoryView_FromMemory((char *) items, (Py_ssize_t) (count * sizeof(*items)), PyBUF_WRITE);'))
+        self._code.writeln()
+
+    def _write_struct_array_pack(self, struct):
+        c_type = self._lowered.c_type(struct)
+        name = struct.name
+        padding_free = self._layouts.is_padding_free(struct)
+        if not padding_free:
+            self._write_clear_padding(struct)
+
+        self._code.write('static void ', name, '_pack_chunk(const char *items, char *target, size_t count) ')
+
+        def write_chunk_body(out):
+            out.writeln('memcpy(target, items, count * sizeof(', c_type, '));')
+            if not padding_free:
+                out.write('for (size_t index = 0; index < count; ++index) ')
+                out.block(lambda: out.writeln(name, '_clear_padding(target + index * sizeof(', c_type, '));'))
+
+        self._code.block(write_chunk_body)
+        self._code.writeln()
+
+        signature = 'PyObject * ' + name + '_array_pack(const ' + c_type + ' *items, size_t count, int thread_count)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_pack_body(out):
+            out.write('if (count > (size_t) PY_SSIZE_T_MAX / sizeof(', c_type, ')) ')
+            out.block(lambda: out.writeln('return PyErr_NoMemory();'))
+            out.writeln('PyObject *result = PyBytes_FromStringAndSize(NULL, (Py_ssize_t) (count * sizeof(', c_type, ')));')
+            out.write('if (result == NULL) ')
+            out.block(lambda: out.writeln('return NULL;'))
+            out.writeln('char *target = PyBytes_AS_STRING(result);')
+            out.writeln('Py_BEGIN_ALLOW_THREADS')
+            out.writeln('parallel_encode(', name, '_pack_chunk, items, target, count, sizeof(', c_type, '), thread_count);')
+            out.writeln('Py_END_ALLOW_THREADS')
+            out.writeln('return result;')
+
+        self._code.block(write_pack_body)
+        self._code.writeln()
+
+        signature = ('int ' + name + '_array_pack_into(PyObject *buffer, const ' + c_type
+                     + ' *items, size_t count, int thread_count)')
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_pack_into_body(out):
+            out.writeln('Py_buffer view;')
+            out.write('if (PyObject_GetBuffer(buffer, &view, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS) < 0) ')
+            out.block(lambda: out.writeln('return -1;'))
+            out.write('if (count > (size_t) view.len / sizeof(', c_type, ')) ')
+            out.block(lambda: [
+                out.writeln('PyErr_Format(PyExc_ValueError, "Buffer of [%zd] bytes is too small for %zu ',
+                            name, ' items", view.len, count);'),
+                out.writeln('PyBuffer_Release(&view);'),
+                out.writeln('return -1;')])
+            out.writeln('Py_BEGIN_ALLOW_THREADS')
+            out.writeln('parallel_encode(', name, '_pack_chunk, items, view.buf, count, sizeof(', c_type, '), thread_count);')
+            out.writeln('Py_END_ALLOW_THREADS')
+            out.writeln('PyBuffer_Release(&view);')
+            out.writeln('return 0;')
+
+        self._code.block(write_pack_into_body)
+        self._code.writeln()
+
+    def _write_struct_columns(self, struct):
+        c_type = self._lowered.c_type(struct)
+        name = struct.name
+        columns_type = 'struct ' + self._lowered.c_name(struct) + '_columns'
+        fields = struct.fields
+        if not is_columnar_struct(struct):
+            raise ValueError(f"Struct {name} has columns but no fields or fields other than numbers and Booleans")
+
+        signature = 'PyObject * ' + name + '_array_to_columns(const ' + c_type + ' *items, size_t count)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_to_columns_body(out):
+            self._write_state_lookup(out, 'NULL')
+            out.writeln('size_t size = 0;')
+            for field in fields:
+                out.writeln('size_t ', field.name, '_offset;')
+            for field in fields:
+                out.write('if (columns_place(&size, count, sizeof(', self._lowered.c_type(field.type), '), &',
+                          field.name, '_offset) < 0) ')
+                out.block(lambda: out.writeln('return NULL;'))
+            out.writeln('PyObject *storage = PyByteArray_FromStringAndSize(NULL, (Py_ssize_t) size);')
+            out.write('if (storage == NULL) ')
+            out.block(lambda: out.writeln('return NULL;'))
+            out.writeln('char *data = PyByteArray_AS_STRING(storage);')
+            out.writeln(columns_type, ' columns = {', ', '.join(
+                f'({self._lowered.c_type(field.type)} *) (data + {field.name}_offset)' for field in fields), '};')
+            out.writeln(self._lowered.c_name(struct), '_to_columns(items, count, &columns);')
+            out.writeln('PyObject *view = PyMemoryView_FromObject(storage);')
+            out.writeln('Py_DECREF(storage);')
+            out.writeln('PyObject *result = view != NULL ? PyDict_New() : NULL;')
+            for field in fields:
+                out.write(f'if (result != NULL && columns_add_view(result, {self._attribute_key(field.name)}, view, '
+                          f'{field.name}_offset, count * sizeof({self._lowered.c_type(field.type)}), '
+                          f'"{struct_code(field.type)}") < 0) ')
+                out.block(lambda: out.writeln('Py_CLEAR(result);'))
+            out.writeln('Py_XDECREF(view);')
+            out.writeln('return result;')
+
+        self._code.block(write_to_columns_body)
+        self._code.writeln()
+
+        signature = ('int ' + name + '_array_from_columns(PyObject *columns, ' + c_type
+                     + ' *items, size_t capacity, size_t *count)')
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_from_columns_body(out):
+            field_count = str(len(fields))
+            self._write_state_lookup(out, '-1')
+            out.writeln('PyObject *keys[] = {', ', '.join(self._attribute_key(field.name) for field in fields), '};')
+            out.writeln('static const char codes[] = {',
+                        ', '.join(f"'{struct_code(field.type)}'" for field in fields), '};')
+            out.writeln('static const size_t sizes[] = {',
+                        ', '.join(f'sizeof({self._lowered.c_type(field.type)})' for field in fields), '};')
+            out.writeln('Py_buffer views[', field_count, '];')
+            out.writeln('size_t length = 0;')
+            out.writeln('size_t acquired = 0;')
+            out.write('while (acquired < ', field_count, ' && columns_get_buffer(columns, keys[acquired], codes[acquired], '
+                      'sizes[acquired], &views[acquired], acquired, &length) == 0) ')
+            out.block(lambda: out.writeln('++acquired;'))
+            out.writeln('int status = acquired == ', field_count, ' ? 0 : -1;')
+            out.write('if (status == 0 && length > capacity) ')
+            out.block(lambda: [
+                out.writeln('PyErr_Format(PyExc_ValueError, "Columns of [%zu] items exceed the capacity of %zu ', name,
+                            ' items", length, capacity);'),
+                out.writeln('status = -1;')])
+            out.write('if (status == 0) ')
+
+            def write_transpose():
+                out.writeln(columns_type, ' source = {', ', '.join(
+                    f'({self._lowered.c_type(field.type)} *) views[{index}].buf' for index, field in enumerate(fields)), '};')
+                out.writeln(self._lowered.c_name(struct), '_from_columns(&source, length, items);')
+                out.writeln('*count = length;')
+
+            out.block(write_transpose)
+            out.write('for (size_t index = 0; index < acquired; ++index) ')
+            out.block(lambda: out.writeln('PyBuffer_Release(&views[index]);'))
+            out.writeln('return status;')
+
+        self._code.block(write_from_columns_body)
+        self._code.writeln()
+
+    def _write_clear_padding(self, struct):
+        for field in struct.fields:
+            element_type = field.type.element_type if type(field.type) in [Array, List] else field.type
+            if (type(element_type) is Struct and not self._layouts.is_padding_free(element_type)
+                    and element_type.name not in self._padding_cleared):
+                self._write_clear_padding(element_type)
+        if struct.name in self._padding_cleared:
+            return
+        self._padding_cleared.add(struct.name)
+        c_type = self._lowered.c_type(struct)
+        layout = self._layouts.for_struct(struct)
+        self._code.write('static void ', struct.name, '_clear_padding(char *item) ')
+
+        def write_body(out):
+            end = '0'
+            position = 0
+            for field in layout.fields:
+                offset = f'offsetof({c_type}, {field.name})'
+                if field.offset > position:
+                    out.writeln(f'memset(item + {end}, 0, {offset} - ({end}));')
+                position = field.offset + field.size
+                end = f'{offset} + sizeof((({c_type} *) 0)->{field.name})'
+                element_type = field.type.element_type if type(field.type) in [Array, List] else field.type
+                element_padding_free = self._layouts.is_padding_free(element_type)
+                if type(field.type) is Struct and not element_padding_free:
+                    out.writeln(f'{field.type.name}_clear_padding(item + {offset});')
+                elif type(field.type) is Array and not element_padding_free:
+                    out.write(f'for (size_t index = 0; index < {field.type.length}; ++index) ')
+                    out.block(lambda: out.writeln(
+                        f'{element_type.name}_clear_padding(item + {offset} + index * sizeof((({c_type} *) 0)->{field.name}[0]));'))
+                elif type(field.type) is List:
+                    write_list_padding(out, field, offset, element_type, element_padding_free)
+            if layout.size > position:
+                out.writeln(f'memset(item + {end}, 0, sizeof({c_type}) - ({end}));')
+
+        def write_list_padding(out, field, offset, element_type, element_padding_free):
+            element_size = f'sizeof((({c_type} *) 0)->{field.name}[0])'
+            capacity = field.type.maximum_length
+            out.writeln('size_t ', field.name, '_length;')
+            out.writeln(f'memcpy(&{field.name}_length, item + offsetof({c_type}, {field.name}_length), sizeof(size_t));')
+            out.write(f'if ({field.name}_length > {capacity}) ')
+            out.block(lambda: out.writeln(f'{field.name}_length = {capacity};'))
+            if not element_padding_free:
+                out.write(f'for (size_t index = 0; index < {field.name}_length; ++index) ')
+                out.block(lambda: out.writeln(
+                    f'{element_type.name}_clear_padding(item + {offset} + index * {element_size});'))
+            out.writeln(f'memset(item + {offset} + {field.name}_length * {element_size}, 0, '
+                        f'({capacity} - {field.name}_length) * {element_size});')
+
+        self._code.block(write_body)
+        self._code.writeln()
+
+    def _write_struct_update_python(self, struct):
+        for field in struct.fields:
+            if type(field.type) in [Array, List] and self._buffer_format(field.type.element_type) is None:
+                self._write_update_element_functions(field.type.element_type)
+
+        signature = 'int ' + struct.name + '_update_python(PyObject *target, ' + self._lowered.c_type(struct) + ' c_struct)'
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_body(out):
+            self._write_state_lookup(out, '-1')
+            for field in struct.fields:
+                member = self._member(struct, field)
+                key = self._attribute_key(field.name)
+                if type(field.type) is Struct:
+                    (MacroCall(
+                        'update_struct_attribute',
+                        'target',
+                        key,
+                        'current',
+                        self._class_reference(field.type),
+                        f'{field.type.name}_update_python(current, {member})',
+                        f'{field.type.name}_to_python({member})')
+                     .writeln(out))
+                elif type(field.type) in [Array, List]:
+                    length = field.type.length if type(field.type) is Array else member + '_length'
+                    if type(field.type) is List and field.type.maximum_length is not None:
+                        write_length_check(field, member)
+                    if self._buffer_format(field.type.element_type) is not None:
+                        (MacroCall(
+                            'update_attribute',
+                            'target',
+                            key,
+                            'current',
+                            f'buffer_matches(current, {member}, {length} * sizeof({member}[0]))',
+                            self._buffer_to_python(field.type.element_type, member, length))
+                         .writeln(out))
+                        continue
+                    out.write('if (', field.type.element_type.name, '_update_list_attribute(target, ',
+                              key, ', ', member, ', ', length, ') < 0) ')
+                    out.block(lambda: out.writeln('return -1;'))
+                else:
+                    (MacroCall(
+                        'update_attribute',
+                        'target',
+                        key,
+                        'current',
+                        self._matches(field.type, 'current', member),
+                        self._value_to_python(field.type, member))
+                     .writeln(out))
+            out.writeln('return 0;')
+
+        def write_length_check(field, member):
+            out = self._code
+            out.write('if (', member, '_length > ', field.type.maximum_length, ') ')
+
+            def write_length_error():
+                out.writeln('PyErr_Format(PyExc_ValueError, "Illegal list length [%zu] for field [',
+                            struct.name, '.', field.name, ']", ', member, '_length);')
+                out.writeln('return -1;')
+
+            out.block(write_length_error)
+
+        self._code.block(write_body)
+        self._code.writeln()
+
+    def _write_update_element_functions(self, element_type):
+        if type(element_type) in [Array, List]:
+            raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
+        if element_type.name in self._update_elements_written:
+            return
+        self._update_elements_written.add(element_type.name)
+        name = element_type.name
+        c_type = self._lowered.c_type(element_type)
+
+        self._code.write('static int ', name, '_update_item(PyObject *list, Py_ssize_t index, ', c_type, ' value) ')
+
+        def write_update_item_body(out):
+            self._write_state_lookup(out, '-1')
+            out.writeln('PyObject *current = PyList_GET_ITEM(list, index);')
+            if type(element_type) is Struct:
+                out.write('if (Py_TYPE(current) == (PyTypeObject *) ', self._class_reference(element_type), ') ')
+                out.block(lambda: out.writeln('return ', name, '_update_python(current, value);'))
+            else:
+                out.write('if (', self._matches(element_type, 'current', 'value'), ') ')
+                out.block(lambda: out.writeln('return 0;'))
+            out.writeln('return replace_list_item(list, index, ', self._value_to_python(element_type, 'value'), ');')
+
+        self._code.block(write_update_item_body)
+        self._code.writeln()
+
+        self._code.write('static int ', name, '_update_list_attribute(PyObject *target, PyObject *key, ',
+                         c_type, ' const *items, size_t length) ')
+
+        def write_update_list_body(out):
+            out.writeln('PyObject *current = PyObject_GetAttr(target, key);')
+            out.write('if (current == NULL) ')
+            out.block(lambda: out.writeln('return -1;'))
+            out.writeln('int status = 0;')
+            out.write('if (PyList_CheckExact(current) && PyList_GET_SIZE(current) == (Py_ssize_t) length) ')
+
+            def write_update_items():
+                out.write('for (size_t index = 0; index < length && status == 0; ++index) ')
+                out.block(lambda: out.writeln('status = ', name, '_update_item(current, (Py_ssize_t) index, items[index]);'))
+
+            def write_replace_list():
+                out.writeln('PyObject *value = PyList_New((Py_ssize_t) length);')
+                out.write('for (size_t index = 0; value != NULL && index < length; ++index) ')
+
+                def write_new_item():
+                    out.writeln('PyObject *item = ', self._value_to_python(element_type, 'items[index]'), ';')
+                    out.write('if (item == NULL) ')
+                    out.block(lambda: out.writeln('Py_CLEAR(value);'))
+                    out.write('else ')
+                    out.block(lambda: out.writeln('PyList_SET_ITEM(value, (Py_ssize_t) index, item);'))
+
+                out.block(write_new_item)
+                out.writeln('status = replace_attribute(target, key, value);')
+
+            out.block(write_update_items)
+            out.write('else ')
+            out.block(write_replace_list)
+            out.writeln('Py_DECREF(current);')
+            out.writeln('return status;')
+
+        self._code.block(write_update_list_body)
+        self._code.writeln()
+
+    def _matches(self, t, current, value):
+        if type(t) is Enumeration:
+            index = f'(int) {value} - {t.first_ordinal}'
+            return (f'({index} >= 0 && {index} < {len(t.values)} '
+                    f'&& {current} == {self._member_reference(t, index)})')
+        elif t is PrimitiveType.Boolean:
+            return f'bool_matches({current}, {value})'
+        elif t in [PrimitiveType.UInt8, PrimitiveType.UInt16, PrimitiveType.UInt32, PrimitiveType.UInt64]:
+            return f'unsigned_matches({current}, {value})'
+        elif type(t) is PrimitiveType and t.is_integer:
+            return f'signed_matches({current}, {value})'
+        elif t in [PrimitiveType.Float, PrimitiveType.Double]:
+            return f'double_matches({current}, {value})'
+        elif t is PrimitiveType.String:
+            return f'string_matches({current}, {value})'
+        raise ValueError(f'Unsupported type [{t.name}]')
+
+    def _value_to_python(self, t, value):
+        if type(t) in [Struct, Enumeration]:
+            return f'{t.name}_to_python({value})'
+        return primitive_to_python(t, value)
+
+
+_item_integer_limits = {
+    PrimitiveType.Integer: ('int64_t', 'INT64'),
+    PrimitiveType.Int8: ('int8_t', 'INT8'),
+    PrimitiveType.UInt8: ('uint8_t', 'UINT8'),
+    PrimitiveType.Int16: ('int16_t', 'INT16'),
+    PrimitiveType.UInt16: ('uint16_t', 'UINT16'),
+    PrimitiveType.Int32: ('int32_t', 'INT32'),
+    PrimitiveType.UInt32: ('uint32_t', 'UINT32'),
+    PrimitiveType.Int64: ('int64_t', 'INT64'),
+    PrimitiveType.UInt64: ('uint64_t', 'UINT64'),
+}
+
+
+def python_item_to_c(value_type):
+    """
+    The C expression converting the PyObject item_value of a List or Array to value_type. It sets a Python exception
+    if the conversion fails, including integers outside the range of value_type.
+    """
+    if type(value_type) is Struct:
+        return value_type.name + '_to_c(item_value, arena)'
+    elif type(value_type) is Enumeration:
+        return value_type.name + '_to_c(item_value)'
+    elif value_type is PrimitiveType.Boolean:
+        return 'PyObject_IsTrue(item_value) > 0'
+    elif type(value_type) is PrimitiveType and value_type.is_integer:
+        c_type, limit = _item_integer_limits[value_type]
+        if c_type.startswith('u'):
+            return f'({c_type}) conversion_item_unsigned(item_value, {limit}_MAX)'
+        return f'({c_type}) conversion_item_signed(item_value, {limit}_MIN, {limit}_MAX)'
+    elif value_type is PrimitiveType.Float:
+        return '(float) PyFloat_AsDouble(item_value)'
+    elif value_type is PrimitiveType.Double:
+        return 'PyFloat_AsDouble(item_value)'
+    elif value_type is PrimitiveType.String:
+        return 'conversion_arena_utf8(arena, item_value)'
+    elif type(value_type) in [List, Array]:
+        raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
+    raise ValueError(f'Unsupported type [{value_type.name}] of List / Array item.')
+
+
+def is_buffer_primitive(t):
+    return type(t) is PrimitiveType and t is not PrimitiveType.String
+
 
 def integer_conversion_to_c(value_type: PrimitiveType, field_name: str):
     if value_type in [PrimitiveType.Int64]:
@@ -0,0 +1,373 @@
+import typing
+
+from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
+from c_interop.generator.layout import packed_field_getter
+from c_interop.generator.lowering import LoweredModule
+from c_interop.generator.state_runtime import STATE_RUNTIME
+from c_interop.generator.view_runtime import VIEW_RUNTIME
+from c_interop.model.model import Module, Type, Struct, Enumeration, PrimitiveType, List, Array
+
+
+class CPythonViewGenerator:
+    def __init__(self, module: Module, header_sink: typing.TextIO = None, module_sink: typing.TextIO = None,
+                 lowered: LoweredModule = None):
+        self._lowered = lowered if lowered is not None else LoweredModule(module)
+        self._module = module
+        self._layouts = self._lowered.layouts
+        self._header = CodeWriter(CodeWriterMode.C, header_sink)
+        self._code = CodeWriter(CodeWriterMode.C, module_sink)
+        self._element_converters_written = set()
+
+    def run(self):
+        self._code.writeln(VIEW_RUNTIME.strip())
+        self._code.writeln()
+        self._code.writeln(STATE_RUNTIME.strip())
+        self._code.writeln()
+        self._write_view_state()
+        for struct in self._module.structs:
+            self._write_view_object(struct)
+        for struct in self._module.structs:
+            self._write_element_converters(struct)
+        for struct in self._module.structs:
+            self._write_view(struct)
+        self._write_views_init()
+
+    def result(self):
+        return self._header.result(), self._code.result()
+
+    def _write_view_object(self, struct: Struct):
+        c_type = self._lowered.c_type(struct)
+        self._code.write('typedef struct ')
+
+        def write_body(out):
+            out.writeln('PyObject_HEAD')
+            out.writeln(c_type, ' *data;')
+            out.writeln('PyObject *owner;')
+            out.writeln('PyObject *cache[', str(len(struct.fields)), '];')
+            out.writeln(c_type, ' storage;')
+
+        self._code.block(write_body, ' ' + struct.name + '_view_object;')
+        self._code.writeln()
+        borrow_signature = 'PyObject * ' + struct.name + '_view_borrow(' + c_type + ' *c_struct, PyObject *owner)'
+        new_signature = 'PyObject * ' + struct.name + '_view_new(const ' + c_type + ' *c_struct)'
+        self._header.writeln(borrow_signature, ';')
+        self._header.writeln(new_signature, ';')
+        self._code.writeln(borrow_signature, ';')
+        self._code.writeln(new_signature, ';')
+        self._code.writeln()
+
+    def _write_element_converters(self, struct: Struct):
+        for field in struct.fields:
+            if type(field.type) not in [Array, List]:
+                continue
+            element_type = field.type.element_type
+            if type(element_type) in [Array, List]:
+                raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
+            if element_type.name in self._element_converters_written:
+                continue
+            self._element_converters_written.add(element_type.name)
+            element_c_type = self._lowered.c_type(element_type)
+            self._code.write('static PyObject *', element_type.name,
+                             '_view_element(const void *element, PyObject *owner) ')
+            self._code.block(lambda out: out.writeln('return ', self._value_to_python(
+                element_type,
+                f'*({element_c_type} const *) element',
+                f'({element_c_type} *) element',
+                'owner'), ';'))
+            self._code.writeln()
+
+    def _write_view(self, struct: Struct):
+        name = struct.name
+        c_type = self._lowered.c_type(struct)
+        field_count = str(len(struct.fields))
+
+        self._code.write('static int ', name, '_view_traverse(', name, '_view_object *self, visitproc visit, void *arg) ')
+
+        def write_traverse_body(out):
+            out.writeln('Py_VISIT(Py_TYPE(self));')
+            out.writeln('Py_VISIT(self->owner);')
+            out.write('for (size_t index = 0; index < ', field_count, '; ++index) ')
+            out.block(lambda: out.writeln('Py_VISIT(self->cache[index]);'))
+            out.writeln('return 0;')
+
+        self._code.block(write_traverse_body)
+        self._code.writeln()
+
+        self._code.write('static int ', name, '_view_clear(', name, '_view_object *self) ')
+
+        def write_clear_body(out):
+            out.writeln('Py_CLEAR(self->owner);')
+            out.write('for (size_t index = 0; index < ', field_count, '; ++index) ')
+            out.block(lambda: out.writeln('Py_CLEAR(self->cache[index]);'))
+            out.writeln('return 0;')
+
+        self._code.block(write_clear_body)
+        self._code.writeln()
+
+        self._code.write('static void ', name, '_view_dealloc(', name, '_view_object *self) ')
+
+        def write_dealloc_body(out):
+            out.writeln('PyTypeObject *type = Py_TYPE(self);')
+            out.writeln('PyObject_GC_UnTrack(self);')
+            out.writeln(name, '_view_clear(self);')
+            out.writeln('type->tp_free((PyObject *) self);')
+            out.writeln('Py_DECREF(type);')
+
+        self._code.block(write_dealloc_body)
+        self._code.writeln()
+
+        for index, field in enumerate(struct.fields):
+            self._write_getter(struct, index, field)
+
+        self._code.write('static PyGetSetDef ', name, '_view_getset[] = ')
+
+        def write_getset(out):
+            for field in struct.fields:
+                out.writeln('{"', field.name, '", (getter) ', name, '_view_get_', field.name, ', NULL, NULL, NULL},')
+            out.writeln('{NULL}')
+
+        self._code.block(write_getset, ';')
+        self._code.writeln()
+
+        self._code.write('static PyType_Slot ', name, '_view_slots[] = ')
+
+        def write_slots(out):
+            out.writeln('{Py_tp_traverse, (void *) ', name, '_view_traverse},')
+            out.writeln('{Py_tp_clear, (void *) ', name, '_view_clear},')
+            out.writeln('{Py_tp_dealloc, (void *) ', name, '_view_dealloc},')
+            out.writeln('{Py_tp_getset, ', name, '_view_getset},')
+            out.writeln('{0, NULL}')
+
+        self._code.block(write_slots, ';')
+        self._code.writeln()
+
+        self._code.write('static PyType_Spec ', name, '_view_spec = ')
+
+        def write_spec(out):
+            out.writeln('.name = "', self._module.name, '.', name, 'View",')
+            out.writeln('.basicsize = sizeof(', name, '_view_object),')
+            out.writeln('.flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC | Py_TPFLAGS_IMMUTABLETYPE '
+                        '| Py_TPFLAGS_DISALLOW_INSTANTIATION,')
+            out.writeln('.slots = ', name, '_view_slots')
+
+        self._code.block(write_spec, ';')
+        self._code.writeln()
+
+        self._code.write('static ', name, '_view_object *', name, '_view_allocate(void) ')
+
+        def write_allocate_body(out):
+            self._write_state_lookup(out)
+            out.writeln(name, '_view_object *self = PyObject_GC_New(', name, '_view_object, state->', name, '_view_type);')
+            out.write('if (self == NULL) ')
+            out.block(lambda: out.writeln('return NULL;'))
+            out.writeln('self->owner = NULL;')
+            out.writeln('memset(self->cache, 0, sizeof(self->cache));')
+            out.writeln('return self;')
+
+        self._code.block(write_allocate_body)
+        self._code.writeln()
+
+        self._code.write('PyObject * ', name, '_view_borrow(', c_type, ' *c_struct, PyObject *owner) ')
+
+        def write_borrow_body(out):
+            out.writeln(name, '_view_object *self = ', name, '_view_allocate();')
+            out.write('if (self == NULL) ')
+            out.block(lambda: out.writeln('return NULL;'))
+            out.writeln('self->data = c_struct;')
+            out.writeln('self->owner = Py_NewRef(owner);')
+            out.writeln('PyObject_GC_Track(self);')
+            out.writeln('return (PyObject *) self;')
+
+        self._code.block(write_borrow_body)
+        self._code.writeln()
+
+        self._code.write('PyObject * ', name, '_view_new(const ', c_type, ' *c_struct) ')
+
+        def write_new_body(out):
+            out.writeln(name, '_view_object *self = ', name, '_view_allocate();')
+            out.write('if (self == NULL) ')
+            out.block(lambda: out.writeln('return NULL;'))
+            out.writeln('self->storage = *c_struct;')
+            out.writeln('self->data = &self->storage;')
+            out.writeln('PyObject_GC_Track(self);')
+            out.writeln('return (PyObject *) self;')
+
+        self._code.block(write_new_body)
+        self._code.writeln()
+
+    def _write_getter(self, struct: Struct, index: int, field):
+        cache = f'self->cache[{index}]'
+        load = struct.name + '_view_load_' + field.name
+        self._code.write('static PyObject *', load, '(', struct.name, '_view_object *self) ')
+
+        def write_load_body(out):
+            out.write('if (', cache, ' == NULL) ')
+
+            def write_conversion():
+                if type(field.type) is List and field.type.maximum_length is not None:
+                    maximum_length = field.type.maximum_length
+                    out.write('if (self->data->', field.name, '_length > ', maximum_length, ') ')
+
+                    def write_length_error():
+                        out.writeln('PyErr_Format(PyExc_ValueError, "Illegal list length [%zu] for field [',
+                                    struct.name, '.', field.name, ']", self->data->', field.name, '_length);')
+                        out.writeln('return NULL;')
+
+                    out.block(write_length_error)
+                if type(field.type) in [Array, List]:
+                    self._write_state_lookup(out)
+                out.writeln(cache, ' = ', self._field_to_python(struct, field), ';')
+                out.write('if (', cache, ' == NULL) ')
+                out.block(lambda: out.writeln('return NULL;'))
+
+            out.block(write_conversion)
+            out.writeln('return Py_NewRef(', cache, ');')
+
+        self._code.block(write_load_body)
+        self._code.writeln()
+
+        self._code.write('static PyObject *', struct.name, '_view_get_', field.name,
+                         '(', struct.name, '_view_object *self, void *closure) ')
+
+        def write_body(out):
+            out.writeln('PyObject *result;')
+            out.writeln('Py_BEGIN_CRITICAL_SECTION(self);')
+            out.writeln('result = ', load, '(self);')
+            out.writeln('Py_END_CRITICAL_SECTION();')
+            out.writeln('return result;')
+
+        self._code.block(write_body)
+        self._code.writeln()
+
+    def _field_to_python(self, struct: Struct, field):
+        if self._layouts.bit_field(struct, field.name) is not None:
+            getter = packed_field_getter(struct, field.name, 'self->data')
+            return self._value_to_python(field.type, getter, None, '(PyObject *) self')
+        member = 'self->data->' + field.name
+        if type(field.type) in [Array, List]:
+            length = field.type.length if type(field.type) is Array else member + '_length'
+            return (f'sequence_view_new(state->sequence_view_type, {member}, {length}, sizeof({member}[0]), '
+                    f'{field.type.element_type.name}_view_element, (PyObject *) self)')
+        return self._value_to_python(field.type, member, '&' + member, '(PyObject *) self')
+
+    def _value_to_python(self, t: Type, value: str, address: str, owner: str):
+        if type(t) is Struct:
+            return f'{t.name}_view_borrow({address}, {owner})'
+        elif type(t) is Enumeration:
+            return f'{t.name}_to_python({value})'
+        elif type(t) is PrimitiveType:
+            return primitive_to_python(typing.cast(PrimitiveType, t), value)
+        raise ValueError(f'Unsupported type [{t.name}]')
+
+    def _write_view_state(self):
+        prefix = self._module.name + '_view'
+        state_type = 'struct ' + prefix + '_state'
+        registry_key = self._module.name + '_views.view_state'
+        types = ['sequence_view_type'] + [struct.name + '_view_type' for struct in self._module.structs]
+
+        self._code.writeln('#include <stdatomic.h>')
+        self._code.writeln('#include <stdint.h>')
+        self._code.writeln()
+        self._code.write(state_type, ' ')
+        self._code.block(lambda out: [out.writeln('PyTypeObject *', t, ';') for t in types], ';')
+        self._code.writeln()
+        self._code.writeln('static _Thread_local int64_t ', prefix, '_cached_interpreter = -1;')
+        self._code.writeln('static _Thread_local unsigned long ', prefix, '_cached_generation;')
+        self._code.writeln('static _Thread_local ', state_type, ' *', prefix, '_cached_state;')
+        self._code.writeln('static atomic_ulong ', prefix, '_generation;')
+        self._code.writeln()
+
+        self._code.write('static void ', prefix, '_state_free(PyObject *capsule) ')
+
+        def write_free_body(out):
+            out.writeln(state_type, ' *state = PyCapsule_GetPointer(capsule, "', registry_key, '");')
+            out.writeln('atomic_fetch_add(&', prefix, '_generation, 1);')
+            for t in types:
+                out.writeln('Py_XDECREF(state->', t, ');')
+            out.writeln('PyMem_Free(state);')
+
+        self._code.block(write_free_body)
+        self._code.writeln()
+
+        self._code.writeln('/* Returns the view types of the current interpreter, cached per thread. Sets an exception and returns NULL')
+        self._code.writeln(' * if no module has called ', self._module.name, '_views_init in it. */')
+        self._code.write('static ', state_type, ' *', prefix, '_state_get(void) ')
+
+        def write_state_get_body(out):
+            out.writeln('int64_t interpreter = PyInterpreterState_GetID(PyInterpreterState_Get());')
+            out.writeln('unsigned long generation = atomic_load(&', prefix, '_generation);')
+            out.write('if (interpreter == ', prefix, '_cached_interpreter && generation == ', prefix, '_cached_generation) ')
+            out.block(lambda: out.writeln('return ', prefix, '_cached_state;'))
+            out.writeln(state_type, ' *state = state_registry_get("', registry_key, '");')
+            out.write('if (state == NULL) ')
+            out.block(lambda: [
+                out.write('if (!PyErr_Occurred()) '),
+                out.block(lambda: out.writeln('PyErr_SetString(PyExc_RuntimeError, "', self._module.name,
+                                              ' views are not initialized in this interpreter");')),
+                out.writeln('return NULL;')])
+            out.writeln(prefix, '_cached_interpreter = interpreter;')
+            out.writeln(prefix, '_cached_generation = generation;')
+            out.writeln(prefix, '_cached_state = state;')
+            out.writeln('return state;')
+
+        self._code.block(write_state_get_body)
+        self._code.writeln()
+
+    def _write_state_lookup(self, out):
+        out.writeln('struct ', self._module.name, '_view_state *state = ', self._module.name, '_view_state_get();')
+        out.write('if (state == NULL) ')
+        out.block(lambda: out.writeln('return NULL;'))
+
+    def _write_views_init(self):
+        prefix = self._module.name + '_view'
+        state_type = 'struct ' + prefix + '_state'
+        registry_key = self._module.name + '_views.view_state'
+        signature = 'int ' + self._module.name + '_views_init(PyObject *module)'
+        self._header.writeln('/* Creates the view types of module as heap types and registers them for the interpreter of module. */')
+        self._header.writeln(signature, ';')
+        self._code.write(signature, ' ')
+
+        def write_body(out):
+            out.writeln(state_type, ' *state = PyMem_Calloc(1, sizeof(', state_type, '));')
+            out.write('if (state == NULL) ')
+            out.block(lambda: [out.writeln('PyErr_NoMemory();'), out.writeln('return -1;')])
+            out.writeln('PyObject *capsule = PyCapsule_New(state, "', registry_key, '", ', prefix, '_state_free);')
+            out.write('if (capsule == NULL) ')
+            out.block(lambda: [out.writeln('PyMem_Free(state);'), out.writeln('return -1;')])
+            out.writeln('state->sequence_view_type = (PyTypeObject *) PyType_FromModuleAndSpec(module, &sequence_view_spec, NULL);')
+            out.write('if (state->sequence_view_type == NULL) ')
+            out.block(lambda: out.writeln('goto error;'))
+            for struct in self._module.structs:
+                reference = 'state->' + struct.name + '_view_type'
+                out.writeln(reference, ' = (PyTypeObject *) PyType_FromModuleAndSpec(module, &', struct.name,
+                            '_view_spec, NULL);')
+                out.write('if (', reference, ' == NULL || PyModule_AddObjectRef(module, "', struct.name, 'View", ',
+                          '(PyObject *) ', reference, ') < 0) ')
+                out.block(lambda: out.writeln('goto error;'))
+            out.write('if (state_registry_set("', registry_key, '", capsule) < 0) ')
+            out.block(lambda: out.writeln('goto error;'))
+            out.writeln('Py_DECREF(capsule);')
+            out.writeln('atomic_fetch_add(&', prefix, '_generation, 1);')
+            out.writeln('return 0;')
+            out.unindent()
+            out.writeln('error:')
+            out.indent()
+            out.writeln('Py_DECREF(capsule);')
+            out.writeln('return -1;')
+
+        self._code.block(write_body)
+        self._code.writeln()
+
+
+def primitive_to_python(primitive: PrimitiveType, value: str):
+    if primitive is PrimitiveType.Boolean:
+        return f'PyBool_FromLong({value})'
+    elif primitive in [PrimitiveType.UInt8, PrimitiveType.UInt16, PrimitiveType.UInt32, PrimitiveType.UInt64]:
+        return f'PyLong_FromUnsignedLongLong({value})'
+    elif primitive.is_integer:
+        return f'PyLong_FromLongLong({value})'
+    elif primitive in [PrimitiveType.Float, PrimitiveType.Double]:
+        return f'PyFloat_FromDouble({value})'
+    elif primitive is PrimitiveType.String:
+        return f'({value} == NULL ? Py_NewRef(Py_None) : PyUnicode_FromString({value}))'
+    raise ValueError(f'Unsupported primitive type [{primitive}]')
@@ -0,0 +1,333 @@
+from typing import TextIO
+
+from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
+from c_interop.generator.layout import FieldLayout
+from c_interop.generator.lowering import LoweredModule
+from c_interop.generator.struct_ops_runtime import STRUCT_OPS_RUNTIME
+from c_interop.generator.style import Style
+from c_interop.model.model import Module, Struct, Enumeration, PrimitiveType, Array, List
+
+_nested_elements_message = "Lists or Arrays as element types are not supported. Please, create indirection via a struct."
+
+
+class CStructOpsGenerator:
+    """Generates <struct>_equals, <struct>_hash and the deep copy <struct>_copy for every struct.
+
+    Runs of adjacent members whose bytes are their values are compared and hashed with memcmp and a byte hash,
+    everything else field by field. Floating point members compare with ==, like the Python dataclasses do.
+    """
+
+    def __init__(self, module: Module, style=Style.Knr, header_sink: TextIO = None, module_sink: TextIO = None,
+                 lowered: LoweredModule = None):
+        self.module = module
+        self._style = style
+        self._header_out = CodeWriter(CodeWriterMode.C, header_sink)
+        self._module_out = CodeWriter(CodeWriterMode.C, module_sink)
+        self._lowered = lowered if lowered is not None else LoweredModule(module)
+        self._layouts = self._lowered.layouts
+
+    def run(self):
+        self._header_out.writeln(STRUCT_OPS_RUNTIME.strip())
+        self._header_out.writeln()
+        for struct in self.module.structs:
+            self._write_equals(struct)
+            self._write_hash(struct)
+            self._write_copy_size(struct)
+            self._write_copy(struct)
+
+    def result(self):
+        return self._header_out.result(), self._module_out.result()
+
+    def _write_equals(self, struct: Struct):
+        c_type = self._lowered.c_type(struct)
+        signature = f'bool {self._lowered.c_name(struct)}_equals(const {c_type} *a, const {c_type} *b)'
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+
+        def write_body():
+            comparisons = self._comparisons(struct)
+            if self._is_whole_struct(struct, comparisons):
+                self._module_out.writeln('return memcmp(a, b, sizeof(*a)) == 0;')
+                return
+            for comparison in comparisons:
+                if type(comparison) is list:
+                    self._return_false_if(self._span_differs(struct, comparison))
+                elif comparison.field is None:
+                    self._return_false_if(f'((uint64_t) (a->{comparison.name} ^ b->{comparison.name}) '
+                                          f'& {self._packed_mask(struct)}) != 0')
+                else:
+                    self._write_field_equals(comparison.field)
+            self._module_out.writeln('return true;')
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _write_field_equals(self, field):
+        if type(field.type) is List:
+            self._return_false_if(f'a->{field.name}_length != b->{field.name}_length')
+        if type(field.type) in [Array, List]:
+            element_type = field.type.element_type
+            count = self._element_count(field, 'a')
+            if self._is_bytewise(element_type):
+                guard = f'{count} > 0 && ' if field.type.maximum_length is None else ''
+                self._return_false_if(f'{guard}memcmp(a->{field.name}, b->{field.name}, '
+                                      f'{count} * sizeof(*a->{field.name})) != 0')
+            else:
+                self._write_element_loop(count, lambda: self._return_false_if(
+                    self._differs(element_type, f'a->{field.name}[index]', f'b->{field.name}[index]')))
+        else:
+            self._return_false_if(self._differs(field.type, f'a->{field.name}', f'b->{field.name}'))
+
+    def _write_hash(self, struct: Struct):
+        signature = f'uint64_t {self._lowered.c_name(struct)}_hash(const {self._lowered.c_type(struct)} *value)'
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+
+        def write_body():
+            self._module_out.writeln('uint64_t hash = struct_ops_hash_seed;')
+            comparisons = self._comparisons(struct)
+            if self._is_whole_struct(struct, comparisons):
+                self._module_out.writeln('hash = struct_ops_hash_bytes(hash, value, sizeof(*value));')
+            else:
+                for comparison in comparisons:
+                    if type(comparison) is list:
+                        self._module_out.writeln(f'hash = {self._hash_span(struct, comparison)};')
+                    elif comparison.field is None:
+                        self._module_out.writeln(f'hash = struct_ops_hash_word(hash, '
+                                                 f'(uint64_t) value->{comparison.name} & {self._packed_mask(struct)});')
+                    else:
+                        self._write_field_hash(comparison.field)
+            self._module_out.writeln('return struct_ops_hash_finish(hash);')
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _write_field_hash(self, field):
+        if type(field.type) is List:
+            self._module_out.writeln(f'hash = struct_ops_hash_word(hash, (uint64_t) value->{field.name}_length);')
+        if type(field.type) in [Array, List]:
+            element_type = field.type.element_type
+            count = self._element_count(field, 'value')
+            if self._is_bytewise(element_type):
+                self._module_out.writeln(f'hash = struct_ops_hash_bytes(hash, value->{field.name}, '
+                                         f'{count} * sizeof(*value->{field.name}));')
+            else:
+                self._write_element_loop(count, lambda: self._module_out.writeln(
+                    f'hash = {self._hash_value(element_type, f"value->{field.name}[index]")};'))
+        else:
+            self._module_out.writeln(f'hash = {self._hash_value(field.type, f"value->{field.name}")};')
+
+    def _write_copy_size(self, struct: Struct):
+        signature = f'size_t {self._lowered.c_name(struct)}_copy_size(const {self._lowered.c_type(struct)} *value)'
+        self._header_out.writeln('/* The storage size a deep copy of value needs, including alignment. */')
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+
+        def write_body():
+            fields = [field for field in struct.fields if not self._is_shallow(field.type)]
+            if not fields:
+                self._module_out.writeln('(void) value;')
+                self._module_out.writeln('return 0;')
+                return
+            self._module_out.writeln('size_t size = 0;')
+            for field in fields:
+                if type(field.type) in [Array, List]:
+                    element_type = field.type.element_type
+                    count = self._element_count(field, 'value')
+                    if type(field.type) is List and field.type.maximum_length is None:
+                        self._module_out.writeln(f'size += {count} * sizeof(*value->{field.name}) '
+                                                 f'+ _Alignof({self._lowered.c_type(element_type)}) - 1;')
+                    if not self._is_shallow(element_type):
+                        self._write_element_loop(count, lambda: self._module_out.writeln(
+                            f'size += {self._copy_size(element_type, f"value->{field.name}[index]")};'))
+                else:
+                    self._module_out.writeln(f'size += {self._copy_size(field.type, f"value->{field.name}")};')
+            self._module_out.writeln('return size;')
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _write_copy(self, struct: Struct):
+        c_type = self._lowered.c_type(struct)
+        signature = (f'int {self._lowered.c_name(struct)}_copy({c_type} *target, const {c_type} *source, '
+                     f'struct copy_storage *storage)')
+        self._header_out.writeln('/* Deep copies source into target, which must not overlap. -1 when out of storage. */')
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+
+        def write_body():
+            fields = [field for field in struct.fields if not self._is_shallow(field.type)]
+            if not fields:
+                self._module_out.writeln('(void) storage;')
+            self._module_out.writeln('*target = *source;')
+            for field in fields:
+                if type(field.type) is List and field.type.maximum_length is None:
+                    write_list_copy(field)
+                elif type(field.type) in [Array, List]:
+                    element_type = field.type.element_type
+                    self._write_element_loop(self._element_count(field, 'source'), lambda: self._return_if_failed(
+                        self._copy(element_type, f'target->{field.name}[index]', f'source->{field.name}[index]')))
+                else:
+                    self._return_if_failed(self._copy(field.type, f'target->{field.name}', f'source->{field.name}'))
+            self._module_out.writeln('return 0;')
+
+        def write_list_copy(field):
+            element_type = field.type.element_type
+            count = f'source->{field.name}_length'
+            self._module_out.writeln(f'target->{field.name} = copy_storage_allocate(storage, '
+                                     f'{count} * sizeof(*target->{field.name}), '
+                                     f'_Alignof({self._lowered.c_type(element_type)}));')
+            self._before_block(f'if (target->{field.name} == NULL)')
+            self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+            if self._is_shallow(element_type):
+                self._before_block(f'if ({count} > 0)')
+                self._module_out.block(lambda: self._module_out.writeln(
+                    f'memcpy(target->{field.name}, source->{field.name}, {count} * sizeof(*target->{field.name}));'))
+            else:
+                self._write_element_loop(count, lambda: self._return_if_failed(
+                    self._copy(element_type, f'target->{field.name}[index]', f'source->{field.name}[index]')))
+
+        self._module_out.block(write_body)
+        self._module_out.writeln()
+
+    def _comparisons(self, struct: Struct) -> list[list[FieldLayout] | FieldLayout]:
+        """The members of struct in layout order, with adjacent bytewise comparable members grouped into spans."""
+        comparisons = []
+        for member in self._layouts.for_struct(struct).fields:
+            if member.is_length:
+                continue
+            if not self._is_bytewise_member(struct, member):
+                comparisons.append(member)
+                continue
+            previous = comparisons[-1] if comparisons else None
+            if type(previous) is list and previous[-1].offset + previous[-1].size == member.offset:
+                previous.append(member)
+            else:
+                comparisons.append([member])
+        return comparisons
+
+    def _is_whole_struct(self, struct: Struct, comparisons) -> bool:
+        return len(comparisons) == 1 and type(comparisons[0]) is list and self._layouts.is_padding_free(struct)
+
+    def _is_bytewise_member(self, struct: Struct, member: FieldLayout) -> bool:
+        if member.field is None:
+            # unused bits of the packed word are indeterminate unless every bit belongs to a field
+            return self._packed_bits(struct) == (1 << 8 * member.size) - 1
+        return self._is_bytewise(member.type)
+
+    def _is_bytewise(self, t) -> bool:
+        """True if two values of type t are equal exactly when their bytes are."""
+        if type(t) is PrimitiveType:
+            return t is PrimitiveType.Boolean or t.is_integer
+        elif type(t) is Enumeration:
+            return True
+        elif type(t) is Array:
+            return self._is_bytewise(t.element_type)
+        elif type(t) is Struct:
+            return self._layouts.is_padding_free(t) and all(
+                self._is_bytewise_member(t, member) for member in self._layouts.for_struct(t).fields)
+        return False
+
+    def _is_shallow(self, t) -> bool:
+        """True if a plain assignment copies a value of type t completely."""
+        if t is PrimitiveType.String:
+            return False
+        elif type(t) is List:
+            return t.maximum_length is not None and self._is_shallow(t.element_type)
+        elif type(t) is Array:
+            return self._is_shallow(t.element_type)
+        elif type(t) is Struct:
+            return all(self._is_shallow(field.type) for field in t.fields)
+        return True
+
+    def _packed_bits(self, struct: Struct) -> int:
+        bits = 0
+        for bit_field in self._layouts.for_struct(struct).bit_fields.values():
+            bits |= bit_field.mask << bit_field.shift
+        return bits
+
+    def _packed_mask(self, struct: Struct) -> str:
+        return f'UINT64_C({self._packed_bits(struct):#x})'
+
+    def _span_size(self, struct: Struct, span: list[FieldLayout], pointer: str) -> str:
+        first = span[0].name
+        last = span[-1].name
+        if first == last:
+            return f'sizeof({pointer}->{first})'
+        c_type = self._lowered.c_type(struct)
+        return f'offsetof({c_type}, {last}) + sizeof({pointer}->{last}) - offsetof({c_type}, {first})'
+
+    def _span_differs(self, struct: Struct, span: list[FieldLayout]) -> str:
+        if len(span) == 1 and self._is_scalar(span[0].type):
+            return f'a->{span[0].name} != b->{span[0].name}'
+        return f'memcmp(&a->{span[0].name}, &b->{span[0].name}, {self._span_size(struct, span, "a")}) != 0'
+
+    def _hash_span(self, struct: Struct, span: list[FieldLayout]) -> str:
+        if len(span) == 1 and self._is_scalar(span[0].type):
+            return f'struct_ops_hash_word(hash, (uint64_t) value->{span[0].name})'
+        return f'struct_ops_hash_bytes(hash, &value->{span[0].name}, {self._span_size(struct, span, "value")})'
+
+    def _differs(self, t, a, b) -> str:
+        if type(t) is Struct:
+            return f'!{self._lowered.c_name(t)}_equals(&{a}, &{b})'
+        elif t is PrimitiveType.String:
+            return f'!struct_ops_string_equals({a}, {b})'
+        elif type(t) in [Array, List]:
+            raise ValueError(_nested_elements_message)
+        return f'{a} != {b}'
+
+    def _hash_value(self, t, expression) -> str:
+        if type(t) is Struct:
+            return f'struct_ops_hash_word(hash, {self._lowered.c_name(t)}_hash(&{expression}))'
+        elif t is PrimitiveType.String:
+            return f'struct_ops_hash_string(hash, {expression})'
+        elif t in [PrimitiveType.Float, PrimitiveType.Double]:
+            return f'struct_ops_hash_double(hash, {expression})'
+        elif type(t) in [Array, List]:
+            raise ValueError(_nested_elements_message)
+        return f'struct_ops_hash_word(hash, (uint64_t) {expression})'
+
+    def _copy_size(self, t, expression) -> str:
+        if type(t) is Struct:
+            return f'{self._lowered.c_name(t)}_copy_size(&{expression})'
+        elif t is PrimitiveType.String:
+            return f'copy_storage_string_size({expression})'
+        raise ValueError(_nested_elements_message)
+
+    def _copy(self, t, target, source) -> str:
+        if type(t) is Struct:
+            return f'{self._lowered.c_name(t)}_copy(&{target}, &{source}, storage)'
+        elif t is PrimitiveType.String:
+            return f'copy_storage_string(storage, &{target}, {source})'
+        raise ValueError(_nested_elements_message)
+
+    def _is_scalar(self, t) -> bool:
+        return type(t) in [PrimitiveType, Enumeration]
+
+    def _element_count(self, field, pointer):
+        if type(field.type) is Array:
+            return field.type.length
+        length = f'{pointer}->{field.name}_length'
+        if field.type.maximum_length is None:
+            return length
+        return f'({length} < {field.type.maximum_length} ? {length} : {field.type.maximum_length})'
+
+    def _write_element_loop(self, count, write_element):
+        self._before_block(f'for (size_t index = 0; index < {count}; ++index)')
+        self._module_out.block(write_element)
+
+    def _return_false_if(self, condition):
+        self._before_block(f'if ({condition})')
+        self._module_out.block(lambda: self._module_out.writeln('return false;'))
+
+    def _return_if_failed(self, call):
+        self._before_block(f'if ({call} < 0)')
+        self._module_out.block(lambda: self._module_out.writeln('return -1;'))
+
+    def _before_block(self, *values):
+        if self._style is Style.Knr:
+            self._module_out.write(*values, ' ')
+        elif self._style == Style.Bsd:
+            self._module_out.writeln(*values)
+        else:
+            raise ValueError(f"Unknown style [{str(self._style)}]")
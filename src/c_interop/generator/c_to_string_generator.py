@@ -1,30 +1,46 @@
+from typing import TextIO
+
 from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
-from c_interop.generator.ctypes import CTypes, PascalToCCase
+from c_interop.generator.format_runtime import FORMAT_RUNTIME
+from c_interop.generator.layout import packed_field_getter
+from c_interop.generator.lowering import LoweredModule
 from c_interop.generator.style import Style
-from c_interop.model.model import Module, Struct, Enumeration, PrimitiveType, Array
+from c_interop.generator.to_buffer_runtime import TO_BUFFER_RUNTIME
+from c_interop.model.model import Module, Struct, Enumeration, PrimitiveType, Array, List
 
 
 class CToStringGenerator:
-    def __init__(self, module: Module, style=Style.Knr):
+    def __init__(self, module: Module, style=Style.Knr, header_sink: TextIO = None, module_sink: TextIO = None,
+                 lowered: LoweredModule = None):
         self.module = module
         self._style = style
-        self._header_out = CodeWriter(CodeWriterMode.C)
-        self._module_out = CodeWriter(CodeWriterMode.C)
-        self._ctypes = CTypes()
+        self._header_out = CodeWriter(CodeWriterMode.C, header_sink)
+        self._module_out = CodeWriter(CodeWriterMode.C, module_sink)
+        self._lowered = lowered if lowered is not None else LoweredModule(module)
+        self._layouts = self._lowered.layouts
 
     def run(self):
         for enum in self.module.enums:
             self._write_enum_to_string(enum)
         for struct in self.module.structs:
             self._write_struct_to_string(struct)
+        self._module_out.writeln(FORMAT_RUNTIME.strip())
+        self._module_out.writeln()
+        self._module_out.writeln(TO_BUFFER_RUNTIME.strip())
+        self._module_out.writeln()
+        for enum in self.module.enums:
+            self._write_enum_append(enum)
+        for struct in self.module.structs:
+            self._write_struct_append(struct)
+            self._write_struct_to_buffer(struct)
 
     def result(self):
         return self._header_out.result(), self._module_out.result()
 
     def _write_enum_to_string(self, enum: Enumeration):
-        enum_c_name = self._enum_c_name(enum)
+        enum_c_name = self._lowered.c_type(enum)
 
-        enum_c_signature = f'void {enum_c_name}_to_string({enum_c_name} value, struct OutputHandler *out)'
+        enum_c_signature = f'void {self._to_string_name(enum_c_name)}_to_string({enum_c_name} value, struct OutputHandler *out)'
 
         self._header_out.writeln(enum_c_signature + ';')
 
@@ -50,9 +66,9 @@ class CToStringGenerator:
         self._module_out.writeln()
 
     def _write_struct_to_string(self, struct: Struct):
-        struct_c_name = self._struct_c_name(struct)
+        struct_c_name = self._lowered.c_type(struct)
 
-        struct_c_signature = f'void {struct_c_name}_to_string({struct_c_name} value, struct OutputHandler *out, size_t indentation)'
+        struct_c_signature = f'void {self._to_string_name(struct_c_name)}_to_string(const {struct_c_name} *value, struct OutputHandler *out, size_t indentation)'
 
         self._header_out.writeln(struct_c_signature + ';')
 
@@ -69,22 +85,24 @@ class CToStringGenerator:
             self._module_out.writeln(f'OutputHandler_indent(out, indentation + 1);')
             self._module_out.writeln(f'OutputHandler_process(out, "%s: ", "{field.name}");')
             if type(field.type) is Struct:
-                self._module_out.writeln(f'{self._struct_c_name(field.type)}_to_string(value.{field.name}, out, indentation + 1);')
+                self._module_out.writeln(f'{self._to_string_name(self._lowered.c_type(field.type))}_to_string(&value->{field.name}, out, indentation + 1);')
             elif type(field.type) is Enumeration:
-                self._module_out.writeln(f'{self._enum_c_name(field.type)}_to_string(value.{field.name}, out);')
+                self._module_out.writeln(f'{self._to_string_name(self._lowered.c_type(field.type))}_to_string({self._member(struct, field)}, out);')
             elif type(field.type) is PrimitiveType:
                 field_code = primitive_type_printf_code(field.type)
-                self._module_out.writeln(f'OutputHandler_process(out, {field_code}, value.{field.name});')
+                field_argument = primitive_printf_argument(field.type, self._member(struct, field))
+                self._module_out.writeln(f'OutputHandler_process(out, {field_code}, {field_argument});')
             elif type(field.type) is Array:
                 def write_array_element_to_string():
                     self._module_out.writeln(f'OutputHandler_indent(out, indentation + 2);')
                     if type(field.type.element_type) is Struct:
-                        self._module_out.writeln(f'{self._struct_c_name(field.type.element_type)}_to_string(value.{field.name}[index], out, indentation + 2);')
-                    elif type(field.type) is Enumeration:
-                        self._module_out.writeln(f'{self._enum_c_name(field.type.element_type)}_to_string(value.{field.name}[index], out);')
-                    elif type(field.type) is PrimitiveType:
+                        self._module_out.writeln(f'{self._to_string_name(self._lowered.c_type(field.type.element_type))}_to_string(&value->{field.name}[index], out, indentation + 2);')
+                    elif type(field.type.element_type) is Enumeration:
+                        self._module_out.writeln(f'{self._to_string_name(self._lowered.c_type(field.type.element_type))}_to_string(value->{field.name}[index], out);')
+                    elif type(field.type.element_type) is PrimitiveType:
                         element_code = primitive_type_printf_code(field.type.element_type)
-                        self._module_out.writeln(f'OutputHandler_process(out, {element_code}, value.{field.name}[index]);')
+                        element_argument = primitive_printf_argument(field.type.element_type, f'value->{field.name}[index]')
+                        self._module_out.writeln(f'OutputHandler_process(out, {element_code}, {element_argument});')
                     self._module_out.writeln(f'OutputHandler_process(out, ",\\n");')
 
                 self._module_out.writeln(f'OutputHandler_process(out, "[\\n");')
@@ -100,17 +118,115 @@ class CToStringGenerator:
         self._module_out.block(write_to_string_body)
         self._module_out.writeln()
 
-    def _enum_c_name(self, enum):
-        prefix = '' if enum.typedef else 'enum '
-        postfix = '_e' if enum.typedef else ''
-        enum_c_name = prefix + PascalToCCase(enum.name).result + postfix
-        return enum_c_name
+    def _write_enum_append(self, enum: Enumeration):
+        enum_c_name = self._lowered.c_type(enum)
+        self._before_block(f'static void {self._lowered.c_name(enum)}_append(struct to_buffer *buffer, {enum_c_name} value)')
+
+        def write_switch_block():
+            for value in enum.values:
+                self._module_out.writeln(f'case {value}:')
+                self._module_out.indent()
+                self._module_out.writeln(f'to_buffer_literal(buffer, {quote(value)});')
+                self._module_out.writeln('break;')
+                self._module_out.unindent()
+            self._module_out.writeln('default:')
+            self._module_out.indent()
+            self._module_out.writeln(f'to_buffer_literal(buffer, {quote(f"Unknown {enum.name} value: ")});')
+            self._module_out.writeln('to_buffer_signed(buffer, (int64_t) value);')
+            self._module_out.unindent()
+
+        def write_append_body():
+            self._before_block('switch (value)')
+            self._module_out.block(write_switch_block)
+
+        self._module_out.block(write_append_body)
+        self._module_out.writeln()
+
+    def _write_struct_append(self, struct: Struct):
+        struct_c_name = self._lowered.c_type(struct)
+        self._before_block(f'static void {self._lowered.c_name(struct)}_append(struct to_buffer *buffer, '
+                           f'const {struct_c_name} *value, size_t indentation)')
+        segments = LiteralSegments(self._module_out)
+
+        def write_append_body():
+            segments.literal(f'{struct.name} {{\n')
+            for field in struct.fields:
+                segments.code('to_buffer_indent(buffer, indentation + 1);')
+                segments.literal(f'{field.name}: ')
+                if type(field.type) in [Array, List]:
+                    write_elements(field)
+                else:
+                    segments.code(self._append_value(field.type, self._member(struct, field), 'indentation + 1'))
+                segments.literal(',\n')
+            segments.code('to_buffer_indent(buffer, indentation);')
+            segments.literal('}')
+            segments.flush()
+
+        def write_elements(field):
+            element_type = field.type.element_type
+            if type(element_type) in [Array, List]:
+                raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
+            segments.literal('[\n')
+            if type(field.type) is Array:
+                length = field.type.length
+            else:
+                length = f'value->{field.name}_length'
+                if field.type.maximum_length is not None:
+                    length = f'({length} < {field.type.maximum_length} ? {length} : {field.type.maximum_length})'
+            segments.flush()
+            self._before_block(f'for (size_t index = 0; index < {length}; ++index)')
+
+            def write_element():
+                self._module_out.writeln('to_buffer_indent(buffer, indentation + 2);')
+                self._module_out.writeln(self._append_value(element_type, f'value->{field.name}[index]', 'indentation + 2'))
+                self._module_out.writeln('to_buffer_literal(buffer, ",\\n");')
+
+            self._module_out.block(write_element)
+            segments.code('to_buffer_indent(buffer, indentation + 1);')
+            segments.literal(']')
+
+        self._module_out.block(write_append_body)
+        self._module_out.writeln()
+
+    def _write_struct_to_buffer(self, struct: Struct):
+        name = self._lowered.c_name(struct)
+        signature = f'size_t {name}_to_buffer(const {self._lowered.c_type(struct)} *value, char *buffer, size_t capacity)'
+        self._header_out.writeln(signature + ';')
+        self._before_block(signature)
+
+        def write_to_buffer_body():
+            self._module_out.writeln('struct to_buffer output = {buffer, capacity, 0};')
+            self._module_out.writeln(f'{name}_append(&output, value, 0);')
+            self._module_out.writeln('return to_buffer_finish(&output);')
+
+        self._module_out.block(write_to_buffer_body)
+        self._module_out.writeln()
+
+    def _append_value(self, t, expression, indentation):
+        if type(t) is Struct:
+            return f'{self._lowered.c_name(t)}_append(buffer, &{expression}, {indentation});'
+        elif type(t) is Enumeration:
+            return f'{self._lowered.c_name(t)}_append(buffer, {expression});'
+        elif t is PrimitiveType.Boolean:
+            return f'to_buffer_string(buffer, {expression} ? "true" : "false");'
+        elif t is PrimitiveType.String:
+            return f'to_buffer_string(buffer, {expression});'
+        elif t in [PrimitiveType.Float, PrimitiveType.Double]:
+            return f'to_buffer_double(buffer, {expression});'
+        elif t in [PrimitiveType.UInt8, PrimitiveType.UInt16, PrimitiveType.UInt32, PrimitiveType.UInt64]:
+            return f'to_buffer_unsigned(buffer, {expression});'
+        elif type(t) is PrimitiveType:
+            return f'to_buffer_signed(buffer, {expression});'
+        raise ValueError(f"Unsupported type: {t}")
 
-    def _struct_c_name(self, struct):
-        prefix = '' if struct.typedef else 'struct '
-        postfix = '_t' if struct.typedef else ''
-        struct_c_name = prefix + PascalToCCase(struct.name).result + postfix
-        return struct_c_name
+    def _member(self, struct, field):
+        if self._layouts.bit_field(struct, field.name) is not None:
+            return packed_field_getter(struct, field.name, 'value')
+        return f'value->{field.name}'
+
+    def _to_string_name(self, c_name):
+        # typedef names are used as they are, tagged types without their struct or enum keyword
+        return c_name.removeprefix('struct ').removeprefix('enum ')
 
     def _before_block(self, *values):
         if self._style is Style.Knr:
@@ -121,8 +237,30 @@ class CToStringGenerator:
             raise ValueError(f"Unknown style [{str(self._style)}]")
 
 
+class LiteralSegments:
+    """Merges consecutive constant output into single calls of a literal appending macro."""
+
+    def __init__(self, out: CodeWriter, literal: str = 'to_buffer_literal', target: str = 'buffer'):
+        self._out = out
+        self._literal = literal
+        self._target = target
+        self._text = ''
+
+    def literal(self, text: str):
+        self._text += text
+
+    def code(self, line: str):
+        self.flush()
+        self._out.writeln(line)
+
+    def flush(self):
+        if self._text:
+            self._out.writeln(f'{self._literal}({self._target}, {quote(self._text)});')
+            self._text = ''
+
+
 def primitive_type_printf_code(primitve_type):
-    if primitve_type == PrimitiveType.Int64:
+    if primitve_type in (PrimitiveType.Int64, PrimitiveType.Integer):
         return '"%" PRIi64'
     elif primitve_type == PrimitiveType.UInt64:
         return '"%" PRIu64'
@@ -140,10 +278,21 @@ def primitive_type_printf_code(primitve_type):
         return '"%" PRIu8'
     elif primitve_type in (PrimitiveType.Double, PrimitiveType.Float):
         return '"%f"'
+    elif primitve_type in (PrimitiveType.Boolean, PrimitiveType.String):
+        return '"%s"'
     else:
         raise ValueError(f"Unsupported primitive type: {primitve_type}")
 
 
+def primitive_printf_argument(primitive_type, expression):
+    """The printf argument for expression, spelling out Booleans and NULL strings like the to_buffer output."""
+    if primitive_type is PrimitiveType.Boolean:
+        return f'{expression} ? "true" : "false"'
+    elif primitive_type is PrimitiveType.String:
+        return f'{expression} != NULL ? {expression} : "(null)"'
+    return expression
+
+
 def quote(text: str) -> str:
     return f'"{escape(text)}"'
 
@@ -1,8 +1,9 @@
 from enum import Enum
-from typing import Callable
+from typing import Callable, TextIO
 
 _indentation_step = 4
 _indentation = ' ' * _indentation_step
+_default_chunk_size = 16384
 
 
 class CodeWriterMode(Enum):
@@ -11,8 +12,15 @@ class CodeWriterMode(Enum):
 
 
 class CodeWriter:
-    def __init__(self, mode: CodeWriterMode):
+    """
+    Collects code until result() joins it. With a sink, complete lines are written to the sink whenever chunk_size
+    fragments are buffered, so the memory used does not grow with the size of the code.
+    """
+
+    def __init__(self, mode: CodeWriterMode, sink: TextIO = None, chunk_size: int = _default_chunk_size):
         self._buffer: list[str] = []
+        self._sink = sink
+        self._chunk_size = chunk_size
         self._indentation_level = 0
         self._at_line_start = True
         self._opening_bracket: str
@@ -33,9 +41,14 @@ class CodeWriter:
             self._buffer.append(str(value))
 
     def writeln(self, *values):
+        if len(values) == 0 and self._at_line_start:
+            self._buffer.append('\n')
+            return
         self.write(*values)
         self.write('\n')
         self._at_line_start = True
+        if self._sink is not None and len(self._buffer) >= self._chunk_size:
+            self.flush()
 
     # noinspection PyTypeChecker
     def block(self, write_code: Callable[['CodeWriter'], None] | Callable[[], None], suffix=''):
@@ -54,10 +67,20 @@ class CodeWriter:
         self._indentation_level -= 1
 
     def result(self):
+        """The code written, or with a sink the empty string after writing the rest of the code to the sink."""
         if self._indentation_level != 0:
             raise ValueError("Attempting to retrieve result at indentation level " + str(self._indentation_level))
+        if self._sink is not None:
+            self.flush()
+            return ''
         return ''.join(self._buffer)
 
+    def flush(self):
+        if self._sink is None:
+            raise ValueError("Attempting to flush a CodeWriter without a sink")
+        self._sink.write(''.join(self._buffer))
+        self._buffer.clear()
+
     def indentation(self):
         return self._indentation_level
 
@@ -0,0 +1,72 @@
+COLUMNS_RUNTIME = r'''
+#ifndef C_INTEROP_COLUMNS_RUNTIME
+#define C_INTEROP_COLUMNS_RUNTIME
+
+#include <string.h>
+
+#define columns_alignment 16
+
+static size_t columns_align(size_t offset) {
+    return (offset + columns_alignment - 1) / columns_alignment * columns_alignment;
+}
+
+/* Places a column of count items of element_size bytes at the aligned end of the size bytes placed so far. Sets an
+ * exception and returns -1 if the columns do not fit into a bytearray. */
+static int columns_place(size_t *size, size_t count, size_t element_size, size_t *offset) {
+    size_t start = columns_align(*size);
+    if (start < *size || start > (size_t) PY_SSIZE_T_MAX || count > ((size_t) PY_SSIZE_T_MAX - start) / element_size) {
+        PyErr_NoMemory();
+        return -1;
+    }
+    *offset = start;
+    *size = start + count * element_size;
+    return 0;
+}
+
+/* Adds the size bytes at offset of storage, cast to format, to result under key. */
+static int columns_add_view(PyObject *result, PyObject *key, PyObject *storage, size_t offset, size_t size, const char *format) {
+    PyObject *slice = PySequence_GetSlice(storage, (Py_ssize_t) offset, (Py_ssize_t) (offset + size));
+    if (slice == NULL) {
+        return -1;
+    }
+    PyObject *column = PyObject_CallMethod(slice, "cast", "s", format);
+    Py_DECREF(slice);
+    if (column == NULL) {
+        return -1;
+    }
+    int status = PyDict_SetItem(result, key, column);
+    Py_DECREF(column);
+    return status;
+}
+
+/* Acquires the buffer of columns[key], which must hold items of element_size bytes and struct module type code,
+ * and as many of them as the columns acquired before it if index > 0. */
+static int columns_get_buffer(PyObject *columns, PyObject *key, char code, size_t element_size, Py_buffer *view, size_t index,
+                              size_t *length) {
+    PyObject *column = PyObject_GetItem(columns, key);
+    if (column == NULL) {
+        return -1;
+    }
+    int status = PyObject_GetBuffer(column, view, PyBUF_FORMAT | PyBUF_C_CONTIGUOUS);
+    Py_DECREF(column);
+    if (status < 0) {
+        return -1;
+    }
+    if ((size_t) view->itemsize != element_size || !buffer_format_matches(view->format, code)) {
+        PyErr_Format(PyExc_TypeError, "Column [%U] has items of format [%s] and size %zd", key,
+                     view->format != NULL ? view->format : "B", view->itemsize);
+        PyBuffer_Release(view);
+        return -1;
+    }
+    size_t column_length = (size_t) view->len / element_size;
+    if (index > 0 && column_length != *length) {
+        PyErr_Format(PyExc_ValueError, "Column [%U] has %zu items instead of %zu", key, column_length, *length);
+        PyBuffer_Release(view);
+        return -1;
+    }
+    *length = column_length;
+    return 0;
+}
+
+#endif
+'''
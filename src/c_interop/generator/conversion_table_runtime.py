@@ -0,0 +1,441 @@
+CONVERSION_TABLE_RUNTIME = r'''
+#ifndef C_INTEROP_CONVERSION_TABLE_RUNTIME
+#define C_INTEROP_CONVERSION_TABLE_RUNTIME
+
+#include <limits.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+enum conversion_kind {
+    conversion_kind_bool,
+    conversion_kind_int8,
+    conversion_kind_uint8,
+    conversion_kind_int16,
+    conversion_kind_uint16,
+    conversion_kind_int32,
+    conversion_kind_uint32,
+    conversion_kind_int64,
+    conversion_kind_uint64,
+    conversion_kind_float,
+    conversion_kind_double,
+    conversion_kind_string,
+    conversion_kind_enum,
+    conversion_kind_struct
+};
+
+struct conversion_type;
+
+/* key, python_class, members and array_class are offsets into the per-module conversion state.
+ * Fields with a bit_width are bits of the bit_word_size bytes integer at offset, enums relative to their first ordinal. */
+struct conversion_field {
+    size_t key;
+    size_t offset;
+    enum conversion_kind kind;
+    size_t count;
+    size_t length_offset;
+    const struct conversion_type *nested;
+    const char *buffer_format;
+    size_t array_class;
+    size_t bit_word_size;
+    unsigned bit_shift;
+    unsigned bit_width;
+};
+
+struct conversion_type {
+    const char *name;
+    size_t size;
+    size_t python_class;
+    size_t members;
+    long long first_ordinal;
+    size_t value_count;
+    size_t field_count;
+    const struct conversion_field *fields;
+};
+
+#define conversion_no_length SIZE_MAX
+#define conversion_unbounded SIZE_MAX
+#define conversion_no_entry SIZE_MAX
+
+static int conversion_struct_to_c(const void *state, const struct conversion_type *type, PyObject *python_struct, void *target,
+                                  struct conversion_arena *arena);
+static PyObject *conversion_struct_to_python(const void *state, const struct conversion_type *type, const void *source);
+
+static PyObject *const *conversion_state_entries(const void *state, size_t offset) {
+    return (PyObject *const *) ((const char *) state + offset);
+}
+
+static PyObject *conversion_state_entry(const void *state, size_t offset) {
+    return offset == conversion_no_entry ? NULL : *conversion_state_entries(state, offset);
+}
+
+static size_t conversion_element_size(enum conversion_kind kind, const struct conversion_type *nested) {
+    switch (kind) {
+        case conversion_kind_bool: return sizeof(bool);
+        case conversion_kind_int8: case conversion_kind_uint8: return 1;
+        case conversion_kind_int16: case conversion_kind_uint16: return 2;
+        case conversion_kind_int32: case conversion_kind_uint32: return 4;
+        case conversion_kind_int64: case conversion_kind_uint64: return 8;
+        case conversion_kind_float: return sizeof(float);
+        case conversion_kind_double: return sizeof(double);
+        case conversion_kind_string: return sizeof(const char *);
+        default: return nested->size;
+    }
+}
+
+static int conversion_store_integer(void *target, size_t size, long long value) {
+    switch (size) {
+        case 1: { int8_t v = (int8_t) value; memcpy(target, &v, 1); return 0; }
+        case 2: { int16_t v = (int16_t) value; memcpy(target, &v, 2); return 0; }
+        case 4: { int32_t v = (int32_t) value; memcpy(target, &v, 4); return 0; }
+        case 8: { int64_t v = (int64_t) value; memcpy(target, &v, 8); return 0; }
+        default:
+            PyErr_Format(PyExc_SystemError, "Unsupported integer size [%zu]", size);
+            return -1;
+    }
+}
+
+static long long conversion_load_integer(const void *source, size_t size) {
+    switch (size) {
+        case 1: { int8_t v; memcpy(&v, source, 1); return v; }
+        case 2: { int16_t v; memcpy(&v, source, 2); return v; }
+        case 4: { int32_t v; memcpy(&v, source, 4); return v; }
+        default: { int64_t v; memcpy(&v, source, 8); return v; }
+    }
+}
+
+static uint64_t conversion_load_unsigned(const void *source, size_t size) {
+    switch (size) {
+        case 1: { uint8_t v; memcpy(&v, source, 1); return v; }
+        case 2: { uint16_t v; memcpy(&v, source, 2); return v; }
+        case 4: { uint32_t v; memcpy(&v, source, 4); return v; }
+        default: { uint64_t v; memcpy(&v, source, 8); return v; }
+    }
+}
+
+/* Compact enums without negative ordinals are stored unsigned. */
+static long long conversion_load_ordinal(const struct conversion_type *type, const void *source) {
+    if (type->first_ordinal >= 0) {
+        return (long long) conversion_load_unsigned(source, type->size);
+    }
+    return conversion_load_integer(source, type->size);
+}
+
+static int conversion_enum_to_c(const void *state, const struct conversion_type *type, PyObject *value, void *target) {
+    PyObject *const *members = conversion_state_entries(state, type->members);
+    for (size_t index = 0; index < type->value_count; ++index) {
+        if (members[index] == value) {
+            return conversion_store_integer(target, type->size, type->first_ordinal + (long long) index);
+        }
+    }
+    PyObject *ordinal_object = PyObject_GetAttrString(value, "value");
+    if (ordinal_object == NULL) {
+        return -1;
+    }
+    long long ordinal = PyLong_AsLongLong(ordinal_object);
+    Py_DECREF(ordinal_object);
+    if (ordinal == -1 && PyErr_Occurred()) {
+        return -1;
+    }
+    if (ordinal < type->first_ordinal || ordinal >= type->first_ordinal + (long long) type->value_count) {
+        PyErr_Format(PyExc_ValueError, "Illegal ordinal value for enum %s [%lld]", type->name, ordinal);
+        return -1;
+    }
+    return conversion_store_integer(target, type->size, ordinal);
+}
+
+static int conversion_signed_to_c(PyObject *value, long long minimum, long long maximum, size_t size, void *target) {
+    long long result = PyLong_AsLongLong(value);
+    if (result == -1 && PyErr_Occurred()) {
+        return -1;
+    }
+    if (result < minimum || result > maximum) {
+        PyErr_Format(PyExc_OverflowError, "Value [%lld] out of range", result);
+        return -1;
+    }
+    return conversion_store_integer(target, size, result);
+}
+
+static int conversion_unsigned_to_c(PyObject *value, unsigned long long maximum, size_t size, void *target) {
+    unsigned long long result = PyLong_AsUnsignedLongLong(value);
+    if (result == (unsigned long long) -1 && PyErr_Occurred()) {
+        return -1;
+    }
+    if (result > maximum) {
+        PyErr_Format(PyExc_OverflowError, "Value [%llu] out of range", result);
+        return -1;
+    }
+    if (size == 8) {
+        uint64_t v = (uint64_t) result;
+        memcpy(target, &v, 8);
+        return 0;
+    }
+    return conversion_store_integer(target, size, (long long) result);
+}
+
+static int conversion_value_to_c(const void *state, enum conversion_kind kind, const struct conversion_type *nested,
+                                 PyObject *value, void *target, struct conversion_arena *arena) {
+    switch (kind) {
+        case conversion_kind_bool: {
+            int truth = PyObject_IsTrue(value);
+            if (truth < 0) {
+                return -1;
+            }
+            *(bool *) target = truth != 0;
+            return 0;
+        }
+        case conversion_kind_int8: return conversion_signed_to_c(value, INT8_MIN, INT8_MAX, 1, target);
+        case conversion_kind_uint8: return conversion_unsigned_to_c(value, UINT8_MAX, 1, target);
+        case conversion_kind_int16: return conversion_signed_to_c(value, INT16_MIN, INT16_MAX, 2, target);
+        case conversion_kind_uint16: return conversion_unsigned_to_c(value, UINT16_MAX, 2, target);
+        case conversion_kind_int32: return conversion_signed_to_c(value, INT32_MIN, INT32_MAX, 4, target);
+        case conversion_kind_uint32: return conversion_unsigned_to_c(value, UINT32_MAX, 4, target);
+        case conversion_kind_int64: return conversion_signed_to_c(value, INT64_MIN, INT64_MAX, 8, target);
+        case conversion_kind_uint64: return conversion_unsigned_to_c(value, UINT64_MAX, 8, target);
+        case conversion_kind_float:
+        case conversion_kind_double: {
+            double result = PyFloat_AsDouble(value);
+            if (result == -1.0 && PyErr_Occurred()) {
+                return -1;
+            }
+            if (kind == conversion_kind_float) {
+                *(float *) target = (float) result;
+            } else {
+                *(double *) target = result;
+            }
+            return 0;
+        }
+        case conversion_kind_enum: return conversion_enum_to_c(state, nested, value, target);
+        case conversion_kind_string: {
+            const char *text = conversion_arena_utf8(arena, value);
+            if (text == NULL && value != Py_None) {
+                return -1;
+            }
+            *(const char **) target = text;
+            return 0;
+        }
+        default: return conversion_struct_to_c(state, nested, value, target, arena);
+    }
+}
+
+static PyObject *conversion_value_to_python(const void *state, enum conversion_kind kind, const struct conversion_type *nested,
+                                            const void *source) {
+    switch (kind) {
+        case conversion_kind_bool: return PyBool_FromLong(*(const bool *) source);
+        case conversion_kind_int8: return PyLong_FromLong(*(const int8_t *) source);
+        case conversion_kind_uint8: return PyLong_FromUnsignedLong(*(const uint8_t *) source);
+        case conversion_kind_int16: return PyLong_FromLong(*(const int16_t *) source);
+        case conversion_kind_uint16: return PyLong_FromUnsignedLong(*(const uint16_t *) source);
+        case conversion_kind_int32: return PyLong_FromLong(*(const int32_t *) source);
+        case conversion_kind_uint32: return PyLong_FromUnsignedLong(*(const uint32_t *) source);
+        case conversion_kind_int64: return PyLong_FromLongLong(*(const int64_t *) source);
+        case conversion_kind_uint64: return PyLong_FromUnsignedLongLong(*(const uint64_t *) source);
+        case conversion_kind_float: return PyFloat_FromDouble(*(const float *) source);
+        case conversion_kind_double: return PyFloat_FromDouble(*(const double *) source);
+        case conversion_kind_string: {
+            const char *text = *(const char * const *) source;
+            if (text == NULL) {
+                Py_RETURN_NONE;
+            }
+            return PyUnicode_FromString(text);
+        }
+        case conversion_kind_enum: {
+            long long index = conversion_load_ordinal(nested, source) - nested->first_ordinal;
+            if (index < 0 || index >= (long long) nested->value_count) {
+                PyErr_Format(PyExc_ValueError, "Unable to convert ordinal value [%lld] to enum %s",
+                             index + nested->first_ordinal, nested->name);
+                return NULL;
+            }
+            PyObject *result = conversion_state_entries(state, nested->members)[index];
+            Py_INCREF(result);
+            return result;
+        }
+        default: return conversion_struct_to_python(state, nested, source);
+    }
+}
+
+static char conversion_buffer_code(enum conversion_kind kind) {
+    switch (kind) {
+        case conversion_kind_bool: return '?';
+        case conversion_kind_int8: return 'b';
+        case conversion_kind_uint8: return 'B';
+        case conversion_kind_int16: return 'h';
+        case conversion_kind_uint16: return 'H';
+        case conversion_kind_int32: return 'i';
+        case conversion_kind_uint32: return 'I';
+        case conversion_kind_int64: return 'q';
+        case conversion_kind_uint64: return 'Q';
+        case conversion_kind_float: return 'f';
+        case conversion_kind_double: return 'd';
+        default: return '\0';
+    }
+}
+
+static int conversion_bits_to_c(const void *state, const struct conversion_field *field, PyObject *value, char *word) {
+    uint64_t stored;
+    if (field->kind == conversion_kind_bool) {
+        int truth = PyObject_IsTrue(value);
+        if (truth < 0) {
+            return -1;
+        }
+        stored = truth != 0;
+    } else {
+        int64_t ordinal = 0;
+        if (conversion_enum_to_c(state, field->nested, value, &ordinal) < 0) {
+            return -1;
+        }
+        stored = (uint64_t) (conversion_load_ordinal(field->nested, &ordinal) - field->nested->first_ordinal);
+    }
+    uint64_t mask = (((uint64_t) 1 << field->bit_width) - 1) << field->bit_shift;
+    uint64_t bits = (conversion_load_unsigned(word, field->bit_word_size) & ~mask) | ((stored << field->bit_shift) & mask);
+    return conversion_store_integer(word, field->bit_word_size, (long long) bits);
+}
+
+static PyObject *conversion_bits_to_python(const void *state, const struct conversion_field *field, const char *word) {
+    uint64_t stored = (conversion_load_unsigned(word, field->bit_word_size) >> field->bit_shift)
+                      & (((uint64_t) 1 << field->bit_width) - 1);
+    if (field->kind == conversion_kind_bool) {
+        return PyBool_FromLong(stored != 0);
+    }
+    if (stored >= field->nested->value_count) {
+        PyErr_Format(PyExc_ValueError, "Unable to convert ordinal value [%lld] to enum %s",
+                     (long long) stored + field->nested->first_ordinal, field->nested->name);
+        return NULL;
+    }
+    PyObject *result = conversion_state_entries(state, field->nested->members)[stored];
+    Py_INCREF(result);
+    return result;
+}
+
+static int conversion_field_to_c(const void *state, const struct conversion_field *field, PyObject *value, char *target,
+                                 struct conversion_arena *arena) {
+    if (field->bit_width > 0) {
+        return conversion_bits_to_c(state, field, value, target + field->offset);
+    }
+    if (field->count == 0) {
+        return conversion_value_to_c(state, field->kind, field->nested, value, target + field->offset, arena);
+    }
+    int is_list = field->length_offset != conversion_no_length;
+    int is_unbounded = field->count == conversion_unbounded;
+    if (field->kind < conversion_kind_string && !is_unbounded) {
+        size_t buffer_length = 0;
+        int buffer_status = buffer_to_c_array(value, target + field->offset, conversion_element_size(field->kind, NULL),
+                                              conversion_buffer_code(field->kind), field->count, !is_list, &buffer_length);
+        if (buffer_status != 0) {
+            if (buffer_status > 0 && is_list) {
+                *(size_t *) (target + field->length_offset) = buffer_length;
+            }
+            return buffer_status < 0 ? -1 : 0;
+        }
+    }
+    PyObject *items = PySequence_Fast(value, "Expected a sequence");
+    if (items == NULL) {
+        return -1;
+    }
+    Py_ssize_t length = PySequence_Fast_GET_SIZE(items);
+    if (!is_unbounded && (is_list ? (size_t) length > field->count : (size_t) length != field->count)) {
+        PyErr_Format(PyExc_ValueError, "Illegal sequence length [%zd] for field [%U]", length, conversion_state_entry(state, field->key));
+        Py_DECREF(items);
+        return -1;
+    }
+    size_t element_size = conversion_element_size(field->kind, field->nested);
+    char *destination = target + field->offset;
+    if (is_unbounded) {
+        destination = conversion_arena_allocate(arena, (size_t) length * element_size, _Alignof(max_align_t));
+        if (destination == NULL) {
+            Py_DECREF(items);
+            return -1;
+        }
+        *(char **) (target + field->offset) = destination;
+    }
+    PyObject **elements = PySequence_Fast_ITEMS(items);
+    for (Py_ssize_t index = 0; index < length; ++index) {
+        char *element = destination + (size_t) index * element_size;
+        if (conversion_value_to_c(state, field->kind, field->nested, elements[index], element, arena) < 0) {
+            Py_DECREF(items);
+            return -1;
+        }
+    }
+    Py_DECREF(items);
+    if (is_list) {
+        *(size_t *) (target + field->length_offset) = (size_t) length;
+    }
+    return 0;
+}
+
+static PyObject *conversion_field_to_python(const void *state, const struct conversion_field *field, const char *source) {
+    if (field->bit_width > 0) {
+        return conversion_bits_to_python(state, field, source + field->offset);
+    }
+    if (field->count == 0) {
+        return conversion_value_to_python(state, field->kind, field->nested, source + field->offset);
+    }
+    size_t length = field->count;
+    const char *items = source + field->offset;
+    if (field->count == conversion_unbounded) {
+        length = *(const size_t *) (source + field->length_offset);
+        items = *(const char * const *) items;
+    } else if (field->length_offset != conversion_no_length) {
+        length = *(const size_t *) (source + field->length_offset);
+        if (length > field->count) {
+            PyErr_Format(PyExc_ValueError, "Illegal list length [%zu] for field [%U]", length, conversion_state_entry(state, field->key));
+            return NULL;
+        }
+    }
+    size_t element_size = conversion_element_size(field->kind, field->nested);
+    if (field->buffer_format != NULL) {
+        return c_array_to_buffer_object(conversion_state_entry(state, field->array_class),
+                                        field->buffer_format, items, length, element_size);
+    }
+    PyObject *result = PyList_New((Py_ssize_t) length);
+    if (result == NULL) {
+        return NULL;
+    }
+    for (size_t index = 0; index < length; ++index) {
+        PyObject *item = conversion_value_to_python(state, field->kind, field->nested, items + index * element_size);
+        if (item == NULL) {
+            Py_DECREF(result);
+            return NULL;
+        }
+        PyList_SET_ITEM(result, (Py_ssize_t) index, item);
+    }
+    return result;
+}
+
+static int conversion_struct_to_c(const void *state, const struct conversion_type *type, PyObject *python_struct, void *target,
+                                  struct conversion_arena *arena) {
+    for (size_t index = 0; index < type->field_count; ++index) {
+        const struct conversion_field *field = &type->fields[index];
+        PyObject *value = PyObject_GetAttr(python_struct, conversion_state_entry(state, field->key));
+        if (value == NULL) {
+            return -1;
+        }
+        int status = conversion_field_to_c(state, field, value, target, arena);
+        Py_DECREF(value);
+        if (status < 0) {
+            return -1;
+        }
+    }
+    return 0;
+}
+
+static PyObject *conversion_struct_to_python(const void *state, const struct conversion_type *type, const void *source) {
+    PyObject *result = PyObject_CallNoArgs(conversion_state_entry(state, type->python_class));
+    if (result == NULL) {
+        return NULL;
+    }
+    for (size_t index = 0; index < type->field_count; ++index) {
+        const struct conversion_field *field = &type->fields[index];
+        PyObject *value = conversion_field_to_python(state, field, source);
+        if (value == NULL || PyObject_SetAttr(result, conversion_state_entry(state, field->key), value) < 0) {
+            Py_XDECREF(value);
+            Py_DECREF(result);
+            return NULL;
+        }
+        Py_DECREF(value);
+    }
+    return result;
+}
+
+#endif
+'''
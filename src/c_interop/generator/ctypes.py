@@ -43,7 +43,9 @@ class CTypes:
                 else:
                     return 'struct ' + PascalToCCase(t.name).result
             elif type(t) is Enumeration:
-                if typing.cast(Enumeration, t).typedef:
+                if typing.cast(Enumeration, t).compact:
+                    return PascalToCCase(t.name).result + '_' + t.typedef_postfix
+                elif typing.cast(Enumeration, t).typedef:
                     return PascalToCCase(t.name).result + '_e'
                 else:
                     return 'enum ' + PascalToCCase(t.name).result
@@ -52,7 +54,7 @@ class CTypes:
                 if array_type.maximum_length is not None:
                     return f'{self.for_type(array_type.element_type)}', f'[{array_type.maximum_length}]'
                 else:
-                    raise ValueError('Arbitrary length C lists not yet implemented')
+                    return f'{self.for_type(array_type.element_type)} *'
             elif type(t) is Array:
                 array_type = typing.cast(Array, t)
                 return f'{self.for_type(array_type.element_type)}', f'[{array_type.length}]'
@@ -0,0 +1,33 @@
+FORMAT_RUNTIME = r'''
+#ifndef C_INTEROP_FORMAT_RUNTIME
+#define C_INTEROP_FORMAT_RUNTIME
+
+#include <stdint.h>
+
+#define format_uint64_size 20
+
+/* Writes the decimal digits of value backwards, ending at end, and returns a pointer to the first digit. */
+static inline char *format_uint64(char *end, uint64_t value) {
+    static const char digit_pairs[] =
+        "00010203040506070809101112131415161718192021222324252627282930313233343536373839"
+        "40414243444546474849505152535455565758596061626364656667686970717273747576777879"
+        "8081828384858687888990919293949596979899";
+    char *position = end;
+    while (value >= 100) {
+        const char *pair = digit_pairs + 2 * (value % 100);
+        value /= 100;
+        *--position = pair[1];
+        *--position = pair[0];
+    }
+    if (value >= 10) {
+        const char *pair = digit_pairs + 2 * value;
+        *--position = pair[1];
+        *--position = pair[0];
+    } else {
+        *--position = (char) ('0' + value);
+    }
+    return position;
+}
+
+#endif
+'''
@@ -0,0 +1,499 @@
+JSON_RUNTIME = r'''
+#ifndef C_INTEROP_JSON_RUNTIME
+#define C_INTEROP_JSON_RUNTIME
+
+#include <limits.h>
+#include <math.h>
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define json_max_depth 64
+
+/* Growable output buffer. Appending after an allocation failure is a no-op, so callers only check failed at the end. */
+struct json_buffer {
+    char *data;
+    size_t length;
+    size_t capacity;
+    bool failed;
+};
+
+static inline void json_buffer_init(struct json_buffer *buffer) {
+    buffer->data = NULL;
+    buffer->length = 0;
+    buffer->capacity = 0;
+    buffer->failed = false;
+}
+
+static inline void json_buffer_free(struct json_buffer *buffer) {
+    free(buffer->data);
+    json_buffer_init(buffer);
+}
+
+static inline bool json_buffer_reserve(struct json_buffer *buffer, size_t size) {
+    if (buffer->failed) {
+        return false;
+    }
+    if (buffer->capacity - buffer->length >= size) {
+        return true;
+    }
+    size_t capacity = buffer->capacity > 0 ? buffer->capacity : 256;
+    while (capacity - buffer->length < size) {
+        capacity *= 2;
+    }
+    char *data = realloc(buffer->data, capacity);
+    if (data == NULL) {
+        buffer->failed = true;
+        return false;
+    }
+    buffer->data = data;
+    buffer->capacity = capacity;
+    return true;
+}
+
+static inline void json_append(struct json_buffer *buffer, const char *text, size_t size) {
+    if (json_buffer_reserve(buffer, size)) {
+        memcpy(buffer->data + buffer->length, text, size);
+        buffer->length += size;
+    }
+}
+
+#define json_literal(buffer, text) json_append(buffer, text, sizeof(text) - 1)
+
+static inline void json_append_unsigned(struct json_buffer *buffer, uint64_t value) {
+    char digits[format_uint64_size];
+    char *first = format_uint64(digits + sizeof(digits), value);
+    json_append(buffer, first, (size_t) (digits + sizeof(digits) - first));
+}
+
+static inline void json_append_signed(struct json_buffer *buffer, int64_t value) {
+    if (value < 0) {
+        json_literal(buffer, "-");
+        json_append_unsigned(buffer, (uint64_t) 0 - (uint64_t) value);
+    } else {
+        json_append_unsigned(buffer, (uint64_t) value);
+    }
+}
+
+/* JSON has no NaN or infinities, those are written as null. */
+static inline void json_append_double(struct json_buffer *buffer, double value) {
+    if (value != value || value - value != 0) {
+        json_literal(buffer, "null");
+        return;
+    }
+    char text[32];
+    int size = snprintf(text, sizeof(text), "%.17g", value);
+    json_append(buffer, text, (size_t) size);
+}
+
+static inline void json_append_bool(struct json_buffer *buffer, bool value) {
+    if (value) {
+        json_literal(buffer, "true");
+    } else {
+        json_literal(buffer, "false");
+    }
+}
+
+static inline void json_append_string(struct json_buffer *buffer, const char *value) {
+    static const char hex[] = "0123456789abcdef";
+    if (value == NULL) {
+        json_literal(buffer, "null");
+        return;
+    }
+    json_literal(buffer, "\"");
+    const char *start = value;
+    for (const char *position = value; *position != '\0'; ++position) {
+        unsigned char c = (unsigned char) *position;
+        if (c >= 0x20 && c != '"' && c != '\\') {
+            continue;
+        }
+        json_append(buffer, start, (size_t) (position - start));
+        start = position + 1;
+        switch (c) {
+            case '"': json_literal(buffer, "\\\""); break;
+            case '\\': json_literal(buffer, "\\\\"); break;
+            case '\n': json_literal(buffer, "\\n"); break;
+            case '\r': json_literal(buffer, "\\r"); break;
+            case '\t': json_literal(buffer, "\\t"); break;
+            default: {
+                char escape[6] = {'\\', 'u', '0', '0', hex[c >> 4], hex[c & 0xf]};
+                json_append(buffer, escape, sizeof(escape));
+            }
+        }
+    }
+    json_append(buffer, start, strlen(start));
+    json_literal(buffer, "\"");
+}
+
+/* Reads JSON text. Decoded strings and unbounded lists are placed in the caller's storage, which must outlive the values. */
+struct json_reader {
+    const char *position;
+    const char *end;
+    char *storage;
+    size_t storage_used;
+    size_t storage_size;
+    const char *error;
+};
+
+static inline void json_reader_init(struct json_reader *reader, const char *text, size_t length, void *storage,
+                                    size_t storage_size) {
+    reader->position = text;
+    reader->end = text + length;
+    reader->storage = storage;
+    reader->storage_used = 0;
+    reader->storage_size = storage_size;
+    reader->error = NULL;
+}
+
+static inline int json_fail(struct json_reader *reader, const char *message) {
+    if (reader->error == NULL) {
+        reader->error = message;
+    }
+    return -1;
+}
+
+static inline void *json_reader_allocate(struct json_reader *reader, size_t size, size_t alignment) {
+    size_t offset = (reader->storage_used + alignment - 1) / alignment * alignment;
+    if (offset > reader->storage_size || size > reader->storage_size - offset) {
+        json_fail(reader, "Out of storage for decoded values");
+        return NULL;
+    }
+    reader->storage_used = offset + size;
+    return reader->storage + offset;
+}
+
+static inline void json_skip_whitespace(struct json_reader *reader) {
+    while (reader->position < reader->end
+           && (*reader->position == ' ' || *reader->position == '\n' || *reader->position == '\r' || *reader->position == '\t')) {
+        ++reader->position;
+    }
+}
+
+/* Skips whitespace and consumes c if it is the next character. */
+static inline bool json_consume(struct json_reader *reader, char c) {
+    json_skip_whitespace(reader);
+    if (reader->position < reader->end && *reader->position == c) {
+        ++reader->position;
+        return true;
+    }
+    return false;
+}
+
+static inline int json_expect(struct json_reader *reader, char c, const char *message) {
+    return json_consume(reader, c) ? 0 : json_fail(reader, message);
+}
+
+static inline bool json_consume_word(struct json_reader *reader, const char *word, size_t length) {
+    json_skip_whitespace(reader);
+    if ((size_t) (reader->end - reader->position) >= length && memcmp(reader->position, word, length) == 0) {
+        reader->position += length;
+        return true;
+    }
+    return false;
+}
+
+static inline int json_hex_digit(char c) {
+    if (c >= '0' && c <= '9') return c - '0';
+    if (c >= 'a' && c <= 'f') return c - 'a' + 10;
+    if (c >= 'A' && c <= 'F') return c - 'A' + 10;
+    return -1;
+}
+
+static inline int json_read_hex4(struct json_reader *reader, uint32_t *value) {
+    if (reader->end - reader->position < 4) {
+        return json_fail(reader, "Truncated unicode escape");
+    }
+    *value = 0;
+    for (int index = 0; index < 4; ++index) {
+        int digit = json_hex_digit(*reader->position++);
+        if (digit < 0) {
+            return json_fail(reader, "Illegal unicode escape");
+        }
+        *value = *value << 4 | (uint32_t) digit;
+    }
+    return 0;
+}
+
+/* Decodes a string into target, which needs at most as many bytes as the escaped text, and stores its length. */
+static inline int json_decode_string(struct json_reader *reader, char *target, size_t *length) {
+    size_t written = 0;
+    while (reader->position < reader->end) {
+        char c = *reader->position++;
+        if (c == '"') {
+            *length = written;
+            return 0;
+        }
+        if ((unsigned char) c < 0x20) {
+            return json_fail(reader, "Control character in string");
+        }
+        if (c != '\\') {
+            target[written++] = c;
+            continue;
+        }
+        if (reader->position == reader->end) {
+            break;
+        }
+        c = *reader->position++;
+        switch (c) {
+            case '"': case '\\': case '/': target[written++] = c; break;
+            case 'b': target[written++] = '\b'; break;
+            case 'f': target[written++] = '\f'; break;
+            case 'n': target[written++] = '\n'; break;
+            case 'r': target[written++] = '\r'; break;
+            case 't': target[written++] = '\t'; break;
+            case 'u': {
+                uint32_t code_point;
+                if (json_read_hex4(reader, &code_point) < 0) {
+                    return -1;
+                }
+                if (code_point >= 0xd800 && code_point < 0xdc00) {
+                    uint32_t low;
+                    if (reader->end - reader->position < 2 || reader->position[0] != '\\' || reader->position[1] != 'u') {
+                        return json_fail(reader, "Unpaired surrogate in string");
+                    }
+                    reader->position += 2;
+                    if (json_read_hex4(reader, &low) < 0) {
+                        return -1;
+                    }
+                    if (low < 0xdc00 || low >= 0xe000) {
+                        return json_fail(reader, "Unpaired surrogate in string");
+                    }
+                    code_point = 0x10000 + ((code_point - 0xd800) << 10) + (low - 0xdc00);
+                }
+                if (code_point < 0x80) {
+                    target[written++] = (char) code_point;
+                } else if (code_point < 0x800) {
+                    target[written++] = (char) (0xc0 | code_point >> 6);
+                    target[written++] = (char) (0x80 | (code_point & 0x3f));
+                } else if (code_point < 0x10000) {
+                    target[written++] = (char) (0xe0 | code_point >> 12);
+                    target[written++] = (char) (0x80 | (code_point >> 6 & 0x3f));
+                    target[written++] = (char) (0x80 | (code_point & 0x3f));
+                } else {
+                    target[written++] = (char) (0xf0 | code_point >> 18);
+                    target[written++] = (char) (0x80 | (code_point >> 12 & 0x3f));
+                    target[written++] = (char) (0x80 | (code_point >> 6 & 0x3f));
+                    target[written++] = (char) (0x80 | (code_point & 0x3f));
+                }
+                break;
+            }
+            default: return json_fail(reader, "Illegal escape in string");
+        }
+    }
+    return json_fail(reader, "Unterminated string");
+}
+
+/* Reads a string that is matched against known names. Names without escapes point into the input, others are
+ * decoded into name_buffer. Names whose escaped form exceeds name_buffer_size match nothing and are reported with length 0. */
+static inline int json_read_name(struct json_reader *reader, char *name_buffer, size_t name_buffer_size,
+                                 const char **name, size_t *length) {
+    if (json_expect(reader, '"', "Expected a string") < 0) {
+        return -1;
+    }
+    const char *start = reader->position;
+    const char *position = start;
+    while (position < reader->end && *position != '"' && *position != '\\') {
+        ++position;
+    }
+    if (position < reader->end && *position == '"') {
+        *name = start;
+        *length = (size_t) (position - start);
+        reader->position = position + 1;
+        return 0;
+    }
+    const char *closing = position;
+    while (closing < reader->end && *closing != '"') {
+        closing += *closing == '\\' ? 2 : 1;
+    }
+    if (closing >= reader->end) {
+        return json_fail(reader, "Unterminated string");
+    }
+    if ((size_t) (closing - start) > name_buffer_size) {
+        reader->position = closing + 1;
+        *name = start;
+        *length = 0;
+        return 0;
+    }
+    *name = name_buffer;
+    return json_decode_string(reader, name_buffer, length);
+}
+
+static inline int json_read_key(struct json_reader *reader, char *key_buffer, size_t key_buffer_size,
+                                const char **key, size_t *length) {
+    if (json_read_name(reader, key_buffer, key_buffer_size, key, length) < 0) {
+        return -1;
+    }
+    return json_expect(reader, ':', "Expected ':' after object key");
+}
+
+static inline int json_read_string(struct json_reader *reader, const char **value) {
+    if (json_consume_word(reader, "null", 4)) {
+        *value = NULL;
+        return 0;
+    }
+    if (json_expect(reader, '"', "Expected a string") < 0) {
+        return -1;
+    }
+    const char *closing = reader->position;
+    while (closing < reader->end && *closing != '"') {
+        closing += *closing == '\\' ? 2 : 1;
+    }
+    if (closing >= reader->end) {
+        return json_fail(reader, "Unterminated string");
+    }
+    char *target = json_reader_allocate(reader, (size_t) (closing - reader->position) + 1, 1);
+    size_t length;
+    if (target == NULL || json_decode_string(reader, target, &length) < 0) {
+        return -1;
+    }
+    target[length] = '\0';
+    *value = target;
+    return 0;
+}
+
+static inline int json_read_bool(struct json_reader *reader, bool *value) {
+    if (json_consume_word(reader, "true", 4)) {
+        *value = true;
+        return 0;
+    }
+    if (json_consume_word(reader, "false", 5)) {
+        *value = false;
+        return 0;
+    }
+    return json_fail(reader, "Expected a boolean");
+}
+
+static inline int json_read_unsigned_digits(struct json_reader *reader, uint64_t *value) {
+    const char *start = reader->position;
+    uint64_t result = 0;
+    while (reader->position < reader->end && *reader->position >= '0' && *reader->position <= '9') {
+        unsigned digit = (unsigned) (*reader->position - '0');
+        if (result > (UINT64_MAX - digit) / 10) {
+            return json_fail(reader, "Integer out of range");
+        }
+        result = result * 10 + digit;
+        ++reader->position;
+    }
+    if (reader->position == start) {
+        return json_fail(reader, "Expected an integer");
+    }
+    if (reader->position < reader->end
+        && (*reader->position == '.' || *reader->position == 'e' || *reader->position == 'E')) {
+        return json_fail(reader, "Expected an integer");
+    }
+    *value = result;
+    return 0;
+}
+
+static inline int json_read_signed(struct json_reader *reader, int64_t minimum, int64_t maximum, int64_t *value) {
+    json_skip_whitespace(reader);
+    bool negative = reader->position < reader->end && *reader->position == '-';
+    if (negative) {
+        ++reader->position;
+    }
+    uint64_t magnitude;
+    if (json_read_unsigned_digits(reader, &magnitude) < 0) {
+        return -1;
+    }
+    if (negative ? magnitude > (uint64_t) 0 - (uint64_t) minimum : magnitude > (uint64_t) maximum) {
+        return json_fail(reader, "Integer out of range");
+    }
+    *value = negative ? (int64_t) ((uint64_t) 0 - magnitude) : (int64_t) magnitude;
+    return 0;
+}
+
+static inline int json_read_unsigned(struct json_reader *reader, uint64_t maximum, uint64_t *value) {
+    json_skip_whitespace(reader);
+    if (json_read_unsigned_digits(reader, value) < 0) {
+        return -1;
+    }
+    return *value > maximum ? json_fail(reader, "Integer out of range") : 0;
+}
+
+static inline int json_read_double(struct json_reader *reader, double *value) {
+    if (json_consume_word(reader, "null", 4)) {
+        *value = NAN;
+        return 0;
+    }
+    char text[64];
+    size_t length = 0;
+    while (reader->position < reader->end && length < sizeof(text) - 1 && strchr("+-.0123456789eE", *reader->position) != NULL
+           && *reader->position != '\0') {
+        text[length++] = *reader->position++;
+    }
+    text[length] = '\0';
+    char *end;
+    *value = strtod(text, &end);
+    if (length == 0 || *end != '\0') {
+        return json_fail(reader, "Expected a number");
+    }
+    return 0;
+}
+
+static inline int json_skip_value(struct json_reader *reader, int depth);
+
+static inline int json_skip_container(struct json_reader *reader, char closing, bool object, int depth) {
+    if (json_consume(reader, closing)) {
+        return 0;
+    }
+    do {
+        if (object) {
+            if (json_expect(reader, '"', "Expected an object key") < 0) {
+                return -1;
+            }
+            while (reader->position < reader->end && *reader->position != '"') {
+                reader->position += *reader->position == '\\' ? 2 : 1;
+            }
+            if (reader->position >= reader->end) {
+                return json_fail(reader, "Unterminated string");
+            }
+            ++reader->position;
+            if (json_expect(reader, ':', "Expected ':' after object key") < 0) {
+                return -1;
+            }
+        }
+        if (json_skip_value(reader, depth + 1) < 0) {
+            return -1;
+        }
+    } while (json_consume(reader, ','));
+    return json_expect(reader, closing, object ? "Expected ',' or '}'" : "Expected ',' or ']'");
+}
+
+/* Skips the value of an unknown field. */
+static inline int json_skip_value(struct json_reader *reader, int depth) {
+    if (depth > json_max_depth) {
+        return json_fail(reader, "Nesting too deep");
+    }
+    json_skip_whitespace(reader);
+    if (reader->position == reader->end) {
+        return json_fail(reader, "Unexpected end of input");
+    }
+    switch (*reader->position) {
+        case '{': ++reader->position; return json_skip_container(reader, '}', true, depth);
+        case '[': ++reader->position; return json_skip_container(reader, ']', false, depth);
+        case '"': {
+            ++reader->position;
+            while (reader->position < reader->end && *reader->position != '"') {
+                reader->position += *reader->position == '\\' ? 2 : 1;
+            }
+            if (reader->position >= reader->end) {
+                return json_fail(reader, "Unterminated string");
+            }
+            ++reader->position;
+            return 0;
+        }
+        case 't': return json_consume_word(reader, "true", 4) ? 0 : json_fail(reader, "Illegal value");
+        case 'f': return json_consume_word(reader, "false", 5) ? 0 : json_fail(reader, "Illegal value");
+        case 'n': return json_consume_word(reader, "null", 4) ? 0 : json_fail(reader, "Illegal value");
+        default: {
+            double ignored;
+            return json_read_double(reader, &ignored);
+        }
+    }
+}
+
+#endif
+'''
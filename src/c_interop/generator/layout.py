@@ -0,0 +1,229 @@
+import typing
+
+from c_interop.generator.ctypes import PascalToCCase
+from c_interop.model.model import Module, Type, PrimitiveType, Struct, Enumeration, List, Array, Field
+
+_pointer_size = 8
+_enum_size = 4
+_size_t_size = 8
+_maximum_packed_enum_width = 8
+
+packed_flags_member = 'packed_flags'
+
+_primitive_sizes = {
+    PrimitiveType.Boolean: 1,
+    PrimitiveType.Integer: 8,
+    PrimitiveType.Int8: 1,
+    PrimitiveType.UInt8: 1,
+    PrimitiveType.Int16: 2,
+    PrimitiveType.UInt16: 2,
+    PrimitiveType.Int32: 4,
+    PrimitiveType.UInt32: 4,
+    PrimitiveType.Int64: 8,
+    PrimitiveType.UInt64: 8,
+    PrimitiveType.Float: 4,
+    PrimitiveType.Double: 8,
+    PrimitiveType.String: _pointer_size
+}
+
+
+class FieldLayout:
+    def __init__(self, name: str, t: Type, offset: int, size: int, alignment: int, field: Field = None,
+                 is_length: bool = False):
+        self.name = name
+        self.type = t
+        self.offset = offset
+        self.size = size
+        self.alignment = alignment
+        # the model field this member belongs to, the size_t length member of a List belongs to the List field
+        self.field = field
+        self.is_length = is_length
+
+
+class BitFieldLayout:
+    """A Boolean or Enumeration field stored in width bits of the packed_flags member, enums relative to first_ordinal."""
+
+    def __init__(self, field: Field, shift: int, width: int, word_type: PrimitiveType):
+        self.field = field
+        self.shift = shift
+        self.width = width
+        self.mask = (1 << width) - 1
+        self.word_type = word_type
+
+
+class StructLayout:
+    def __init__(self, struct: Struct, fields: list[FieldLayout], size: int, alignment: int,
+                 bit_fields: dict[str, BitFieldLayout] = None):
+        self.struct = struct
+        self.fields = fields
+        self.size = size
+        self.alignment = alignment
+        self.bit_fields = bit_fields if bit_fields is not None else dict()
+
+
+class Layouts:
+    """Computes the C layout of the structs of a module, assuming natural alignment on an LP64 target."""
+
+    def __init__(self, module: Module):
+        self._module = module
+        self._constants = {constant.name: constant.value for constant in module.constants}
+        self._struct_layouts: dict[str, StructLayout] = dict()
+
+    def for_struct(self, struct: Struct) -> StructLayout:
+        """The C layout of struct, with the members in the order of the generated C declaration."""
+        if struct.name not in self._struct_layouts:
+            self._struct_layouts[struct.name] = self._compute_struct_layout(struct, struct.optimize_layout, struct.pack_flags)
+        return self._struct_layouts[struct.name]
+
+    def bit_field(self, struct: Struct, field_name: str) -> BitFieldLayout | None:
+        return self.for_struct(struct).bit_fields.get(field_name)
+
+    def declared_size(self, struct: Struct) -> int:
+        """The size struct would have with its members in declaration order and no packed flags."""
+        return self._compute_struct_layout(struct, False, False).size
+
+    def size_and_alignment(self, t: Type) -> tuple[int, int]:
+        if type(t) is PrimitiveType:
+            size = _primitive_sizes[typing.cast(PrimitiveType, t)]
+            return size, size
+        elif type(t) is Enumeration:
+            if typing.cast(Enumeration, t).compact:
+                size = _primitive_sizes[enum_storage_type(typing.cast(Enumeration, t))]
+                return size, size
+            return _enum_size, _enum_size
+        elif type(t) is Struct:
+            layout = self.for_struct(typing.cast(Struct, t))
+            return layout.size, layout.alignment
+        elif type(t) is Array:
+            element_size, element_alignment = self.size_and_alignment(t.element_type)
+            return element_size * self.constant_value(t.length), element_alignment
+        elif type(t) is List:
+            if t.maximum_length is None:
+                return _pointer_size, _pointer_size
+            element_size, element_alignment = self.size_and_alignment(t.element_type)
+            return element_size * self.constant_value(t.maximum_length), element_alignment
+        raise ValueError("Unsupported type " + t.name)
+
+    def is_padding_free(self, t: Type) -> bool:
+        """True if every byte of t is part of a value, so copies of it carry no indeterminate bytes."""
+        if type(t) is Struct:
+            layout = self.for_struct(typing.cast(Struct, t))
+            position = 0
+            for field in layout.fields:
+                if field.offset != position or type(field.type) is List or not self.is_padding_free(field.type):
+                    return False
+                position = field.offset + field.size
+            return position == layout.size
+        elif type(t) is Array:
+            return self.is_padding_free(t.element_type)
+        return type(t) is not List
+
+    def constant_value(self, name: str) -> int:
+        if name not in self._constants:
+            raise ValueError(f'Unknown constant [{name}] in module {self._module.name}')
+        return self._constants[name]
+
+    def _compute_struct_layout(self, struct: Struct, optimize: bool, pack: bool) -> StructLayout:
+        bit_fields = _pack_bit_fields(struct) if pack else dict()
+        members = []
+        for field in struct.fields:
+            if field.name in bit_fields:
+                # the packed_flags member takes the place of the first packed field
+                if not any(member.name == packed_flags_member for member in members):
+                    word_type = bit_fields[field.name].word_type
+                    size = _primitive_sizes[word_type]
+                    members.append(FieldLayout(packed_flags_member, word_type, 0, size, size))
+                continue
+            size, alignment = self.size_and_alignment(field.type)
+            members.append(FieldLayout(field.name, field.type, 0, size, alignment, field))
+            if type(field.type) is List:
+                members.append(FieldLayout(field.name + '_length', PrimitiveType.UInt64, 0, _size_t_size, _size_t_size,
+                                           field, True))
+        if optimize:
+            # sizes are multiples of their power of two alignments, so descending alignment leaves no gaps
+            members.sort(key=lambda member: -member.alignment)
+        offset = 0
+        struct_alignment = 1
+        for member in members:
+            member.offset = align(offset, member.alignment)
+            offset = member.offset + member.size
+            struct_alignment = max(struct_alignment, member.alignment)
+        return StructLayout(struct, members, align(offset, struct_alignment), struct_alignment, bit_fields)
+
+
+def align(offset: int, alignment: int) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def enum_storage_type(enum: Enumeration) -> PrimitiveType:
+    """The smallest integer type holding all ordinals of a compact enum, unsigned unless an ordinal is negative."""
+    first = enum.first_ordinal
+    last = first + len(enum.values) - 1
+    if first >= 0:
+        candidates = [(PrimitiveType.UInt8, 0, 0xff), (PrimitiveType.UInt16, 0, 0xffff)]
+    else:
+        candidates = [(PrimitiveType.Int8, -0x80, 0x7f), (PrimitiveType.Int16, -0x8000, 0x7fff)]
+    for storage_type, minimum, maximum in candidates:
+        if minimum <= first and last <= maximum:
+            return storage_type
+    return PrimitiveType.UInt32 if first >= 0 else PrimitiveType.Int32
+
+
+def packed_width(t: Type) -> int | None:
+    """The number of bits a field of type t takes in packed_flags, None if it is not packed."""
+    if t is PrimitiveType.Boolean:
+        return 1
+    elif type(t) is Enumeration:
+        width = max(1, (len(typing.cast(Enumeration, t).values) - 1).bit_length())
+        return width if width <= _maximum_packed_enum_width else None
+    return None
+
+
+def _pack_bit_fields(struct: Struct) -> dict[str, BitFieldLayout]:
+    if any(field.name == packed_flags_member for field in struct.fields):
+        raise ValueError(f'Field name [{packed_flags_member}] of struct {struct.name} is reserved when packing flags')
+    packed = []
+    shift = 0
+    for field in struct.fields:
+        width = packed_width(field.type)
+        # fields that no longer fit into 64 bits keep their own members
+        if width is not None and shift + width <= 64:
+            packed.append((field, shift, width))
+            shift += width
+    word_type = next(word_type for word_type in [PrimitiveType.UInt8, PrimitiveType.UInt16, PrimitiveType.UInt32,
+                                                 PrimitiveType.UInt64]
+                     if shift <= 8 * _primitive_sizes[word_type])
+    return {field.name: BitFieldLayout(field, field_shift, width, word_type) for field, field_shift, width in packed}
+
+
+def packed_field_getter(struct: Struct, field_name: str, pointer: str) -> str:
+    return f'{PascalToCCase(struct.name).result}_get_{field_name}({pointer})'
+
+
+def packed_field_setter(struct: Struct, field_name: str, pointer: str, value: str) -> str:
+    return f'{PascalToCCase(struct.name).result}_set_{field_name}({pointer}, {value})'
+
+
+def is_flat_struct(struct: Struct) -> bool:
+    for field in struct.fields:
+        t = field.type.element_type if type(field.type) is Array else field.type
+        if type(t) is not PrimitiveType or t is PrimitiveType.String:
+            return False
+    return True
+
+
+def is_columnar_struct(struct: Struct) -> bool:
+    return len(struct.fields) > 0 and all(type(field.type) is PrimitiveType and field.type is not PrimitiveType.String for field in struct.fields)
+
+
+def layout_report(module: Module) -> str:
+    """Describes the bytes saved per struct with an optimized layout or packed flags."""
+    layouts = Layouts(module)
+    lines = []
+    for struct in module.structs:
+        if struct.optimize_layout or struct.pack_flags:
+            layout = layouts.for_struct(struct)
+            declared_size = layouts.declared_size(struct)
+            lines.append(f'{struct.name}: {layout.size} bytes instead of {declared_size}, '
+                         f'saving {declared_size - layout.size} bytes per item (alignment {layout.alignment})')
+    return '\n'.join(lines)
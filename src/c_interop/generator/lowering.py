@@ -0,0 +1,178 @@
+import typing
+
+from c_interop.generator.ctypes import CTypes, PascalToCCase
+from c_interop.generator.layout import Layouts, StructLayout
+from c_interop.model.model import Module, Type, PrimitiveType, Struct, Enumeration, Field, List, Array, Set, Map
+
+_conversion_kinds = {
+    PrimitiveType.Boolean: 'bool',
+    PrimitiveType.Integer: 'int64',
+    PrimitiveType.Int8: 'int8',
+    PrimitiveType.UInt8: 'uint8',
+    PrimitiveType.Int16: 'int16',
+    PrimitiveType.UInt16: 'uint16',
+    PrimitiveType.Int32: 'int32',
+    PrimitiveType.UInt32: 'uint32',
+    PrimitiveType.Int64: 'int64',
+    PrimitiveType.UInt64: 'uint64',
+    PrimitiveType.Float: 'float',
+    PrimitiveType.Double: 'double',
+    PrimitiveType.String: 'string'
+}
+
+
+class LoweredField:
+    """A struct field with the spellings and kinds the generators derive from it."""
+
+    def __init__(self, field: Field, python_type: str, element_type: Type, conversion_kind: str | None):
+        self.field = field
+        self.name = field.name
+        # the annotation of the field in the generated Python model
+        self.python_type = python_type
+        # the type of the values of the field, the element type for Lists and Arrays
+        self.element_type = element_type
+        # 'struct', 'enum' or a primitive kind of the conversion tables, None for nested Lists or Arrays
+        self.conversion_kind = conversion_kind
+
+
+class LoweredStruct:
+    def __init__(self, lowered: 'LoweredModule', struct: Struct, fields: list[LoweredField], dependencies: list[Struct]):
+        self._lowered = lowered
+        self.struct = struct
+        self.c_name = lowered.c_name(struct)
+        self.fields = fields
+        self.field_for_name = {field.name: field for field in fields}
+        # the structs of the module this struct refers to through its fields, in declaration order
+        self.dependencies = dependencies
+
+    @property
+    def c_type(self) -> str:
+        return self._lowered.c_type(self.struct)
+
+    @property
+    def layout(self) -> StructLayout:
+        return self._lowered.layouts.for_struct(self.struct)
+
+
+class LoweredModule:
+    """
+    The per module facts shared by all generators: C and Python spellings, layouts, the order structs can be declared
+    in and the conversion kinds of fields. Spellings and layouts are computed on first use, since models that only
+    generate Python may hold types without a C representation.
+
+    It reflects the module as it was when lowered, so a module changed afterwards needs a new LoweredModule.
+    write_module_with_template lowers a module once and passes it to all its generators, generators created on their
+    own lower the module themselves.
+    """
+
+    def __init__(self, module: Module):
+        self.module = module
+        self.layouts = Layouts(module)
+        self._ctypes = CTypes()
+        self._c_types: dict[Type, str | tuple[str, str]] = dict()
+        self._c_names: dict[Type, str] = dict()
+        self._module_types = {t.name: t for t in [*module.enums, *module.structs]}
+        # Python annotations name types declared earlier in the module, and quote the others as forward references
+        declared = {enum.name for enum in module.enums}
+        self.structs: list[LoweredStruct] = []
+        for struct in module.structs:
+            fields = [self._lower_field(field, declared) for field in struct.fields]
+            self.structs.append(LoweredStruct(self, struct, fields, self._dependencies(struct)))
+            declared.add(struct.name)
+        self._struct_for_name = {lowered.struct.name: lowered for lowered in self.structs}
+        self.dependency_order: list[Struct] = self._dependency_order()
+
+    def c_type(self, t: Type) -> str | tuple[str, str]:
+        """The C spelling of t, see CTypes.for_type."""
+        if t not in self._c_types:
+            self._c_types[t] = self._ctypes.for_type(t)
+        return self._c_types[t]
+
+    def c_name(self, t: Type) -> str:
+        """The snake case name of t, which prefixes the names of the C functions generated for it."""
+        if t not in self._c_names:
+            self._c_names[t] = PascalToCCase(t.name).result
+        return self._c_names[t]
+
+    def struct(self, struct: Struct) -> LoweredStruct:
+        return self._struct_for_name[struct.name]
+
+    def field(self, struct: Struct, field: Field) -> LoweredField:
+        return self._struct_for_name[struct.name].field_for_name[field.name]
+
+    def _lower_field(self, field: Field, declared: set[str]) -> LoweredField:
+        element_type = field.type
+        if type(element_type) in [List, Array]:
+            element_type = element_type.element_type
+        return LoweredField(field, python_type(field.type, declared), element_type, conversion_kind(element_type))
+
+    def _dependencies(self, struct: Struct) -> list[Struct]:
+        dependencies = []
+        for field in struct.fields:
+            t = field.type
+            if type(t) in [List, Array]:
+                t = t.element_type
+            if type(t) is Struct and self._module_types.get(t.name) is t and t not in dependencies:
+                dependencies.append(t)
+        return dependencies
+
+    def _dependency_order(self) -> list[Struct]:
+        # depth first in module order, so a module that declares structs before their use keeps its order;
+        # cycles, which are only valid through unbounded Lists, are broken where they are found
+        order = []
+        visited = set()
+
+        def visit(lowered: LoweredStruct):
+            if lowered.struct.name in visited:
+                return
+            visited.add(lowered.struct.name)
+            for dependency in lowered.dependencies:
+                visit(self._struct_for_name[dependency.name])
+            order.append(lowered.struct)
+
+        for lowered in self.structs:
+            visit(lowered)
+        return order
+
+
+def python_type(t: Type, declared: set[str]) -> str:
+    if type(t) is PrimitiveType:
+        primitive = typing.cast(PrimitiveType, t)
+        if primitive is PrimitiveType.Boolean:
+            return 'bool'
+        elif primitive.is_integer:
+            return 'int'
+        elif primitive is PrimitiveType.Float or primitive is PrimitiveType.Double:
+            return 'float'
+        elif primitive is PrimitiveType.String:
+            return 'str'
+        else:
+            raise ValueError("Unsupported type [" + t.name + "]")
+    elif type(t) is List:
+        return f'list[{python_type(t.type_arguments[0], declared)}]'
+    elif type(t) is Set:
+        return f'set[{python_type(t.type_arguments[1], declared)}]'
+    elif type(t) is Map:
+        return f'dict[{python_type(t.type_arguments[0], declared)}, {python_type(t.type_arguments[1], declared)}]'
+    else:
+        # TODO import if necessary
+        if t.name in declared:
+            return t.name
+        else:
+            return "'" + t.name + "'"
+
+
+def conversion_kind(t: Type) -> str | None:
+    if type(t) is Struct:
+        return 'struct'
+    elif type(t) is Enumeration:
+        return 'enum'
+    elif type(t) is PrimitiveType:
+        return conversion_kind_for_primitive(typing.cast(PrimitiveType, t))
+    return None
+
+
+def conversion_kind_for_primitive(primitive: PrimitiveType):
+    if primitive not in _conversion_kinds:
+        raise ValueError(f'Unsupported primitive type [{primitive}]')
+    return _conversion_kinds[primitive]
@@ -0,0 +1,67 @@
+from typing import TextIO
+
+from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
+from c_interop.generator.layout import is_flat_struct, packed_flags_member
+from c_interop.generator.lowering import LoweredModule
+from c_interop.model.model import Module, PrimitiveType, Array
+
+
+class NumpyDtypeGenerator:
+    def __init__(self, module: Module, sink: TextIO = None, lowered: LoweredModule = None):
+        self.module = module
+        self._out = CodeWriter(CodeWriterMode.Python, sink)
+        self._layouts = (lowered if lowered is not None else LoweredModule(module)).layouts
+
+    def run(self):
+        self._out.writeln('import numpy')
+        self._out.writeln()
+        for struct in self.module.structs:
+            if is_flat_struct(struct):
+                self._write_dtype(struct)
+
+    def result(self):
+        return self._out.result()
+
+    def _write_dtype(self, struct):
+        layout = self._layouts.for_struct(struct)
+        # declared field order, with the offsets of the possibly reordered C members,
+        # packed flags appear as their packed_flags integer at the place of the first packed field
+        members = {member.name: member for member in layout.fields}
+        names = []
+        for field in struct.fields:
+            name = packed_flags_member if field.name in layout.bit_fields else field.name
+            if name not in names:
+                names.append(name)
+        self._out.writeln(struct.name, '_dtype = numpy.dtype({')
+        self._out.indent()
+        self._out.writeln("'names': [", ', '.join(repr(name) for name in names), '],')
+        self._out.writeln("'formats': [", ', '.join(repr(self._format(members[name].type)) for name in names), '],')
+        self._out.writeln("'offsets': [", ', '.join(str(members[name].offset) for name in names), '],')
+        self._out.writeln("'itemsize': ", str(layout.size), '})')
+        self._out.unindent()
+        self._out.writeln()
+
+    def _format(self, t):
+        if type(t) is Array:
+            return f'({self._layouts.constant_value(t.length)},){dtype_format(t.element_type)}'
+        return dtype_format(t)
+
+
+def dtype_format(primitive: PrimitiveType):
+    formats = {
+        PrimitiveType.Boolean: '?',
+        PrimitiveType.Integer: 'i8',
+        PrimitiveType.Int8: 'i1',
+        PrimitiveType.UInt8: 'u1',
+        PrimitiveType.Int16: 'i2',
+        PrimitiveType.UInt16: 'u2',
+        PrimitiveType.Int32: 'i4',
+        PrimitiveType.UInt32: 'u4',
+        PrimitiveType.Int64: 'i8',
+        PrimitiveType.UInt64: 'u8',
+        PrimitiveType.Float: 'f4',
+        PrimitiveType.Double: 'f8'
+    }
+    if primitive not in formats:
+        raise ValueError(f'Unsupported dtype primitive type [{primitive}]')
+    return formats[primitive]
@@ -0,0 +1,73 @@
+PARALLEL_RUNTIME = r'''
+#ifndef C_INTEROP_PARALLEL_RUNTIME
+#define C_INTEROP_PARALLEL_RUNTIME
+
+#include <string.h>
+#ifndef _WIN32
+#include <pthread.h>
+#endif
+
+#define parallel_encode_max_threads 64
+#define parallel_encode_minimum_chunk_size 65536
+
+typedef void (*parallel_encode_function)(const char *items, char *target, size_t count);
+
+struct parallel_encode_chunk {
+    parallel_encode_function encode;
+    const char *items;
+    char *target;
+    size_t count;
+};
+
+static void *parallel_encode_run(void *argument) {
+    struct parallel_encode_chunk *chunk = argument;
+    chunk->encode(chunk->items, chunk->target, chunk->count);
+    return NULL;
+}
+
+/* Encodes count items of item_size bytes into target, split into contiguous chunks on up to thread_count threads.
+ * Touches no Python objects, so callers should release the GIL around it. */
+static void parallel_encode(parallel_encode_function encode, const void *items, char *target, size_t count, size_t item_size,
+                            int thread_count) {
+    size_t maximum_threads = count * item_size / parallel_encode_minimum_chunk_size;
+    size_t threads = thread_count > 0 ? (size_t) thread_count : 1;
+    if (threads > maximum_threads) {
+        threads = maximum_threads > 0 ? maximum_threads : 1;
+    }
+    if (threads > parallel_encode_max_threads) {
+        threads = parallel_encode_max_threads;
+    }
+    struct parallel_encode_chunk chunks[parallel_encode_max_threads];
+    size_t chunk_count = (count + threads - 1) / threads;
+    for (size_t index = 0; index < threads; ++index) {
+        size_t first = index * chunk_count < count ? index * chunk_count : count;
+        size_t last = first + chunk_count < count ? first + chunk_count : count;
+        chunks[index].encode = encode;
+        chunks[index].items = (const char *) items + first * item_size;
+        chunks[index].target = target + first * item_size;
+        chunks[index].count = last - first;
+    }
+#ifndef _WIN32
+    pthread_t handles[parallel_encode_max_threads];
+    int started[parallel_encode_max_threads] = {0};
+    for (size_t index = 1; index < threads; ++index) {
+        started[index] = pthread_create(&handles[index], NULL, parallel_encode_run, &chunks[index]) == 0;
+        if (!started[index]) {
+            parallel_encode_run(&chunks[index]);
+        }
+    }
+    parallel_encode_run(&chunks[0]);
+    for (size_t index = 1; index < threads; ++index) {
+        if (started[index]) {
+            pthread_join(handles[index], NULL);
+        }
+    }
+#else
+    for (size_t index = 0; index < threads; ++index) {
+        parallel_encode_run(&chunks[index]);
+    }
+#endif
+}
+
+#endif
+'''
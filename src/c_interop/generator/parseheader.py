@@ -1,9 +1,21 @@
+import ast
+import hashlib
+import io
+import json
+import os
 import re
-from dataclasses import dataclass
-from typing import List, Optional
+import string
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict
+from functools import partial
+from typing import List, Optional, Iterable, Iterator, Callable
 
-from codewriter import CodeWriter
-from codewriter import CodeWriterMode
+from c_interop.generator.codewriter import CodeWriter
+from c_interop.generator.codewriter import CodeWriterMode
+from c_interop.generator.ctypes import PascalToCCase
+from c_interop.model.model import Module, Constant, Struct, Enumeration, Field, PrimitiveType, Array
 
 
 @dataclass
@@ -32,6 +44,8 @@ class CStructMember:
     name: str
     type: str
     comment: Optional[str] = None
+    # the width of a bit field, as written
+    bit_width: Optional[str] = None
 
 
 @dataclass
@@ -41,112 +55,443 @@ class CStruct:
     comment: Optional[str] = None
 
 
+# part of the parse cache key, increment it whenever a change to the parser changes its results
+PARSER_VERSION = 5
+
+# the whitespace before a token and the token: a comment up to its end or the end of the line, word, number, literal,
+# line continuation or punctuation character
+_token_pattern = re.compile(r'''
+    (\s*)
+    (
+        //.*|/\*.*?\*/|/\*.*
+      | [A-Za-z_]\w*
+      | \.?[0-9](?:[eEpP][+-]|[\w.])*
+      | "(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'
+      | \\\s*$
+      | \S
+    )''', re.VERBOSE)
+# token kinds by first character, single characters not listed are punctuation
+_token_kinds = {**dict.fromkeys(string.ascii_letters + '_', 'word'), **dict.fromkeys(string.digits, 'number')}
+_long_token_kinds = {**_token_kinds, '.': 'number', '"': 'literal', "'": 'literal', '/': 'comment',
+                     '\\': 'continuation'}
+_directive_start_pattern = re.compile(r'\s*#')
+_define_pattern = re.compile(r'#\s*define\s+(\w+)\s+(.+)$')
+_array_pattern = re.compile(r'(.+?)\[([^\]]+)\]$')
+_integer_literal_pattern = re.compile(r'\b(0[xX][0-9a-fA-F]+|[0-9]+)[uUlL]*\b')
+_integer_pattern = re.compile(r'(?:0[xX][0-9a-fA-F]+|[1-9][0-9]*|0)$')
+_float_pattern = re.compile(r'-?(?:[0-9]+\.[0-9]*|\.[0-9]+|[0-9]+(?=[eE]))(?:[eE][+-]?[0-9]+)?[fFlL]?$')
+_string_pattern = re.compile(r'"(?:[^"\\]|\\.)*"$')
+_comment_decoration_pattern = re.compile(r'^\s*\*+\s?|\s+$', re.MULTILINE)
+# lines without directives, literals or line continuations, and directives without literals or continuations
+_plain_line_pattern = re.compile(r'[^#"\'\\]*$')
+_simple_directive_pattern = re.compile(r'\s*#[^"\'\\]*$')
+# the comments of a line without literals, with the text of block and line comments in groups 1 and 2
+_line_comment_pattern = re.compile(r'/\*(.*?)\*/|//(.*)')
+_definition_start_pattern = re.compile(r'\b(?:enum|struct)\b(?:\s+\w+)?\s*(?:\{|$)')
+
+
+class _Token:
+    __slots__ = ('kind', 'text', 'line', 'spaced', 'comments', 'comment')
+
+    def __init__(self, kind: str, text: str, line: int, spaced: bool = False, comment: Optional[str] = None):
+        self.kind = kind
+        self.text = text
+        self.line = line
+        # whether whitespace separated the token from the one before it
+        self.spaced = spaced
+        # the comment tokens between the previous token and this one
+        self.comments: List[_Token] = []
+        # the comments inside a directive
+        self.comment = comment
+
+
+def _join(tokens: List[_Token]) -> str:
+    return ''.join((' ' if token.spaced and index > 0 else '') + token.text for index, token in enumerate(tokens))
+
+
+class _Tokenizer:
+    """Splits C source into tokens in a single pass over its lines.
+
+    Block comments and preprocessor directives may span lines, so their state is carried from one line to the next.
+    Directives are returned as a single token holding their text without comments. Comments are attached to the
+    token following them, the ones at the end of the source to a final token of kind 'end'.
+
+    While skip_plain_lines is set, plain lines that cannot start a definition or change the nesting of braces are
+    dropped without being tokenized, together with the comments before them.
+    """
+
+    def __init__(self):
+        self.skip_plain_lines = False
+        self._definition_started = False
+        self._comment: Optional[List[str]] = None
+        self._comment_line = 0
+        self._comments: List[_Token] = []
+        self._directive: Optional[List[_Token]] = None
+        self._directive_comments: List[str] = []
+        self._directive_line = 0
+
+    def tokens(self, lines: Iterable[str]) -> Iterator[List[_Token]]:
+        """The tokens of the lines that have any, a line at a time."""
+        line_number = 0
+        for line_number, line in enumerate(lines, 1):
+            line_tokens = self._line_tokens(line, line_number)
+            if line_tokens:
+                yield line_tokens
+        if self._comment is not None:
+            self._add_comment('\n'.join(self._comment), self._comment_line)
+        result = [self._finish_directive()] if self._directive is not None else []
+        result.append(_Token('end', '', line_number))
+        yield self._attach_comments(result)
+
+    def _line_tokens(self, line: str, line_number: int) -> List[_Token]:
+        result = []
+        position = 0
+        if self._comment is not None:
+            end = line.find('*/')
+            if end < 0:
+                self._comment.append(line.rstrip('\r\n'))
+                return result
+            self._comment.append(line[:end])
+            self._add_comment('\n'.join(self._comment), self._comment_line)
+            self._comment = None
+            position = end + 2
+        elif self._directive is None:
+            if _directive_start_pattern.match(line):
+                directive = self._simple_directive(line, line_number)
+                if directive is not None:
+                    return self._attach_comments([directive])
+                self._directive = []
+                self._directive_line = line_number
+            elif self.skip_plain_lines and self._skips(line):
+                return result
+        target = self._directive if self._directive is not None else result
+        continued = False
+        for space, text in _token_pattern.findall(line, position):
+            kind = _long_token_kinds[text[0]] if len(text) > 1 else _token_kinds.get(text, 'punctuation')
+            if kind == 'comment':
+                if text[1] == '/':
+                    self._add_comment(text[2:].rstrip('\r'), line_number)
+                elif len(text) >= 4 and text.endswith('*/'):
+                    self._add_comment(text[2:-2], line_number)
+                else:
+                    self._comment = [text[2:].rstrip('\r')]
+                    self._comment_line = line_number
+            elif kind == 'continuation':
+                if target is self._directive:
+                    continued = True
+                else:
+                    target.append(_Token('punctuation', '\\', line_number, space != ''))
+            else:
+                target.append(_Token(kind, text, line_number, space != ''))
+        if self._directive is not None and self._comment is None and not continued:
+            result.append(self._finish_directive())
+        return self._attach_comments(result)
+
+    def _skips(self, line: str) -> bool:
+        """Whether line is plain and skipped, dropping the comments that would have gone to its tokens."""
+        if _plain_line_pattern.match(line) is None:
+            self._definition_started = False
+            return False
+        code = line
+        if '/' in line:
+            code = _line_comment_pattern.sub(' ', line)
+            # comments continuing on the next lines or on lines of their own are kept
+            if '/*' in code or not code.strip():
+                return False
+        if not code.strip():
+            return True
+        # the line after the start of a definition may continue it, a line ending in ) or = may precede the { of a
+        # function body or an initializer, and braces must close after they all opened for the line to leave the
+        # nesting of bodies where it was
+        definition_continues = self._definition_started
+        self._definition_started = (('enum' in code or 'struct' in code)
+                                    and _definition_start_pattern.search(code) is not None)
+        if (definition_continues or self._definition_started or code.rstrip()[-1:] in (')', '=')
+                or code.count('{') != code.count('}') or ('{' in code and code.rfind('{') > code.find('}'))):
+            return False
+        self._comments = []
+        return True
+
+    @staticmethod
+    def _simple_directive(line: str, line_number: int) -> Optional[_Token]:
+        """The token of a directive on a line of its own, without tokenizing it, None if it needs tokenizing."""
+        if _simple_directive_pattern.match(line) is None:
+            return None
+        comment = None
+        if '/' in line:
+            comments = [block + rest.rstrip('\r') for block, rest in _line_comment_pattern.findall(line)]
+            line = _line_comment_pattern.sub('', line)
+            if '/*' in line:
+                return None
+            comment = ' '.join(comments) if comments else None
+        return _Token('directive', ' '.join(line.split()), line_number, comment=comment)
+
+    def _add_comment(self, text: str, line_number: int):
+        if self._directive is not None:
+            self._directive_comments.append(text)
+        else:
+            self._comments.append(_Token('comment', text, line_number))
+
+    def _attach_comments(self, tokens: List[_Token]) -> List[_Token]:
+        if self._comments and tokens:
+            tokens[0].comments = self._comments
+            self._comments = []
+        return tokens
+
+    def _finish_directive(self) -> _Token:
+        comment = ' '.join(self._directive_comments) if self._directive_comments else None
+        token = _Token('directive', _join(self._directive), self._directive_line, comment=comment)
+        self._directive = None
+        self._directive_comments = []
+        return token
+
+
+class _TokenStream:
+    """Tokens with lookahead, None past the end, read a line at a time."""
+
+    def __init__(self, lines: Iterator[List[_Token]]):
+        self._lines = lines
+        self._buffer: deque[_Token] = deque()
+        self._current = _Token('start', '', 0)
+        self._previous_line = 0
+
+    def next(self) -> Optional[_Token]:
+        buffer = self._buffer
+        while not buffer:
+            buffer.extend(next(self._lines))
+        token = buffer[0]
+        if token.kind == 'end':
+            return None
+        buffer.popleft()
+        self._previous_line = self._current.line
+        self._current = token
+        return token
+
+    def peek(self, offset: int = 0) -> Optional[_Token]:
+        buffer = self._buffer
+        while len(buffer) <= offset:
+            if buffer and buffer[-1].kind == 'end':
+                return None
+            buffer.extend(next(self._lines))
+        token = buffer[offset]
+        return token if token.kind != 'end' else None
+
+    def leading_comment(self) -> Optional[str]:
+        """The last comment before the current token that does not trail the token before it."""
+        return _last_comment_after(self._current.comments, self._previous_line)
+
+    def upcoming_comment(self) -> Optional[str]:
+        """The last comment before the next token that does not trail the current one."""
+        return _last_comment_after(self._upcoming().comments, self._current.line)
+
+    def trailing_comment(self, line: int) -> Optional[str]:
+        """The first comment after the current token that starts on line."""
+        return next((comment.text for comment in self._upcoming().comments if comment.line == line), None)
+
+    def _upcoming(self) -> _Token:
+        while not self._buffer:
+            self._buffer.extend(next(self._lines))
+        return self._buffer[0]
+
+
+def _last_comment_after(comments: List[_Token], line: int) -> Optional[str]:
+    own_line = [comment for comment in comments if comment.line > line]
+    return own_line[-1].text if own_line else None
+
+
+def _is(token: Optional[_Token], text: str) -> bool:
+    return token is not None and token.kind in ('punctuation', 'word') and token.text == text
+
+
 class HeaderParser:
     def __init__(self):
         self.constants: List[CConstant] = []
         self.enums: List[CEnum] = []
         self.structs: List[CStruct] = []
+        # the raw values of the constants and the integer values resolved so far, None for the unresolvable ones
+        self._defines: dict[str, str] = dict()
+        self._integers: dict[str, Optional[int]] = dict()
 
-    def _clean_comment(self, comment: str) -> str:
+    def _clean_comment(self, comment: Optional[str]) -> str:
         """Clean C-style comments."""
         if not comment:
             return ""
-        return re.sub(r'/\*|\*/|//', '', comment).strip()
+        lines = _comment_decoration_pattern.sub('', comment).split('\n')
+        return ' '.join(line.strip() for line in lines if line.strip())
 
-    def _parse_constant(self, line: str) -> Optional[CConstant]:
+    def _parse_constant(self, directive: _Token) -> Optional[CConstant]:
         """Parse #define constant."""
-        define_match = re.match(r'#define\s+(\w+)\s+(.+?)(?:/[/*](.+?)(?:\*/)?)?$', line)
+        define_match = _define_pattern.match(directive.text)
         if define_match:
-            name, value, comment = define_match.groups()
-            return CConstant(name, value.strip(), self._clean_comment(comment))
+            name, value = define_match.groups()
+            self._defines[name] = value.strip()
+            self._integers.pop(name, None)
+            return CConstant(name, value.strip(), self._clean_comment(directive.comment))
         return None
 
-    def _parse_enum(self, content: str, start_idx: int) -> tuple[Optional[CEnum], int]:
-        """Parse enum definition."""
-        enum_match = re.match(r'enum\s+(\w+)\s*{', content[start_idx:])
-        if not enum_match:
-            return None, start_idx
-
-        name = enum_match.group(1)
+    def _integer(self, name: str) -> Optional[int]:
+        """The integer value of a constant or enum member defined so far, None if it has none."""
+        if name not in self._integers and name in self._defines:
+            # guards against constants defined in terms of themselves
+            self._integers[name] = None
+            self._integers[name] = _integer_value(self._defines[name], self._integer)
+        return self._integers.get(name)
+
+    def _parse_enum(self, tokens: _TokenStream, comment: Optional[str]) -> CEnum:
+        """Parse the enum definition whose 'enum' token was just read."""
+        name = tokens.next().text
+        tokens.next()
         members = []
-        current_value = 0
-        idx = start_idx + enum_match.end()
-
-        while idx < len(content):
-            line = content[idx:content.find('\n', idx)].strip()
-            if '}' in line:
-                break
-
-            member_match = re.match(r'(\w+)(?:\s*=\s*([^,]+))?\s*,?\s*(?:/[/*](.+?)(?:\*/)?)?$', line)
-            if member_match:
-                member_name, value, comment = member_match.groups()
-                if value:
-                    try:
-                        current_value = eval(value)
-                    except:
-                        current_value = value
-                members.append(CEnumMember(member_name, str(current_value), self._clean_comment(comment)))
-                current_value = int(current_value) + 1
-
-            idx = content.find('\n', idx) + 1
-
-        return CEnum(name, members), idx
-
-    def _parse_struct(self, content: str, start_idx: int) -> tuple[Optional[CStruct], int]:
-        """Parse struct definition."""
-        struct_match = re.match(r'struct\s+(\w+)\s*{', content[start_idx:])
-        if not struct_match:
-            return None, start_idx
-
-        name = struct_match.group(1)
+        # members without a value follow the last one given, offset by their distance to it
+        expression = '0'
+        offset = 0
+
+        while (token := tokens.next()) is not None and not _is(token, '}'):
+            if token.kind != 'word':
+                continue
+            leading_comment = tokens.leading_comment()
+            last = token
+            value_tokens = []
+            if _is(tokens.peek(), '='):
+                tokens.next()
+                value_tokens = self._read_until(tokens, (',', '}'))
+                last = value_tokens[-1] if value_tokens else last
+            if _is(tokens.peek(), ','):
+                last = tokens.next()
+            if value_tokens:
+                expression = _join(value_tokens)
+                offset = 0
+            value = _integer_value(expression, self._integer)
+            if value is not None:
+                value += offset
+                self._integers[token.text] = value
+            # values depending on definitions of other headers are kept as expressions, to_module resolves them
+            text = str(value) if value is not None else expression if offset == 0 else f'({expression}) + {offset}'
+            member_comment = tokens.trailing_comment(last.line) or leading_comment
+            members.append(CEnumMember(token.text, text, self._clean_comment(member_comment)))
+            offset += 1
+
+        return CEnum(name, members, self._clean_comment(comment) or None)
+
+    def _parse_struct(self, tokens: _TokenStream, comment: Optional[str]) -> CStruct:
+        """Parse the struct definition whose 'struct' token was just read."""
+        name = tokens.next().text
+        tokens.next()
         members = []
-        idx = start_idx + struct_match.end()
 
-        while idx < len(content):
-            line = content[idx:content.find('\n', idx)].strip()
-            if '}' in line:
-                break
-
-            member_match = re.match(r'(\w+)\s+(\w+)\s*;(?:\s*/[/*](.+?)(?:\*/)?)?$', line)
-            if member_match:
-                type_name, member_name, comment = member_match.groups()
-                members.append(CStructMember(member_name, type_name, self._clean_comment(comment)))
-
-            idx = content.find('\n', idx) + 1
-
-        return CStruct(name, members), idx
+        while (token := tokens.peek()) is not None and not _is(token, '}'):
+            leading_comment = tokens.upcoming_comment()
+            declaration = self._read_until(tokens, (';', '}'))
+            if not _is(tokens.peek(), ';'):
+                continue
+            end = tokens.next()
+            member_comment = self._clean_comment(tokens.trailing_comment(end.line) or leading_comment)
+            members.extend(CStructMember(member_name, type_name, member_comment, bit_width)
+                           for member_name, type_name, bit_width in self._declarators(declaration))
+        tokens.next()
+
+        return CStruct(name, members, self._clean_comment(comment) or None)
+
+    def _read_until(self, tokens: _TokenStream, ends: tuple[str, ...]) -> List[_Token]:
+        """Reads tokens up to one of ends outside of brackets, which is left unread."""
+        result = []
+        depth = 0
+        while (token := tokens.peek()) is not None:
+            if token.kind == 'punctuation':
+                if depth == 0 and token.text in ends:
+                    break
+                if token.text in '([{':
+                    depth += 1
+                elif token.text in ')]}':
+                    depth -= 1
+            result.append(tokens.next())
+        return result
+
+    def _skip_body(self, tokens: _TokenStream):
+        """Reads the tokens up to and including the } closing the body whose { was just read."""
+        depth = 0
+        while (token := tokens.next()) is not None:
+            if token.kind == 'punctuation':
+                if token.text == '{':
+                    depth += 1
+                elif token.text == '}':
+                    if depth == 0:
+                        return
+                    depth -= 1
+
+    def _declarators(self, declaration: List[_Token]) -> List[tuple[str, str, Optional[str]]]:
+        """
+        Splits 'type a, *b, c[N], d : W' into (name, type, bit width) triples, types with pointers and array lengths
+        attached and the bit width None for members that are not bit fields.
+        """
+        if any(token.text in '{(' for token in declaration if token.kind == 'punctuation'):
+            # nested definitions, function pointers and the like are not supported
+            return []
+        parts = [[]]
+        for token in declaration:
+            if _is(token, ','):
+                parts.append([])
+            else:
+                parts[-1].append(token)
+        first = parts[0]
+        end = next((index for index, token in enumerate(first) if token.text in ('[', ':')), len(first))
+        start = end - 1
+        while start > 0 and (_is(first[start - 1], '*') or _is(first[start - 1], 'const')):
+            start -= 1
+        base = first[:start]
+        if not base or end == 0 or first[end - 1].kind != 'word':
+            return []
+        base_type = ' '.join(token.text for token in base)
+        result = []
+        for part in [first[start:]] + parts[1:]:
+            stars = 0
+            while part and (_is(part[0], '*') or _is(part[0], 'const')):
+                stars += part[0].text == '*'
+                part = part[1:]
+            if not part or part[0].kind != 'word':
+                return []
+            suffix = part[1:]
+            bit_field = next((index for index, token in enumerate(suffix) if _is(token, ':')), len(suffix))
+            type_name = base_type + '*' * stars + _join(suffix[:bit_field]).replace(' ', '')
+            bit_width = _join(suffix[bit_field + 1:]) if bit_field < len(suffix) else None
+            result.append((part[0].text, type_name, bit_width))
+        return result
 
     def parse_file(self, filepath: str) -> None:
         """Parse a C header file."""
-        with open(filepath, 'r') as f:
-            content = f.read()
-
-        idx = 0
-        while idx < len(content):
-            line = content[idx:content.find('\n', idx)].strip()
-
-            if line.startswith('#define'):
-                constant = self._parse_constant(line)
+        # undecodable bytes, say in Latin-1 comments of vendor headers, are replaced, as in parse_headers
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            self.parse_lines(f)
+
+    def parse_lines(self, lines: Iterable[str]) -> None:
+        """Parse C header source, streamed line by line in a single pass."""
+        tokenizer = _Tokenizer()
+        tokens = _TokenStream(tokenizer.tokens(lines))
+        previous = None
+        typedef_comment = None
+        # outside of enum and struct bodies only directives, definitions and the braces of bodies to skip matter
+        tokenizer.skip_plain_lines = True
+        while (token := tokens.next()) is not None:
+            if token.kind == 'directive':
+                constant = self._parse_constant(token)
                 if constant:
                     self.constants.append(constant)
-
-            elif line.startswith('enum'):
-                enum_def, new_idx = self._parse_enum(content, idx)
-                if enum_def:
-                    self.enums.append(enum_def)
-                    idx = new_idx
-                    continue
-
-            elif line.startswith('struct'):
-                struct_def, new_idx = self._parse_struct(content, idx)
-                if struct_def:
-                    self.structs.append(struct_def)
-                    idx = new_idx
-                    continue
-
-            idx = content.find('\n', idx) + 1
-            if idx <= 0:
-                break
+            elif token.kind == 'word' and token.text == 'typedef':
+                # the comment of typedef enum and typedef struct definitions stands before the typedef
+                typedef_comment = tokens.leading_comment()
+            elif (token.kind == 'word' and token.text in ('enum', 'struct')
+                  and tokens.peek() is not None and tokens.peek().kind == 'word' and _is(tokens.peek(1), '{')):
+                comment = (typedef_comment if _is(previous, 'typedef') else None) or tokens.leading_comment()
+                tokenizer.skip_plain_lines = False
+                if token.text == 'enum':
+                    self.enums.append(self._parse_enum(tokens, comment))
+                else:
+                    self.structs.append(self._parse_struct(tokens, comment))
+                tokenizer.skip_plain_lines = True
+            elif _is(token, '{') and (_is(previous, ')') or _is(previous, '=')):
+                # function bodies and initializers, while extern "C" blocks are parsed through
+                self._skip_body(tokens)
+            previous = token
 
     def generate_module(self, output_path: str) -> None:
         """Generate Python module from parsed header."""
@@ -216,6 +561,207 @@ class HeaderParser:
         }
         return type_map.get(c_type, 'Any')  # Default to Any for unknown types
 
+    def to_module(self, name: str) -> Module:
+        """
+        Convert the parsed definitions into a model Module for the generators.
+
+        Struct and enum names are converted to the Pascal case names whose C names are the parsed ones. Member types
+        resolve to primitive types, to the parsed structs and enums, and to Arrays for fixed length members.
+        Constants that are neither integer constant expressions of the constants before them nor float or string
+        literals are left out.
+
+        Raises:
+            ValueError: If a definition cannot be expressed in the model, like a pointer member, a bit field or an
+                enum with non-consecutive values
+        """
+        constants = dict()
+        for constant in self.constants:
+            value = self._constant_value(constant.value, constants)
+            if value is not None:
+                constants[constant.name] = Constant(constant.name, value)
+        integers = {name: constant.value for name, constant in constants.items() if type(constant.value) is int}
+        types = dict()
+        enums = []
+        for enum in self.enums:
+            types[enum.name] = self._model_enum(enum, integers)
+            enums.append(types[enum.name])
+        structs = []
+        for struct in self.structs:
+            model_struct = Struct(
+                _model_name(struct.name),
+                *[Field(member.name, self._model_type(struct, member, types, constants), member.comment or None)
+                  for member in struct.members])
+            types[struct.name] = model_struct
+            structs.append(model_struct)
+        return Module(name, *constants.values(), *enums, *structs)
+
+    def _model_enum(self, enum: CEnum, integers: dict[str, int]) -> Enumeration:
+        ordinals = []
+        for member in enum.members:
+            # enum members are visible to the values of the members and enums after them
+            ordinal = _integer_value(member.value, integers.get)
+            if ordinal is None:
+                raise ValueError(f'Unresolvable value [{member.value}] of {enum.name}.{member.name}')
+            integers[member.name] = ordinal
+            ordinals.append(ordinal)
+        if not ordinals or ordinals != list(range(ordinals[0], ordinals[0] + len(ordinals))):
+            raise ValueError(f'Enum {enum.name} does not have consecutive integer values')
+        return Enumeration(_model_name(enum.name), *[member.name for member in enum.members], first_ordinal=ordinals[0])
+
+    def _model_type(self, struct: CStruct, member: CStructMember, types: dict, constants: dict[str, Constant]):
+        if member.bit_width is not None:
+            raise ValueError(
+                f'Unsupported bit field [{member.type} : {member.bit_width}] of {struct.name}.{member.name}')
+        array_match = _array_pattern.match(member.type)
+        if array_match is None:
+            return self._model_scalar_type(struct, member, member.type, types)
+        element_type = self._model_scalar_type(struct, member, array_match.group(1), types)
+        length = array_match.group(2)
+        if length not in constants:
+            value = self._constant_value(length, constants)
+            if type(value) is not int:
+                raise ValueError(f'Unsupported length [{length}] of {struct.name}.{member.name}')
+            # literal lengths become constants, since the model refers to lengths by name
+            length = f'{struct.name}_{member.name}_length'.upper()
+            constants[length] = Constant(length, value)
+        return Array(element_type, constants[length])
+
+    def _model_scalar_type(self, struct: CStruct, member: CStructMember, c_type: str, types: dict):
+        c_type = c_type.replace('const ', '')
+        if c_type in _primitive_types:
+            return _primitive_types[c_type]
+        name = c_type.removeprefix('struct ').removeprefix('enum ')
+        if name in types and (name == c_type or c_type.startswith('struct ') == (type(types[name]) is Struct)):
+            return types[name]
+        raise ValueError(f'Unsupported type [{c_type}] of {struct.name}.{member.name}')
+
+    def _constant_value(self, text: str, constants: dict[str, Constant]):
+        """The value of an integer constant expression of the integer constants, a float or a string literal."""
+        def integer(name: str) -> Optional[int]:
+            constant = constants.get(name)
+            return constant.value if constant is not None and type(constant.value) is int else None
+
+        value = _integer_value(text, integer)
+        if value is not None:
+            return value
+        text = text.strip()
+        if _float_pattern.match(text):
+            return float(text.rstrip('fFlL'))
+        if _string_pattern.match(text):
+            try:
+                return ast.literal_eval(text)
+            except (SyntaxError, ValueError):
+                return None
+        return None
+
+
+_primitive_types = {
+    'bool': PrimitiveType.Boolean,
+    '_Bool': PrimitiveType.Boolean,
+    'int8_t': PrimitiveType.Int8,
+    'uint8_t': PrimitiveType.UInt8,
+    'int16_t': PrimitiveType.Int16,
+    'uint16_t': PrimitiveType.UInt16,
+    'int32_t': PrimitiveType.Int32,
+    'uint32_t': PrimitiveType.UInt32,
+    'int64_t': PrimitiveType.Int64,
+    'uint64_t': PrimitiveType.UInt64,
+    'signed char': PrimitiveType.Int8,
+    'unsigned char': PrimitiveType.UInt8,
+    'short': PrimitiveType.Int16,
+    'unsigned short': PrimitiveType.UInt16,
+    'int': PrimitiveType.Int32,
+    'unsigned': PrimitiveType.UInt32,
+    'unsigned int': PrimitiveType.UInt32,
+    # LP64, like the layouts the generators compute
+    'long': PrimitiveType.Int64,
+    'unsigned long': PrimitiveType.UInt64,
+    'long long': PrimitiveType.Int64,
+    'unsigned long long': PrimitiveType.UInt64,
+    'size_t': PrimitiveType.UInt64,
+    'float': PrimitiveType.Float,
+    'double': PrimitiveType.Double,
+    'char*': PrimitiveType.String
+}
+
+
+def _model_name(c_name: str) -> str:
+    """The Pascal case name the generators turn back into c_name."""
+    for candidate in [''.join(part[:1].upper() + part[1:] for part in c_name.split('_')), c_name]:
+        if PascalToCCase(candidate).result == c_name:
+            return candidate
+    raise ValueError(f'No model name has the C name [{c_name}]')
+
+
+def _integer_value(expression: str, names: Callable[[str], Optional[int]]) -> Optional[int]:
+    """
+    The value of a C integer constant expression, None if it has none.
+
+    Literals may have integer suffixes, names resolve through names, and division and remainder truncate toward zero
+    like in C.
+    """
+    expression = expression.strip()
+    if _integer_pattern.match(expression):
+        return int(expression, 0)
+    try:
+        tree = ast.parse(_integer_literal_pattern.sub(_python_integer_literal, expression), mode='eval')
+    except (SyntaxError, ValueError):
+        return None
+    return _evaluate_integer(tree.body, names)
+
+
+def _python_integer_literal(match: re.Match) -> str:
+    digits = match.group(1)
+    # C octal literals have a leading zero only
+    return '0o' + digits[1:] if len(digits) > 1 and digits[0] == '0' and digits[1] not in 'xX' else digits
+
+
+def _evaluate_integer(node: ast.expr, names: Callable[[str], Optional[int]]) -> Optional[int]:
+    if type(node) is ast.Constant:
+        return node.value if type(node.value) is int else None
+    elif type(node) is ast.Name:
+        return names(node.id)
+    elif type(node) is ast.UnaryOp and type(node.op) in _unary_operators:
+        operand = _evaluate_integer(node.operand, names)
+        return _unary_operators[type(node.op)](operand) if operand is not None else None
+    elif type(node) is ast.BinOp and type(node.op) in _binary_operators:
+        left = _evaluate_integer(node.left, names)
+        right = _evaluate_integer(node.right, names)
+        return _binary_operators[type(node.op)](left, right) if left is not None and right is not None else None
+    return None
+
+
+def _c_division(left: int, right: int) -> Optional[int]:
+    if right == 0:
+        return None
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+def _c_remainder(left: int, right: int) -> Optional[int]:
+    quotient = _c_division(left, right)
+    return left - right * quotient if quotient is not None else None
+
+
+_unary_operators = {
+    ast.USub: lambda operand: -operand,
+    ast.UAdd: lambda operand: operand,
+    ast.Invert: lambda operand: ~operand
+}
+
+_binary_operators = {
+    ast.Add: lambda left, right: left + right,
+    ast.Sub: lambda left, right: left - right,
+    ast.Mult: lambda left, right: left * right,
+    ast.Div: _c_division,
+    ast.Mod: _c_remainder,
+    ast.LShift: lambda left, right: left << right if 0 <= right < 64 else None,
+    ast.RShift: lambda left, right: left >> right if 0 <= right < 64 else None,
+    ast.BitAnd: lambda left, right: left & right,
+    ast.BitOr: lambda left, right: left | right,
+    ast.BitXor: lambda left, right: left ^ right
+}
+
 
 def parse_header(header_path: str, output_path: str) -> None:
     """
@@ -230,13 +776,100 @@ def parse_header(header_path: str, output_path: str) -> None:
     parser.generate_module(output_path)
 
 
-if __name__ == "__main__":
-    import sys
+def parse_headers(header_paths: List[str], cache_directory: Optional[str] = None,
+                  processes: Optional[int] = None) -> HeaderParser:
+    """
+    Parse many C header files across a process pool and merge their definitions.
+
+    Definitions keep the order of header_paths; of several with the same name, the first one is kept. The workers
+    read, hash and parse the headers and look up and fill the cache themselves, so only the paths and the parse
+    results pass between processes.
 
-    if len(sys.argv) != 3:
-        print("Usage: python parseheader.py <header_file> <output_file>")
-        sys.exit(1)
-    parse_header(sys.argv[1], sys.argv[2])
+    Args:
+        header_paths: Paths to the C header files
+        cache_directory: Directory caching parse results by header content and parser version, None to disable caching
+        processes: Number of worker processes, None for one per CPU
+    """
+    parse = partial(_parse_path, cache_directory=cache_directory)
+    if len(header_paths) > 1 and processes != 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(parse, header_paths))
+    else:
+        results = [parse(header_path) for header_path in header_paths]
+
+    merged = HeaderParser()
+    for constants, enums, structs in results:
+        _merge(merged.constants, constants)
+        _merge(merged.enums, enums)
+        _merge(merged.structs, structs)
+    return merged
+
+
+def _parse_path(header_path: str, cache_directory: Optional[str]) -> tuple[List[CConstant], List[CEnum], List[CStruct]]:
+    with open(header_path, 'rb') as f:
+        content = f.read()
+    key = _cache_key(content)
+    result = _read_cache(cache_directory, key) if cache_directory else None
+    if result is None:
+        parser = HeaderParser()
+        # decoded and split into lines as parse_file reads them
+        parser.parse_lines(io.StringIO(content.decode('utf-8', errors='replace'), newline=None))
+        result = parser.constants, parser.enums, parser.structs
+        if cache_directory:
+            _write_cache(cache_directory, key, result)
+    return result
+
+
+def _merge(target: list, definitions: list):
+    names = {definition.name for definition in target}
+    target.extend(definition for definition in definitions if definition.name not in names)
+
+
+def _cache_key(content: bytes) -> str:
+    return hashlib.sha256(f'{PARSER_VERSION}\n'.encode() + content).hexdigest()
+
+
+def _read_cache(cache_directory: str, key: str) -> Optional[tuple[List[CConstant], List[CEnum], List[CStruct]]]:
+    try:
+        with open(os.path.join(cache_directory, key + '.json'), 'r') as f:
+            cached = json.load(f)
+        return ([CConstant(**constant) for constant in cached['constants']],
+                [CEnum(enum['name'], [CEnumMember(**member) for member in enum['members']], enum['comment'])
+                 for enum in cached['enums']],
+                [CStruct(struct['name'], [CStructMember(**member) for member in struct['members']], struct['comment'])
+                 for struct in cached['structs']])
+    except (OSError, ValueError, KeyError, TypeError):
+        # unreadable, or not an entry of this parser, so the header is parsed again
+        return None
+
+
+def _write_cache(cache_directory: str, key: str, result: tuple[List[CConstant], List[CEnum], List[CStruct]]):
+    constants, enums, structs = result
+    os.makedirs(cache_directory, exist_ok=True)
+    # written to a temporary file first, so concurrent builds never read a partial entry
+    descriptor, temporary_path = tempfile.mkstemp(dir=cache_directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w') as f:
+            json.dump({'constants': [asdict(constant) for constant in constants],
+                       'enums': [asdict(enum) for enum in enums],
+                       'structs': [asdict(struct) for struct in structs]}, f)
+        os.replace(temporary_path, os.path.join(cache_directory, key + '.json'))
+    finally:
+        # only left when writing failed
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arguments = argparse.ArgumentParser(description="Generate a Python module from C header files.")
+    arguments.add_argument('header_files', nargs='+', metavar='header_file')
+    arguments.add_argument('output_file')
+    arguments.add_argument('--cache-directory', help="cache parse results in this directory")
+    arguments.add_argument('--processes', type=int, help="number of parallel parser processes")
+    options = arguments.parse_args()
+    parse_headers(options.header_files, options.cache_directory, options.processes).generate_module(options.output_file)
 
 
 def generate_something(writer: CodeWriter, class_name: str, fields: list[str]):
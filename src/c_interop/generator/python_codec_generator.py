@@ -0,0 +1,234 @@
+import struct
+import typing
+
+from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
+from c_interop.generator.layout import enum_storage_type, packed_flags_member
+from c_interop.generator.lowering import LoweredModule
+from c_interop.generator.python_model_generator import python_tuple
+from c_interop.model.model import Module, Type, PrimitiveType, Struct, Enumeration, List, Array
+
+
+class PythonCodecGenerator:
+    def __init__(self, module: Module, sink: typing.TextIO = None, lowered: LoweredModule = None):
+        self.module = module
+        self._out = CodeWriter(CodeWriterMode.Python, sink)
+        self._layouts = (lowered if lowered is not None else LoweredModule(module)).layouts
+
+    def run(self):
+        self._out.writeln('import struct')
+        self._out.writeln()
+        for s in self.module.structs:
+            if not contains_pointers(s):
+                self._write_codec(s)
+
+    def result(self):
+        return self._out.result()
+
+    def _write_codec(self, s: Struct):
+        name = s.name
+        self._out.writeln(name, '_format = struct.Struct(', repr(self._format(s)), ')')
+        self._out.writeln()
+        self._out.writeln()
+
+        self._out.write('def _', name, '_to_values(value):')
+        self._out.block(lambda: self._out.writeln(
+            'return ', python_tuple(self._struct_to_values(s, 'value'))))
+        self._out.writeln()
+
+        self._out.write('def _', name, '_from_values(values):')
+        self._out.block(lambda: self._out.writeln('return ', self._from_values(s, 0)))
+        self._out.writeln()
+
+        self._out.write('def ', name, '_pack(value):')
+        self._out.block(lambda: self._out.writeln('return ', name, '_format.pack(*_', name, '_to_values(value))'))
+        self._out.writeln()
+
+        self._out.write('def ', name, '_pack_into(buffer, offset, value):')
+        self._out.block(lambda: self._out.writeln(name, '_format.pack_into(buffer, offset, *_', name, '_to_values(value))'))
+        self._out.writeln()
+
+        self._out.write('def ', name, '_unpack(data):')
+        self._out.block(lambda: self._out.writeln('return _', name, '_from_values(', name, '_format.unpack(data))'))
+        self._out.writeln()
+
+        self._out.write('def ', name, '_unpack_from(buffer, offset=0):')
+        self._out.block(lambda: self._out.writeln(
+            'return _', name, '_from_values(', name, '_format.unpack_from(buffer, offset))'))
+        self._out.writeln()
+
+        def write_iter_unpack_body():
+            self._out.writeln('for values in ', name, '_format.iter_unpack(memoryview(buffer)):')
+            self._out.indent()
+            self._out.writeln('yield _', name, '_from_values(values)')
+            self._out.unindent()
+
+        self._out.write('def ', name, '_iter_unpack(buffer):')
+        self._out.block(write_iter_unpack_body)
+        self._out.writeln()
+
+    def _format(self, s: Struct):
+        codes = []
+        position = 0
+        for offset, code in self._leaves(s, 0):
+            if offset > position:
+                codes.append(f'{offset - position}x')
+            codes.append(code)
+            position = offset + struct.calcsize('=' + code)
+        size = self._layouts.for_struct(s).size
+        if size > position:
+            codes.append(f'{size - position}x')
+        return '=' + ''.join(run_length_encoded(codes))
+
+    def _leaves(self, t: Type, offset: int) -> list[tuple[int, str]]:
+        if type(t) is PrimitiveType:
+            return [(offset, struct_code(typing.cast(PrimitiveType, t)))]
+        elif type(t) is Enumeration:
+            if typing.cast(Enumeration, t).compact:
+                return [(offset, struct_code(enum_storage_type(typing.cast(Enumeration, t))))]
+            return [(offset, 'i')]
+        elif type(t) is Struct:
+            result = []
+            for field in self._layouts.for_struct(typing.cast(Struct, t)).fields:
+                result += self._leaves(field.type, offset + field.offset)
+            return result
+        elif type(t) in [Array, List]:
+            stride = self._layouts.size_and_alignment(t.element_type)[0]
+            result = []
+            for index in range(self._length(t)):
+                result += self._leaves(t.element_type, offset + index * stride)
+            return result
+        raise ValueError("Unsupported type " + t.name)
+
+    def _length(self, t: Array | List):
+        if type(t) is Array:
+            return self._layouts.constant_value(t.length)
+        return self._layouts.constant_value(t.maximum_length)
+
+    def _value_count(self, t: Type):
+        return len(self._leaves(t, 0))
+
+    def _struct_to_values(self, s: Struct, owner: str):
+        layout = self._layouts.for_struct(s)
+        result = []
+        for member in layout.fields:
+            if member.name == packed_flags_member:
+                result.append(' | '.join(self._bits_to_value(bits, f'{owner}.{name}')
+                                         for name, bits in layout.bit_fields.items()))
+            elif member.is_length:
+                result.append(f'len({owner}.{member.field.name})')
+            else:
+                result += self._to_values(member.type, f'{owner}.{member.name}')
+        return result
+
+    def _to_values(self, t: Type, expression: str):
+        if type(t) is PrimitiveType:
+            return [expression]
+        elif type(t) is Enumeration:
+            return [f'{expression}.value']
+        elif type(t) is Struct:
+            return [f'*_{t.name}_to_values({expression})']
+        elif type(t) in [Array, List]:
+            element_type = t.element_type
+            if type(element_type) is PrimitiveType:
+                result = [f'*{expression}']
+            elif type(element_type) is Enumeration:
+                result = [f'*(item.value for item in {expression})']
+            elif type(element_type) is Struct:
+                result = [f'*(item_value for item in {expression} for item_value in _{element_type.name}_to_values(item))']
+            else:
+                raise ValueError("Lists or Arrays as element types are not supported. Please, create indirection via a struct.")
+            if type(t) is List:
+                element_count = self._value_count(element_type)
+                result.append(f'*(0,) * ({element_count} * ({self._length(t)} - len({expression})))')
+            return result
+        raise ValueError("Unsupported type " + t.name)
+
+    def _from_values(self, t: Type, index: int) -> str:
+        if type(t) is PrimitiveType:
+            return f'values[{index}]'
+        elif type(t) is Enumeration:
+            return f'{t.name}(values[{index}])'
+        elif type(t) is Struct:
+            # the values follow the C member order, the constructor arguments the declared field order
+            indices = dict()
+            for member in self._layouts.for_struct(typing.cast(Struct, t)).fields:
+                indices[member.name] = index
+                index += self._value_count(member.type)
+            bit_fields = self._layouts.for_struct(typing.cast(Struct, t)).bit_fields
+            arguments = []
+            for field in typing.cast(Struct, t).fields:
+                if field.name in bit_fields:
+                    arguments.append(self._bits_from_value(bit_fields[field.name], indices[packed_flags_member]))
+                elif type(field.type) in [Array, List]:
+                    arguments.append(self._elements_from_values(field.type, indices[field.name],
+                                                                indices.get(field.name + '_length')))
+                else:
+                    arguments.append(self._from_values(field.type, indices[field.name]))
+            return f'{t.name}({", ".join(arguments)})'
+        raise ValueError("Unsupported type " + t.name)
+
+    def _bits_to_value(self, bits, expression: str) -> str:
+        if type(bits.field.type) is Enumeration:
+            return f'(({expression}.value - {bits.field.type.first_ordinal}) << {bits.shift})'
+        return f'(int({expression}) << {bits.shift})'
+
+    def _bits_from_value(self, bits, index: int) -> str:
+        stored = f'(values[{index}] >> {bits.shift} & {bits.mask:#x})'
+        if type(bits.field.type) is Enumeration:
+            return f'{bits.field.type.name}({stored} + {bits.field.type.first_ordinal})'
+        return f'bool{stored}'
+
+    def _elements_from_values(self, t: Array | List, index: int, length_index: int | None) -> str:
+        length = self._length(t)
+        if type(t.element_type) is PrimitiveType:
+            if type(t) is Array:
+                return f'list(values[{index}:{index + length}])'
+            return f'list(values[{index}:{index} + values[{length_index}]])'
+        stride = self._value_count(t.element_type)
+        elements = [self._from_values(t.element_type, index + position * stride) for position in range(length)]
+        if type(t) is Array:
+            return f'[{", ".join(elements)}]'
+        return f'[{", ".join(elements)}][:values[{length_index}]]'
+
+
+def contains_pointers(t: Type) -> bool:
+    if t is PrimitiveType.String:
+        return True
+    elif type(t) is Struct:
+        return any(contains_pointers(field.type) for field in typing.cast(Struct, t).fields)
+    elif type(t) is List and t.maximum_length is None:
+        return True
+    elif type(t) in [Array, List]:
+        return contains_pointers(t.element_type)
+    return False
+
+
+def struct_code(primitive: PrimitiveType):
+    codes = {
+        PrimitiveType.Boolean: '?',
+        PrimitiveType.Integer: 'q',
+        PrimitiveType.Int8: 'b',
+        PrimitiveType.UInt8: 'B',
+        PrimitiveType.Int16: 'h',
+        PrimitiveType.UInt16: 'H',
+        PrimitiveType.Int32: 'i',
+        PrimitiveType.UInt32: 'I',
+        PrimitiveType.Int64: 'q',
+        PrimitiveType.UInt64: 'Q',
+        PrimitiveType.Float: 'f',
+        PrimitiveType.Double: 'd'
+    }
+    if primitive not in codes:
+        raise ValueError(f'Unsupported struct primitive type [{primitive}]')
+    return codes[primitive]
+
+
+def run_length_encoded(codes: list[str]):
+    result = []
+    for code in codes:
+        if len(code) == 1 and len(result) > 0 and result[-1][-1] == code and not result[-1].endswith('x'):
+            count = int(result[-1][:-1] or '1')
+            result[-1] = f'{count + 1}{code}'
+        else:
+            result.append(code)
+    return result
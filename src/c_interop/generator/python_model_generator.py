@@ -1,22 +1,25 @@
-import typing
+from typing import TextIO
 
 from c_interop.generator.codewriter import CodeWriter, CodeWriterMode
-from c_interop.model.model import Module, Type, PrimitiveType, List, Set, Map
+from c_interop.generator.lowering import LoweredModule
+from c_interop.model.model import Module, PrimitiveType
 
 
 class PythonModuleGenerator:
-    def __init__(self, module: Module):
+    def __init__(self, module: Module, slots: bool = False, sink: TextIO = None, lowered: LoweredModule = None):
         self.module = module
-        self._out = CodeWriter(CodeWriterMode.Python)
-        self._complexTypesWritten = set()
+        self._slots = slots
+        self._out = CodeWriter(CodeWriterMode.Python, sink)
+        self._lowered = lowered if lowered is not None else LoweredModule(module)
 
     def run(self):
         for enum in self.module.enums:
             self._write_enum(enum)
-            self._complexTypesWritten.add(enum.name)
         for struct in self.module.structs:
-            self._write_struct(struct)
-            self._complexTypesWritten.add(struct.name)
+            if self._slots:
+                self._write_slotted_struct(struct)
+            else:
+                self._write_struct(struct)
 
     def result(self):
         return self._out.result()
@@ -36,7 +39,7 @@ class PythonModuleGenerator:
         self._out.write('class ', struct.name, ':')
         def write_struct_body():
             for field in struct.fields:
-                self._out.write(field.name, ': ', self._python_type_for_type(field.type), ' = ',
+                self._out.write(field.name, ': ', self._lowered.field(struct, field).python_type, ' = ',
                                   default_value_for_type(field.type))
                 if field.comment:
                     lines = [stripped for line in field.comment.split('\n') if len(stripped := line.strip()) > 0]
@@ -49,31 +52,54 @@ class PythonModuleGenerator:
         self._out.block(write_struct_body)
         self._out.writeln()
 
-    def _python_type_for_type(self, t: Type):
-        if type(t) is PrimitiveType:
-            primitive = typing.cast(PrimitiveType, t)
-            if primitive is PrimitiveType.Boolean:
-                return 'bool'
-            elif primitive.is_integer:
-                return 'int'
-            elif primitive is PrimitiveType.Float or primitive is PrimitiveType.Double:
-                return 'float'
-            elif primitive is PrimitiveType.String:
-                return 'str'
-            else:
-                raise ValueError("Unsupported type [" + t.name + "]")
-        elif type(t) is List:
-            return f'list[{self._python_type_for_type(t.type_arguments[0])}]'
-        elif type(t) is Set:
-            return f'set[{self._python_type_for_type(t.type_arguments[1])}]'
-        elif type(t) is Map:
-            return f'dict[{self._python_type_for_type(t.type_arguments[0])}, {self._python_type_for_type(t.type_arguments[1])}]'
-        else:
-            # TODO import if necessary
-            if t.name in self._complexTypesWritten:
-                return t.name
-            else:
-                return "'" + t.name + "'"
+    def _write_slotted_struct(self, struct):
+        self._out.write('class ', struct.name, ':')
+
+        def write_struct_body():
+            names = [field.name for field in struct.fields]
+            self._out.writeln('__slots__ = ', python_tuple(repr(name) for name in names))
+            self._out.writeln('__hash__ = None')
+            self._out.writeln()
+            self._out.writeln('def __init__(self, ', ', '.join(
+                f'{field.name}: {self._lowered.field(struct, field).python_type} = {default_value_for_type(field.type)}'
+                for field in struct.fields), '):')
+            self._out.indent()
+            for field in struct.fields:
+                self._out.write('self.', field.name, ' = ', field.name)
+                if field.comment:
+                    lines = [stripped for line in field.comment.split('\n') if len(stripped := line.strip()) > 0]
+                    if len(lines) == 0:
+                        raise ValueError(f"Field {field.name} of struct {struct.name} has an empty comment")
+                    for line in lines:
+                        self._out.writeln(f" # {line}")
+                else:
+                    self._out.writeln()
+            self._out.unindent()
+            self._out.writeln()
+            self._out.writeln('def __eq__(self, other):')
+            self._out.indent()
+            self._out.writeln('if other.__class__ is not self.__class__:')
+            self._out.indent()
+            self._out.writeln('return NotImplemented')
+            self._out.unindent()
+            self._out.writeln('return ', python_tuple(f'self.{name}' for name in names),
+                              ' == ', python_tuple(f'other.{name}' for name in names))
+            self._out.unindent()
+            self._out.writeln()
+            self._out.writeln('def __repr__(self):')
+            self._out.indent()
+            self._out.writeln("return f'", struct.name, '(', ', '.join(f'{name}={{self.{name}!r}}' for name in names), ")'")
+            self._out.unindent()
+
+        self._out.block(write_struct_body)
+        self._out.writeln()
+
+
+def python_tuple(items):
+    items = list(items)
+    if len(items) == 1:
+        return f'({items[0]},)'
+    return '(' + ', '.join(items) + ')'
 
 
 def default_value_for_type(t):
@@ -0,0 +1,57 @@
+STATE_RUNTIME = r'''
+#ifndef C_INTEROP_STATE_RUNTIME
+#define C_INTEROP_STATE_RUNTIME
+
+/* The state of generated code is per interpreter: a capsule in the dict of the interpreter, registered under a key
+ * derived from the module name. Being keyed by name only, the last module initialized with a key wins, so re-importing
+ * or importing the module under a second name in the same interpreter replaces the earlier state. */
+
+/* Returns a new reference to the capsule registered for key, or NULL, with an exception set if the lookup failed. */
+static PyObject *state_registry_capsule(const char *key) {
+    PyObject *registry = PyInterpreterState_GetDict(PyInterpreterState_Get());
+    if (registry == NULL) {
+        return NULL;
+    }
+#if PY_VERSION_HEX >= 0x030D0000
+    PyObject *capsule = NULL;
+    if (PyDict_GetItemStringRef(registry, key, &capsule) < 0) {
+        return NULL;
+    }
+    return capsule;
+#else
+    return Py_XNewRef(PyDict_GetItemString(registry, key));
+#endif
+}
+
+/* Returns the pointer of the capsule registered for key, holding the capsule while reading it, or NULL. */
+static void *state_registry_get(const char *key) {
+    PyObject *capsule = state_registry_capsule(key);
+    if (capsule == NULL) {
+        return NULL;
+    }
+    void *state = PyCapsule_GetPointer(capsule, key);
+    Py_DECREF(capsule);
+    return state;
+}
+
+static int state_registry_set(const char *key, PyObject *capsule) {
+    PyObject *registry = PyInterpreterState_GetDict(PyInterpreterState_Get());
+    if (registry == NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "The interpreter has no dict to register state in");
+        return -1;
+    }
+    return PyDict_SetItemString(registry, key, capsule);
+}
+
+/* Removes the registration of key if it still refers to state, and leaves a later registration in place. */
+static void state_registry_remove(const char *key, void *state) {
+    PyObject *capsule = state_registry_capsule(key);
+    if (capsule != NULL && PyCapsule_GetPointer(capsule, key) == state) {
+        PyDict_DelItemString(PyInterpreterState_GetDict(PyInterpreterState_Get()), key);
+    }
+    Py_XDECREF(capsule);
+    PyErr_Clear();
+}
+
+#endif
+'''
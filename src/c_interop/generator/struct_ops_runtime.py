@@ -0,0 +1,104 @@
+STRUCT_OPS_RUNTIME = r'''
+#ifndef C_INTEROP_STRUCT_OPS_RUNTIME
+#define C_INTEROP_STRUCT_OPS_RUNTIME
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+#define struct_ops_hash_seed UINT64_C(0x9e3779b97f4a7c15)
+
+/* Multiplicative word mixing, strong enough once struct_ops_hash_finish avalanches the result. */
+static inline uint64_t struct_ops_hash_word(uint64_t hash, uint64_t word) {
+    return (((hash << 5) | (hash >> 59)) ^ word) * UINT64_C(0x517cc1b727220a95);
+}
+
+static inline uint64_t struct_ops_hash_bytes(uint64_t hash, const void *data, size_t size) {
+    const unsigned char *bytes = data;
+    uint64_t word;
+    hash = struct_ops_hash_word(hash, (uint64_t) size);
+    for (; size >= sizeof(word); size -= sizeof(word), bytes += sizeof(word)) {
+        memcpy(&word, bytes, sizeof(word));
+        hash = struct_ops_hash_word(hash, word);
+    }
+    if (size > 0) {
+        word = 0;
+        memcpy(&word, bytes, size);
+        hash = struct_ops_hash_word(hash, word);
+    }
+    return hash;
+}
+
+/* Hashes 0.0 and -0.0 alike, since they compare equal. */
+static inline uint64_t struct_ops_hash_double(uint64_t hash, double value) {
+    uint64_t word = 0;
+    if (value != 0) {
+        memcpy(&word, &value, sizeof(word));
+    }
+    return struct_ops_hash_word(hash, word);
+}
+
+static inline uint64_t struct_ops_hash_string(uint64_t hash, const char *value) {
+    if (value == NULL) {
+        return struct_ops_hash_word(hash, UINT64_MAX);
+    }
+    return struct_ops_hash_bytes(hash, value, strlen(value));
+}
+
+static inline uint64_t struct_ops_hash_finish(uint64_t hash) {
+    hash ^= hash >> 33;
+    hash *= UINT64_C(0xff51afd7ed558ccd);
+    hash ^= hash >> 33;
+    hash *= UINT64_C(0xc4ceb9fe1a85ec53);
+    return hash ^ (hash >> 33);
+}
+
+static inline bool struct_ops_string_equals(const char *a, const char *b) {
+    return a == b || (a != NULL && b != NULL && strcmp(a, b) == 0);
+}
+
+/* Deep copies place strings and unbounded lists in the caller's storage, which must outlive the copies. */
+struct copy_storage {
+    char *data;
+    size_t used;
+    size_t size;
+};
+
+static inline void copy_storage_init(struct copy_storage *storage, void *data, size_t size) {
+    storage->data = data;
+    storage->used = 0;
+    storage->size = size;
+}
+
+/* Returns NULL if the storage is exhausted. */
+static inline void *copy_storage_allocate(struct copy_storage *storage, size_t size, size_t alignment) {
+    size_t offset = (storage->used + alignment - 1) / alignment * alignment;
+    if (offset > storage->size || size > storage->size - offset) {
+        return NULL;
+    }
+    storage->used = offset + size;
+    return storage->data + offset;
+}
+
+static inline size_t copy_storage_string_size(const char *value) {
+    return value != NULL ? strlen(value) + 1 : 0;
+}
+
+static inline int copy_storage_string(struct copy_storage *storage, const char **target, const char *source) {
+    if (source == NULL) {
+        *target = NULL;
+        return 0;
+    }
+    size_t size = strlen(source) + 1;
+    char *copy = copy_storage_allocate(storage, size, 1);
+    if (copy == NULL) {
+        return -1;
+    }
+    memcpy(copy, source, size);
+    *target = copy;
+    return 0;
+}
+
+#endif
+'''
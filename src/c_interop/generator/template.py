@@ -1,8 +1,18 @@
 import os
+from contextlib import contextmanager
+from typing import TextIO, Iterator
 
 from c_interop.generator.c_header_generator import CHeaderGenerator, Style
-from c_interop.generator.c_python_conversion_generator import CPythonConversionGenerator
+from c_interop.generator.c_json_generator import CJsonGenerator
+from c_interop.generator.c_python_conversion_generator import CPythonConversionGenerator, ConversionMode, \
+    ArrayRepresentation
+from c_interop.generator.c_python_view_generator import CPythonViewGenerator
+from c_interop.generator.c_struct_ops_generator import CStructOpsGenerator
 from c_interop.generator.c_to_string_generator import CToStringGenerator
+from c_interop.generator.layout import layout_report
+from c_interop.generator.lowering import LoweredModule
+from c_interop.generator.numpy_dtype_generator import NumpyDtypeGenerator
+from c_interop.generator.python_codec_generator import PythonCodecGenerator
 from c_interop.generator.python_model_generator import PythonModuleGenerator
 from c_interop.model.model import Module
 
@@ -10,59 +20,144 @@ from c_interop.model.model import Module
 def f():
     print('Hi!')
 
+
+_code_marker = '@_code;'
+
+
 def write_with_template(name: str, suffix: str, code: str, directory: str = '.'):
     input_path = os.path.join(directory, name + '.' + suffix + '.template')
     with open(input_path, 'r') as inputFile:
-        content = inputFile.read().replace('@_code;', code.strip())
+        content = inputFile.read().replace(_code_marker, code.strip())
     output_path = os.path.join(directory, name + '.' + suffix)
     print(f'Writing file {output_path}')
     with open(output_path, 'w') as outputFile:
         outputFile.write(content)
 
+
+@contextmanager
+def template_output(name: str, suffix: str, directory: str = '.') -> Iterator[TextIO]:
+    """
+    Streams the template of name.suffix around the code written to the yielded file, which takes the place of the
+    @_code; marker stripped as write_with_template strips it. The output file only replaces an existing one once all
+    code is written.
+    """
+    input_path = os.path.join(directory, name + '.' + suffix + '.template')
+    with open(input_path, 'r') as inputFile:
+        template = inputFile.read()
+    prefix, marker, template_suffix = template.partition(_code_marker)
+    if _code_marker in template_suffix:
+        raise ValueError(f'Template {input_path} contains {_code_marker} more than once, which cannot be streamed')
+    output_path = os.path.join(directory, name + '.' + suffix)
+    print(f'Writing file {output_path}')
+    partial_path = output_path + '.partial'
+    try:
+        with open(partial_path, 'w') as outputFile:
+            outputFile.write(prefix)
+            # without a marker the template is copied and the code dropped, as in write_with_template
+            yield _StrippedOutput(outputFile, discard=not marker)
+            outputFile.write(template_suffix)
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+class _StrippedOutput:
+    """Writes text to out without its leading and trailing whitespace, holding back whitespace that may trail."""
+
+    def __init__(self, out: TextIO, discard: bool = False):
+        self._out = out
+        self._discard = discard
+        self._started = False
+        self._whitespace = ''
+
+    def write(self, text: str):
+        if self._discard:
+            return
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return
+            self._started = True
+        stripped = text.rstrip()
+        if stripped:
+            self._out.write(self._whitespace)
+            self._out.write(stripped)
+            self._whitespace = text[len(stripped):]
+        else:
+            self._whitespace += text
+
+
 def write_module_with_template(
         module: Module,
         directory: str = '.',
         module_prefix='python.generated',
-        style: Style = Style.Knr):
-    python_generator = PythonModuleGenerator(module)
-    python_generator.run()
-    write_with_template(
-        f'python_{module.name}_protocol',
-        'py',
-        python_generator.result(),
-        directory)
-
-    header_generator = CHeaderGenerator(module, style)
-    header_generator.run()
-    write_with_template(
-        f'{module.name}_protocol',
-        'h',
-        header_generator.result(),
-        directory)
+        style: Style = Style.Knr,
+        numpy_dtypes: bool = False,
+        slots: bool = False,
+        binary_codec: bool = False,
+        views: bool = False,
+        json: bool = False,
+        struct_ops: bool = False,
+        conversion_mode: ConversionMode = ConversionMode.Unrolled,
+        array_representation: ArrayRepresentation = ArrayRepresentation.List):
+    # all generators share one lowering of the module, made here so it reflects the module as it is now
+    lowered = LoweredModule(module)
+    # the generators stream into the output files, result() writes the code they still buffer
+    with template_output(f'python_{module.name}_protocol', 'py', directory) as python_code:
+        python_generator = PythonModuleGenerator(module, slots, python_code, lowered)
+        python_generator.run()
+        python_generator.result()
+        if numpy_dtypes:
+            python_code.write('\n')
+            dtype_generator = NumpyDtypeGenerator(module, python_code, lowered)
+            dtype_generator.run()
+            dtype_generator.result()
+        if binary_codec:
+            python_code.write('\n')
+            codec_generator = PythonCodecGenerator(module, python_code, lowered)
+            codec_generator.run()
+            codec_generator.result()
+
+    with template_output(f'{module.name}_protocol', 'h', directory) as header_code:
+        header_generator = CHeaderGenerator(module, style, header_code, lowered)
+        header_generator.run()
+        header_generator.result()
+    report = layout_report(module)
+    if report:
+        print(report)
 
     # TODO style - requires CPythonConversionGenerator to also have a before_block method
-    conversion_generator = CPythonConversionGenerator(module, module_prefix)
-    conversion_generator.run()
-    write_with_template(
-        f'{module.name}_conversion',
-        'h',
-        conversion_generator.result()[0],
-        directory)
-    write_with_template(
-        f'{module.name}_conversion',
-        'c',
-        conversion_generator.result()[1],
-        directory)
-
-    to_string_generator = CToStringGenerator(module, style=Style.Bsd)
-    to_string_generator.run()
-    write_with_template(
-        f'{module.name}_to_string',
-        'h',
-        to_string_generator.result()[0],
-        directory)
-    write_with_template(
-        f'{module.name}_to_string',
-        'c',
-        to_string_generator.result()[1],
-        directory)
+    with template_output(f'{module.name}_conversion', 'h', directory) as header_code, \
+            template_output(f'{module.name}_conversion', 'c', directory) as module_code:
+        conversion_generator = CPythonConversionGenerator(module, module_prefix, conversion_mode, array_representation,
+                                                          header_code, module_code, lowered)
+        conversion_generator.run()
+        conversion_generator.result()
+
+    if views:
+        with template_output(f'{module.name}_views', 'h', directory) as header_code, \
+                template_output(f'{module.name}_views', 'c', directory) as module_code:
+            view_generator = CPythonViewGenerator(module, header_code, module_code, lowered)
+            view_generator.run()
+            view_generator.result()
+
+    with template_output(f'{module.name}_to_string', 'h', directory) as header_code, \
+            template_output(f'{module.name}_to_string', 'c', directory) as module_code:
+        to_string_generator = CToStringGenerator(module, Style.Bsd, header_code, module_code, lowered)
+        to_string_generator.run()
+        to_string_generator.result()
+
+    if json:
+        with template_output(f'{module.name}_json', 'h', directory) as header_code, \
+                template_output(f'{module.name}_json', 'c', directory) as module_code:
+            json_generator = CJsonGenerator(module, style, header_code, module_code, lowered)
+            json_generator.run()
+            json_generator.result()
+
+    if struct_ops:
+        with template_output(f'{module.name}_struct_ops', 'h', directory) as header_code, \
+                template_output(f'{module.name}_struct_ops', 'c', directory) as module_code:
+            struct_ops_generator = CStructOpsGenerator(module, style, header_code, module_code, lowered)
+            struct_ops_generator.run()
+            struct_ops_generator.result()
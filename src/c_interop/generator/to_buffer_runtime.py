@@ -0,0 +1,81 @@
+TO_BUFFER_RUNTIME = r'''
+#ifndef C_INTEROP_TO_BUFFER_RUNTIME
+#define C_INTEROP_TO_BUFFER_RUNTIME
+
+#include <stdint.h>
+#include <stdio.h>
+#include <string.h>
+
+#ifndef to_buffer_indentation_width
+#define to_buffer_indentation_width 4
+#endif
+
+/* Counts every byte appended but only stores what fits, like snprintf. */
+struct to_buffer {
+    char *data;
+    size_t capacity;
+    size_t length;
+};
+
+static inline void to_buffer_append(struct to_buffer *buffer, const char *text, size_t size) {
+    if (buffer->length < buffer->capacity) {
+        size_t available = buffer->capacity - buffer->length;
+        memcpy(buffer->data + buffer->length, text, size < available ? size : available);
+    }
+    buffer->length += size;
+}
+
+#define to_buffer_literal(buffer, text) to_buffer_append(buffer, text, sizeof(text) - 1)
+
+static inline void to_buffer_indent(struct to_buffer *buffer, size_t indentation) {
+    static const char spaces[] = "                                                                ";
+    size_t size = indentation * to_buffer_indentation_width;
+    while (size > 0) {
+        size_t chunk = size < sizeof(spaces) - 1 ? size : sizeof(spaces) - 1;
+        to_buffer_append(buffer, spaces, chunk);
+        size -= chunk;
+    }
+}
+
+static inline void to_buffer_unsigned(struct to_buffer *buffer, uint64_t value) {
+    char digits[format_uint64_size];
+    char *first = format_uint64(digits + sizeof(digits), value);
+    to_buffer_append(buffer, first, (size_t) (digits + sizeof(digits) - first));
+}
+
+static inline void to_buffer_signed(struct to_buffer *buffer, int64_t value) {
+    if (value < 0) {
+        to_buffer_literal(buffer, "-");
+        to_buffer_unsigned(buffer, (uint64_t) 0 - (uint64_t) value);
+    } else {
+        to_buffer_unsigned(buffer, (uint64_t) value);
+    }
+}
+
+static inline void to_buffer_double(struct to_buffer *buffer, double value) {
+    char text[512];
+    int size = snprintf(text, sizeof(text), "%f", value);
+    if (size > 0) {
+        to_buffer_append(buffer, text, (size_t) size < sizeof(text) ? (size_t) size : sizeof(text) - 1);
+    }
+}
+
+static inline void to_buffer_string(struct to_buffer *buffer, const char *value) {
+    if (value == NULL) {
+        to_buffer_literal(buffer, "(null)");
+    } else {
+        to_buffer_append(buffer, value, strlen(value));
+    }
+}
+
+/* Terminates the output, truncating if necessary, and returns the untruncated length. */
+static inline size_t to_buffer_finish(struct to_buffer *buffer) {
+    if (buffer->capacity > 0) {
+        size_t end = buffer->length < buffer->capacity ? buffer->length : buffer->capacity - 1;
+        buffer->data[end] = '\0';
+    }
+    return buffer->length;
+}
+
+#endif
+'''
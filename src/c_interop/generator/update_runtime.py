@@ -0,0 +1,96 @@
+UPDATE_RUNTIME = r'''
+#ifndef C_INTEROP_UPDATE_RUNTIME
+#define C_INTEROP_UPDATE_RUNTIME
+
+#include <string.h>
+
+static int signed_matches(PyObject *current, long long value) {
+    if (!PyLong_CheckExact(current)) {
+        return 0;
+    }
+    int overflow;
+    long long current_value = PyLong_AsLongLongAndOverflow(current, &overflow);
+    return overflow == 0 && current_value == value;
+}
+
+static int unsigned_matches(PyObject *current, unsigned long long value) {
+    if (!PyLong_CheckExact(current)) {
+        return 0;
+    }
+    unsigned long long current_value = PyLong_AsUnsignedLongLong(current);
+    if (current_value == (unsigned long long) -1 && PyErr_Occurred()) {
+        PyErr_Clear();
+        return 0;
+    }
+    return current_value == value;
+}
+
+static int double_matches(PyObject *current, double value) {
+    return PyFloat_CheckExact(current) && PyFloat_AS_DOUBLE(current) == value;
+}
+
+static int bool_matches(PyObject *current, int value) {
+    return current == (value ? Py_True : Py_False);
+}
+
+static int string_matches(PyObject *current, const char *value) {
+    if (value == NULL) {
+        return current == Py_None;
+    }
+    if (!PyUnicode_CheckExact(current)) {
+        return 0;
+    }
+    const char *current_value = PyUnicode_AsUTF8(current);
+    if (current_value == NULL) {
+        PyErr_Clear();
+        return 0;
+    }
+    return strcmp(current_value, value) == 0;
+}
+
+static int replace_attribute(PyObject *target, PyObject *key, PyObject *value) {
+    if (value == NULL) {
+        return -1;
+    }
+    int status = PyObject_SetAttr(target, key, value);
+    Py_DECREF(value);
+    return status;
+}
+
+static int replace_list_item(PyObject *list, Py_ssize_t index, PyObject *value) {
+    if (value == NULL) {
+        return -1;
+    }
+    return PyList_SetItem(list, index, value);
+}
+
+#define update_attribute(target, key, current, matches, new_value) \
+    { \
+        PyObject *current = PyObject_GetAttr(target, key); \
+        if (current == NULL) { \
+            return -1; \
+        } \
+        int unchanged = matches; \
+        Py_DECREF(current); \
+        if (!unchanged && replace_attribute(target, key, new_value) < 0) { \
+            return -1; \
+        } \
+    }
+
+#define update_struct_attribute(target, key, current, python_class, update_call, new_value) \
+    { \
+        PyObject *current = PyObject_GetAttr(target, key); \
+        if (current == NULL) { \
+            return -1; \
+        } \
+        int status = Py_TYPE(current) == (PyTypeObject *) python_class \
+            ? update_call \
+            : replace_attribute(target, key, new_value); \
+        Py_DECREF(current); \
+        if (status < 0) { \
+            return -1; \
+        } \
+    }
+
+#endif
+'''
@@ -0,0 +1,88 @@
+VIEW_RUNTIME = r'''
+#ifndef C_INTEROP_VIEW_RUNTIME
+#define C_INTEROP_VIEW_RUNTIME
+
+/* Views cache converted fields on first access, filling the cache in a critical section on the view. Before 3.13
+ * there is no free-threaded build and the GIL serializes the access. */
+#ifndef Py_BEGIN_CRITICAL_SECTION
+#define Py_BEGIN_CRITICAL_SECTION(op) {
+#define Py_END_CRITICAL_SECTION() }
+#endif
+
+typedef PyObject *(*view_element_converter)(const void *element, PyObject *owner);
+
+typedef struct {
+    PyObject_HEAD
+    const char *items;
+    Py_ssize_t length;
+    size_t stride;
+    view_element_converter convert;
+    PyObject *owner;
+} sequence_view_object;
+
+static int sequence_view_traverse(sequence_view_object *self, visitproc visit, void *arg) {
+    Py_VISIT(Py_TYPE(self));
+    Py_VISIT(self->owner);
+    return 0;
+}
+
+static int sequence_view_clear(sequence_view_object *self) {
+    Py_CLEAR(self->owner);
+    return 0;
+}
+
+static void sequence_view_dealloc(sequence_view_object *self) {
+    PyTypeObject *type = Py_TYPE(self);
+    PyObject_GC_UnTrack(self);
+    sequence_view_clear(self);
+    type->tp_free((PyObject *) self);
+    Py_DECREF(type);
+}
+
+static Py_ssize_t sequence_view_length(sequence_view_object *self) {
+    return self->length;
+}
+
+static PyObject *sequence_view_item(sequence_view_object *self, Py_ssize_t index) {
+    if (index < 0 || index >= self->length) {
+        PyErr_SetString(PyExc_IndexError, "sequence view index out of range");
+        return NULL;
+    }
+    return self->convert(self->items + (size_t) index * self->stride, self->owner);
+}
+
+static PyType_Slot sequence_view_slots[] = {
+    {Py_tp_traverse, (void *) sequence_view_traverse},
+    {Py_tp_clear, (void *) sequence_view_clear},
+    {Py_tp_dealloc, (void *) sequence_view_dealloc},
+    {Py_sq_length, (void *) sequence_view_length},
+    {Py_sq_item, (void *) sequence_view_item},
+    {0, NULL}
+};
+
+/* A heap type created per module, so that each interpreter has its own. */
+static PyType_Spec sequence_view_spec = {
+    .name = "c_interop.SequenceView",
+    .basicsize = sizeof(sequence_view_object),
+    .flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_HAVE_GC | Py_TPFLAGS_SEQUENCE | Py_TPFLAGS_IMMUTABLETYPE
+             | Py_TPFLAGS_DISALLOW_INSTANTIATION,
+    .slots = sequence_view_slots
+};
+
+static PyObject *sequence_view_new(PyTypeObject *type, const void *items, size_t length, size_t stride,
+                                   view_element_converter convert, PyObject *owner) {
+    sequence_view_object *self = PyObject_GC_New(sequence_view_object, type);
+    if (self == NULL) {
+        return NULL;
+    }
+    self->items = (const char *) items;
+    self->length = (Py_ssize_t) length;
+    self->stride = stride;
+    self->convert = convert;
+    self->owner = Py_NewRef(owner);
+    PyObject_GC_Track(self);
+    return (PyObject *) self;
+}
+
+#endif
+'''
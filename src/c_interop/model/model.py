@@ -78,7 +78,8 @@ class Field:
 
 
 class Struct(Type):
-    def __init__(self, name: str, *fields: Field, typedef=False, typedef_postfix: str = 't'):
+    def __init__(self, name: str, *fields: Field, typedef=False, typedef_postfix: str = 't', optimize_layout: bool = False,
+                 pack_flags: bool = False, columns: bool = False):
         super().__init__(name)
         self.fields: list[Field]
         self.typedef = typedef
@@ -86,10 +87,17 @@ class Struct(Type):
             raise ValueError("No fields provided")
         self.fields = list(fields)
         self.typedef_postfix = typedef_postfix
+        # reorders the C members by alignment to minimize padding, the Python field order stays as declared
+        self.optimize_layout = optimize_layout
+        # stores Boolean and small Enumeration fields as bits of a shared packed_flags member
+        self.pack_flags = pack_flags
+        # adds a <name>_columns structure of arrays with transpose functions, for structs of scalar primitive fields
+        self.columns = columns
 
 
 class Enumeration(Type):
-    def __init__(self, name: str, *values: str, first_ordinal: int = 1, typedef: bool = False, typedef_postfix: str = 'e') -> None:
+    def __init__(self, name: str, *values: str, first_ordinal: int = 1, typedef: bool = False, typedef_postfix: str = 'e',
+                 compact: bool = False) -> None:
         super().__init__(name)
         if len(values) == 0:
             raise ValueError("No values provided")
@@ -97,6 +105,8 @@ class Enumeration(Type):
         self.first_ordinal = first_ordinal
         self.typedef = typedef
         self.typedef_postfix = typedef_postfix
+        # stores values in the smallest integer type holding all ordinals instead of an int sized enum
+        self.compact = compact
 
 
 class List(Type):
@@ -104,6 +114,7 @@ class List(Type):
         super().__init__(f'list[{element_type.name}]')
         self.element_type = element_type
         self.type_arguments = [element_type]
+        self.maximum_length: str | None = None
         if maximum_length is not None:
             if maximum_length.type is not PrimitiveType.Integer:
                 raise ValueError(f'Unsupported list maximum length type: ${maximum_length.type}')